@@ -1,11 +1,27 @@
-from nicegui import ui
+from nicegui import ui, app
 from src import start_app
+from src.query_embeddings import get_query_embedding_service
+from src.elasticsearch_client import get_async_elasticsearch_client
+from src.utils.constants import ES_ASYNC_CLIENT
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
 DEMO_PORT = os.getenv('DEMO_PORT')
+WARM_UP_EMBEDDINGS = os.getenv('WARM_UP_EMBEDDINGS')
+
+if WARM_UP_EMBEDDINGS:
+    # Load the query embedding model at startup instead of on the first semantic search
+    app.on_startup(get_query_embedding_service().warm_up)
+
+if ES_ASYNC_CLIENT:
+    # Close the connections of the shared async client. NiceGUI only awaits handlers that are coroutine functions,
+    # a lambda returning the coroutine would drop it unawaited
+    async def close_async_elasticsearch_client():
+        await get_async_elasticsearch_client().close()
+
+    app.on_shutdown(close_async_elasticsearch_client)
 
 ui.run(title='IR Anthology Boolean Search Demo', port=DEMO_PORT if DEMO_PORT else 8080, reconnect_timeout=30, reload=False)
 start_app()
@@ -0,0 +1,91 @@
+import sys
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+from src.utils.file_loading_utils import load_json_file, load_abstract
+
+
+def build_papermage_json(num_tokens, seed=0):
+    """
+    Builds the json-content of a papermage document with pages, rows, tokens and an abstracts layer.
+
+    Args:
+        num_tokens: Number of tokens in the document.
+        seed: Seed for the random words.
+
+    Returns:
+        Dict with the json-content of the papermage document.
+    """
+    rng = random.Random(seed)
+    words = ["retrieval", "ranking", "fairness", "query", "boolean", "systematic", "review", "index", "search", "model"]
+    tokens = []
+    symbols = []
+    position = 0
+    for i in range(num_tokens):
+        word = rng.choice(words)
+        symbols.append(word)
+        box = [rng.random(), rng.random(), 0.01, 0.01, i // 500]
+        tokens.append({"spans": [[position, position + len(word)]], "boxes": [box]})
+        position += len(word) + 1
+    rows = [{"spans": [[tokens[i]["spans"][0][0], tokens[min(i + 9, num_tokens - 1)]["spans"][0][1]]]} for i in range(0, num_tokens, 10)]
+    pages = [{"spans": [[tokens[i]["spans"][0][0], tokens[min(i + 499, num_tokens - 1)]["spans"][0][1]]]} for i in range(0, num_tokens, 500)]
+    abstract_end = tokens[min(200, num_tokens - 1)]["spans"][0][1]
+    return {
+        "symbols": " ".join(symbols),
+        "entities": {
+            "pages": pages,
+            "rows": rows,
+            "tokens": tokens,
+            "abstracts": [{"spans": [[tokens[20]["spans"][0][0], abstract_end]], "metadata": {}}],
+        },
+        "metadata": {},
+    }
+
+
+def papermage_abstract(file):
+    """
+    The previous way to get the abstract: build the complete papermage Document.
+    """
+    doc = load_json_file(file)
+    return "".join([e.text for e in doc.get_layer("abstracts").entities])
+
+
+def time_function(function, files):
+    start = time.perf_counter()
+    results = [function(file) for file in files]
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the abstract extraction from papermage json-files.")
+    parser.add_argument('--files', type=int, default=20, help="Number of json-files per size.")
+    parser.add_argument('--tokens', type=int, nargs='+', default=[5000, 20000, 80000], help="Number of tokens per json-file.")
+    args = parser.parse_args()
+
+    print(f"{'tokens':>8} {'MB/file':>8} {'papermage ms':>13} {'fast ms':>9} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for num_tokens in args.tokens:
+            files = []
+            for i in range(args.files):
+                file = f"{directory}/{num_tokens}-{i}.json"
+                with open(file, "w", encoding="utf8") as f:
+                    json.dump(build_papermage_json(num_tokens, seed=i), f)
+                files.append(file)
+            size = os.path.getsize(files[0]) / (1024 * 1024)
+
+            slow_time, slow_results = time_function(papermage_abstract, files)
+            fast_time, fast_results = time_function(load_abstract, files)
+            assert slow_results == fast_results, "The abstracts of both methods differ."
+            print(f"{num_tokens:>8} {size:>8.2f} {slow_time / len(files) * 1000:>13.2f} "
+                  f"{fast_time / len(files) * 1000:>9.2f} {slow_time / fast_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import sys
+import os
+import time
+import random
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+from mock_elasticsearch import MockElasticsearch
+from src.elasticsearch_client import ElasticsearchClient
+from src.indexing import Index
+from src.utils.constants import IndexFields
+
+
+def build_documents(num_documents, seed=0):
+    """
+    Builds index documents with full texts between a few KB and a few MB.
+
+    Args:
+        num_documents: Number of documents.
+        seed: Seed for the random text lengths.
+
+    Yields:
+        Dict containing the document as formatted for the Elasticsearch index.
+    """
+    rng = random.Random(seed)
+    for i in range(num_documents):
+        length = int(rng.lognormvariate(9, 1.2))
+        yield {
+            IndexFields.NAME.value: f"paper-{i}",
+            IndexFields.TITLE.value: f"Paper {i}",
+            IndexFields.FULL_TEXT.value: "retrieval " * (length // 10),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bulk ingestion against a local Elasticsearch stand-in.")
+    parser.add_argument('--documents', type=int, default=2000)
+    parser.add_argument('--bulk-size', type=int, default=100)
+    parser.add_argument('--bulk-bytes', type=int, default=5 * 1024 * 1024)
+    parser.add_argument('--parallel-bulks', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--reject-request-rate', type=float, default=0.05)
+    parser.add_argument('--reject-item-rate', type=float, default=0.02)
+    parser.add_argument('--latency', type=float, default=0.02, help="Simulated latency per request in seconds.")
+    args = parser.parse_args()
+
+    for parallel_bulks in args.parallel_bulks:
+        with MockElasticsearch(reject_request_rate=args.reject_request_rate, reject_item_rate=args.reject_item_rate,
+                               latency=args.latency) as mock:
+            index = Index(ElasticsearchClient(mock.url))
+            start = time.perf_counter()
+            result = index.insert_documents(build_documents(args.documents), index='benchmark', max_documents=args.bulk_size,
+                                            max_bytes=args.bulk_bytes, max_in_flight=parallel_bulks, initial_backoff=0.01)
+            elapsed = time.perf_counter() - start
+            indexed = len(mock.indices['benchmark']['docs'])
+            print(f"parallel bulks: {parallel_bulks}, {elapsed:.2f}s, {result.succeeded / elapsed:.0f} documents/s, "
+                  f"{indexed} documents in the index")
+            print(result.summary())
+
+
+if __name__ == '__main__':
+    main()
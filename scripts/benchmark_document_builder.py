@@ -0,0 +1,63 @@
+import sys
+import os
+import time
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+from pybtex.database import Entry, Person
+
+from src.document_builder import build_document
+from src.utils.file_loading_utils import BibEntry
+
+
+def build_info_dicts(num_entries, complete):
+    """
+    Builds info_dicts like the ones returned by get_all_files.
+
+    Args:
+        num_entries: Number of info_dicts.
+        complete: Whether the bib-entries have all fields or only a title.
+
+    Returns:
+        List with tuples of (bib_id, info_dict).
+    """
+    info_dicts = []
+    for i in range(num_entries):
+        if complete:
+            entry = Entry('inproceedings', fields={
+                'title': f'{{Fair}} Ranking in \\textit{{IR}} {i}', 'year': '2020', 'booktitle': 'SIGIR', 'series': 'SIGIR',
+                'venue': 'SIGIR', 'url': 'https://example.org/a\\_b', 'doi': '10.1145/123', 'openaccess': 'true'
+            }, persons={'author': [Person('M{\\"u}ller, Anna'), Person('Smith, Bob')], 'editor': [Person('Doe, Jane')]})
+        else:
+            entry = Entry('misc', fields={'title': f'Paper {i}'})
+        info_dicts.append((f'paper-{i}', {
+            'bib-data': entry,
+            'full-text': 'retrieval ' * 1000 if complete else '',
+            'json-data': {'abstract': 'An abstract.'} if complete else '',
+        }))
+    return info_dicts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the number of index documents built per second.")
+    parser.add_argument('--entries', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'fields':>10} {'bib-data':>10} {'documents/s':>12}")
+    for complete in (True, False):
+        info_dicts = build_info_dicts(args.entries, complete)
+        for kind in ('pybtex', 'BibEntry'):
+            if kind == 'BibEntry':
+                info_dicts = [(bib_id, {**info_dict, 'bib-data': BibEntry.from_pybtex(info_dict['bib-data'])})
+                              for bib_id, info_dict in info_dicts]
+            start = time.perf_counter()
+            for bib_id, info_dict in info_dicts:
+                build_document(bib_id, info_dict)
+            elapsed = time.perf_counter() - start
+            print(f"{'complete' if complete else 'sparse':>10} {kind:>10} {len(info_dicts) / elapsed:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import sys
+import os
+import time
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+from pybtex.database import BibliographyData, Entry
+
+from src.utils.file_loading_utils import join_files
+
+
+def build_corpus(num_venues, entries_per_venue, txt_ratio=0.8):
+    """
+    Builds an in-memory corpus with the same shape as the output of get_all_bib_files and get_all_txt_files.
+
+    Args:
+        num_venues: Number of venue directories.
+        entries_per_venue: Number of bib-entries in the bib-file of every venue.
+        txt_ratio: Share of the entries that have a txt-file.
+
+    Returns:
+        Tuple with (bibs, txts).
+    """
+    bibs = {}
+    txts = {}
+    for v in range(num_venues):
+        directory = f"/data/conf/venue{v}/venue{v}-2024"
+        entries = {}
+        for e in range(entries_per_venue):
+            bib_id = f"venue{v}-2024-{e}"
+            entries[bib_id] = Entry('inproceedings', fields={'title': f'Paper {e}', 'year': '2024'})
+            if e < entries_per_venue * txt_ratio:
+                txts[f"{directory}/{bib_id}.txt"] = f"Full text of {bib_id}"
+        bibs[f"{directory}/venue{v}-2024.bib"] = BibliographyData(entries)
+    return bibs, txts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the join of bib- and txt-files for growing corpus sizes.")
+    parser.add_argument('--venues', type=int, default=50, help="Number of venues at scale 1.")
+    parser.add_argument('--entries', type=int, default=100, help="Number of entries per venue.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    print(f"{'scale':>6} {'entries':>10} {'seconds':>10} {'us/entry':>10}")
+    for scale in args.scales:
+        bibs, txts = build_corpus(args.venues * scale, args.entries)
+        start = time.perf_counter()
+        files = join_files(bibs, txts)
+        elapsed = time.perf_counter() - start
+        print(f"{scale:>6} {len(files):>10} {elapsed:>10.3f} {elapsed / len(files) * 1e6:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
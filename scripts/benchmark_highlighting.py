@@ -0,0 +1,60 @@
+import sys
+import os
+import json
+import time
+import argparse
+import statistics
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+from src.elasticsearch_client import ElasticsearchClient
+from src.highlighting import HIGHLIGHT_PROFILES
+from src.search import Search
+from src.utils import QueryParser
+
+DEFAULT_QUERIES = [
+    "retrieval",
+    "query expansion",
+    "\"learning to rank\"",
+    "bias AND fairness",
+    "dense retrieval OR sparse retrieval",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the query latency of the highlight profiles against an Elasticsearch cluster. "
+                                                 "Compare an index with and without --full-text-index-options of populate_index.py.")
+    parser.add_argument('--url', default=None, help="URL of the cluster. Defaults to ES_URL.")
+    parser.add_argument('--queries', nargs='+', default=DEFAULT_QUERIES)
+    parser.add_argument('--profiles', nargs='+', default=['none', 'display', 'full'], choices=sorted(HIGHLIGHT_PROFILES))
+    parser.add_argument('--size', type=int, default=10, help="Number of hits per query.")
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    search = Search(ElasticsearchClient(args.url), result_cache=None)
+    query_parser = QueryParser(use_self_implemented=False)
+    queries = [query_parser.build_query(query)['query'] for query in args.queries]
+
+    for profile in args.profiles:
+        latencies = []
+        took = []
+        response_bytes = []
+        # Warm up the caches of the cluster
+        for query in queries:
+            search.search(query, 0, args.size, use_cache=False, highlight_profile=profile)
+        for _ in range(args.repeats):
+            for query in queries:
+                start = time.perf_counter()
+                response = search.search(query, 0, args.size, use_cache=False, highlight_profile=profile)
+                latencies.append((time.perf_counter() - start) * 1000)
+                took.append(response['took'])
+                response_bytes.append(len(json.dumps(response.body)))
+        latencies.sort()
+        print(f"{profile:12} median {statistics.median(latencies):7.1f} ms, "
+              f"p95 {latencies[int(0.95 * (len(latencies) - 1))]:7.1f} ms, "
+              f"took {statistics.median(took):6.1f} ms, response {statistics.mean(response_bytes) / 1024:7.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+import sys
+import os
+import json
+import time
+import io
+import shutil
+import argparse
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+from generate_corpus import generate_corpus, read_manifest
+from mock_elasticsearch import MockElasticsearch
+
+# Every pipeline runs the stages of the indexing up to its name in a fresh process, so its peak memory belongs to these stages
+PIPELINES = ['load', 'build', 'ingest']
+BENCHMARK_INDEX = 'benchmark'
+
+
+def run_pipeline(pipeline, data_path, url, options):
+    """
+    Runs the indexing of a corpus up to a stage (load the files, build the documents, ingest them into the index)
+    and measures the seconds spent in every stage.
+
+    Args:
+        pipeline: load, build or ingest.
+        data_path: Path of the corpus.
+        url: URL of the Elasticsearch stand-in (only used by ingest).
+        options: Dict with the loading options (num_workers, chunksize, max_in_flight) and bulk options (bulk_size, bulk_bytes, parallel_bulks).
+
+    Returns:
+        Dict with the seconds per stage, the number of documents and the peak memory in MB.
+    """
+    from src.elasticsearch_client import ElasticsearchClient
+    from src.indexing import Index
+    from src.document_builder import build_document
+    from src.utils import iter_venue_files, get_peak_memory_mb
+
+    # Index.create_document is build_document, only the ingest needs a client
+    create_document = build_document
+    if pipeline == 'ingest':
+        with contextlib.redirect_stdout(io.StringIO()):
+            index = Index(ElasticsearchClient(url))
+        create_document = index.create_document
+    seconds = {stage: 0.0 for stage in PIPELINES[:PIPELINES.index(pipeline) + 1]}
+    num_documents = 0
+
+    def iter_documents():
+        # The waiting time for the next venue directory is the time of the loading, which runs in the background
+        nonlocal num_documents
+        files = iter_venue_files(data_path, num_workers=options['num_workers'], chunksize=options['chunksize'],
+                                 max_in_flight=options['max_in_flight'])
+        while True:
+            start = time.perf_counter()
+            venue_files = next(files, None)
+            seconds['load'] += time.perf_counter() - start
+            if venue_files is None:
+                return
+            for bib_id, info_dict in venue_files.items():
+                num_documents += 1
+                if pipeline == 'load':
+                    continue
+                start = time.perf_counter()
+                document = create_document(bib_id, info_dict)
+                seconds['build'] += time.perf_counter() - start
+                yield document
+
+    start = time.perf_counter()
+    if pipeline == 'ingest':
+        result = index.insert_documents(iter_documents(), index=BENCHMARK_INDEX, max_documents=options['bulk_size'],
+                                        max_bytes=options['bulk_bytes'], max_in_flight=options['parallel_bulks'],
+                                        initial_backoff=0.01)
+        if result.failed:
+            print(result.summary())
+        seconds['ingest'] = time.perf_counter() - start - seconds['load'] - seconds['build']
+    else:
+        for _ in iter_documents():
+            pass
+    return {'seconds': seconds, 'total_seconds': time.perf_counter() - start, 'documents': num_documents,
+            'peak_memory_mb': get_peak_memory_mb()}
+
+
+def prepare_corpus(path, scale, seed, text_kb):
+    """
+    Generates the corpus of a scale, unless a corpus with the same parameters already exists at the path.
+
+    Returns:
+        Tuple with (manifest of the corpus, seconds of the generation or None if it was reused).
+    """
+    manifest = read_manifest(path)
+    if manifest and (manifest['scale'], manifest['seed'], manifest['text_kb']) == (scale, seed, text_kb):
+        return manifest, None
+    if manifest:
+        # Only remove directories written by generate_corpus
+        shutil.rmtree(path)
+    print(f"Generating the corpus of scale {scale} at {path}...")
+    manifest = generate_corpus(path, scale=scale, seed=seed, text_kb=text_kb)
+    return manifest, manifest['seconds']
+
+
+def benchmark_scale(path, scale, args, options):
+    """
+    Runs all pipelines on the corpus of one scale and returns the report of its stages.
+    """
+    manifest, generation_seconds = prepare_corpus(path, scale, args.seed, args.text_kb)
+    report = {'scale': scale, 'papers': manifest['papers'], 'corpus_mb': manifest['bytes'] / 1024 / 1024,
+              'generation_seconds': generation_seconds, 'stages': {}}
+
+    # The loaders and tqdm must not write progress bars into the report
+    os.environ['TQDM_DISABLE'] = '1'
+    context = multiprocessing.get_context('spawn')
+    with MockElasticsearch(latency=args.latency, keep_sources=False) as mock:
+        for pipeline in PIPELINES:
+            mock.indices.pop(BENCHMARK_INDEX, None)
+            with ProcessPoolExecutor(1, mp_context=context) as executor:
+                result = executor.submit(run_pipeline, pipeline, path, mock.url, options).result()
+            if pipeline == 'ingest':
+                indexed = len(mock.indices.get(BENCHMARK_INDEX, {}).get('docs', {}))
+                if indexed != result['documents']:
+                    print(f"Warning: {indexed} of {result['documents']} documents were indexed")
+            report['stages'][pipeline] = {'peak_memory_mb': result['peak_memory_mb']}
+        # The seconds of the stages are taken from the complete pipeline
+        report['total_seconds'] = result['total_seconds']
+        for stage, seconds in result['seconds'].items():
+            seconds = max(seconds, 1e-9)
+            report['stages'][stage].update({
+                'seconds': seconds,
+                'documents_per_second': result['documents'] / seconds,
+                'mb_per_second': manifest['bytes'] / 1024 / 1024 / seconds,
+                'us_per_document': seconds / max(result['documents'], 1) * 1e6,
+            })
+    return report
+
+
+def print_report(report):
+    generation = f", generated in {report['generation_seconds']:.1f}s" if report['generation_seconds'] is not None else ""
+    print(f"\nScale {report['scale']}: {report['papers']} papers, {report['corpus_mb']:.1f} MB{generation}, "
+          f"indexed in {report['total_seconds']:.2f}s")
+    print(f"{'stage':<8} {'seconds':>9} {'docs/s':>10} {'MB/s':>8} {'us/doc':>9} {'peak MB':>9}")
+    for stage, values in report['stages'].items():
+        print(f"{stage:<8} {values['seconds']:>9.2f} {values['documents_per_second']:>10.0f} {values['mb_per_second']:>8.1f} "
+              f"{values['us_per_document']:>9.0f} {values['peak_memory_mb']:>9.1f}")
+
+
+def compare_reports(reports, baseline, tolerance):
+    """
+    Compares the reports with the reports of a previous run.
+
+    Args:
+        reports: List with the reports of this run.
+        baseline: List with the reports of the previous run.
+        tolerance: Allowed relative increase of the time per document and of the peak memory.
+
+    Returns:
+        List with the descriptions of the regressions.
+    """
+    baseline = {report['scale']: report for report in baseline}
+    regressions = []
+    for report in reports:
+        if report['scale'] not in baseline:
+            continue
+        for stage, values in report['stages'].items():
+            previous = baseline[report['scale']]['stages'].get(stage)
+            if previous is None:
+                continue
+            for key in ('us_per_document', 'peak_memory_mb'):
+                if values[key] > previous[key] * (1 + tolerance):
+                    regressions.append(f"scale {report['scale']}, {stage}: {key} {previous[key]:.1f} -> {values[key]:.1f} "
+                                       f"(+{(values[key] / previous[key] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every stage of the indexing (load the files, build the documents, "
+                                                 "ingest them) on synthetic corpora against a local Elasticsearch stand-in.")
+    parser.add_argument('--corpus-dir', default=os.path.join(os.path.dirname(SCRIPT_DIR), 'benchmark_corpus'),
+                        help="Directory of the generated corpora, one subdirectory per scale.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1], help="Scales of the corpora, e.g. 1 10 100.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--text-kb', type=float, default=10, help="Median size of a full-text in KB.")
+    parser.add_argument('--num-workers', type=int, default=1, help="Number of processes used to load the files (0 for one per CPU core).")
+    parser.add_argument('--chunksize', type=int, default=1)
+    parser.add_argument('--max-in-flight', type=int, default=4)
+    parser.add_argument('--bulk-size', type=int, default=100)
+    parser.add_argument('--bulk-bytes', type=int, default=10 * 1024 * 1024)
+    parser.add_argument('--parallel-bulks', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.0, help="Simulated latency per request in seconds.")
+    parser.add_argument('--output', default=None, help="JSON file for the reports.")
+    parser.add_argument('--baseline', default=None, help="JSON file with the reports of a previous run to detect regressions.")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative slowdown and memory increase compared to the baseline.")
+    args = parser.parse_args()
+
+    options = dict(num_workers=args.num_workers or None, chunksize=args.chunksize, max_in_flight=args.max_in_flight,
+                   bulk_size=args.bulk_size, bulk_bytes=args.bulk_bytes, parallel_bulks=args.parallel_bulks)
+    reports = []
+    for scale in args.scales:
+        report = benchmark_scale(os.path.join(args.corpus_dir, f'scale-{scale}'), scale, args, options)
+        print_report(report)
+        reports.append(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=4)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_reports(reports, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions compared to the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions compared to the baseline.")
+
+
+if __name__ == '__main__':
+    main()
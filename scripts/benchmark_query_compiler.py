@@ -0,0 +1,101 @@
+import sys
+import os
+import time
+import random
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+from src.utils.boolean_query import tokenize, Parser, normalize, to_dsl, compile_query, canonical_query
+from src.utils.constants import IndexFields
+
+WORDS = ["fairness", "bias", "transparency", "accountability", "ethics", "explainable", "retrieval", "ranking",
+         "search", "engine", "recommendation", "privacy", "evaluation", "query", "user", "model", "neural", "dense",
+         "sparse", "learning", "graph", "trust", "diversity", "exposure", "relevance", "feedback", "click", "bert"]
+
+
+def build_query(rng, num_groups, group_size, shuffle=False):
+    """
+    Builds a large Boolean query like the ones generated by LLMs: AND-ed concept groups of OR-ed synonyms,
+    with phrases in smart quotes, wildcards, nested groups and duplicates.
+
+    Args:
+        rng: Random number generator, the same seed gives the same concepts.
+        num_groups: Number of concept groups.
+        group_size: Number of synonyms per group.
+        shuffle: Whether to shuffle the order of the groups and synonyms. Defaults to False.
+
+    Returns:
+        The query string.
+    """
+    groups = []
+    for _ in range(num_groups):
+        synonyms = []
+        for _ in range(group_size):
+            kind = rng.random()
+            if kind < 0.4:
+                synonyms.append(f"“{rng.choice(WORDS)} {rng.choice(WORDS)}”")
+            elif kind < 0.5:
+                synonyms.append(rng.choice(WORDS)[:5] + "*")
+            else:
+                synonyms.append(rng.choice(WORDS))
+        groups.append(synonyms)
+    if shuffle:
+        shuffler = random.Random()
+        for synonyms in groups:
+            shuffler.shuffle(synonyms)
+        shuffler.shuffle(groups)
+    parts = []
+    for synonyms in groups:
+        half = len(synonyms) // 2
+        # Nested OR groups, as LLMs often write them
+        parts.append(f"(({' OR '.join(synonyms[:half])}) OR {' OR '.join(synonyms[half:])})")
+    return " AND ".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Boolean query compiler on large generated queries.")
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--groups', type=int, nargs='+', default=[2, 5, 10])
+    parser.add_argument('--group-size', type=int, default=20)
+    args = parser.parse_args()
+
+    fields = [IndexFields.FULL_TEXT.value]
+    for num_groups in args.groups:
+        queries = [build_query(random.Random(i), num_groups, args.group_size) for i in range(args.queries)]
+        timings = {'tokenize': 0.0, 'parse': 0.0, 'normalize': 0.0, 'emit': 0.0}
+        for query in queries:
+            start = time.perf_counter()
+            tokens = tokenize(query)
+            timings['tokenize'] += time.perf_counter() - start
+            start = time.perf_counter()
+            ast = Parser(tokens).parse()
+            timings['parse'] += time.perf_counter() - start
+            start = time.perf_counter()
+            ast = normalize(ast)
+            timings['normalize'] += time.perf_counter() - start
+            start = time.perf_counter()
+            to_dsl(ast, fields)
+            timings['emit'] += time.perf_counter() - start
+        total = sum(timings.values())
+
+        # Repeated queries hit the cache of the parsed ASTs
+        compile_query(queries[0])
+        start = time.perf_counter()
+        for _ in range(args.queries):
+            compile_query(queries[0])
+        cached = (time.perf_counter() - start) / args.queries
+
+        # Shuffled operands give the same canonical form
+        stable = sum(canonical_query(query) == canonical_query(build_query(random.Random(i), num_groups, args.group_size, shuffle=True))
+                     for i, query in enumerate(queries))
+
+        print(f"{num_groups} groups x {args.group_size} synonyms ({sum(map(len, queries)) / len(queries):.0f} characters): "
+              f"{total / args.queries * 1000:.3f} ms per query ("
+              + ", ".join(f"{name} {value / args.queries * 1000:.3f} ms" for name, value in timings.items())
+              + f"), cached {cached * 1000:.3f} ms, stable cache keys {stable}/{len(queries)}")
+
+
+if __name__ == '__main__':
+    main()
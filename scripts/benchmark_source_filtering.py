@@ -0,0 +1,52 @@
+import sys
+import os
+import json
+import time
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+from mock_elasticsearch import MockElasticsearch
+from benchmark_bulk_ingestion import build_documents
+from src.document import Document
+from src.document_builder import normalize_document, make_preview
+from src.elasticsearch_client import ElasticsearchClient
+from src.search import Search, SOURCE_FILTERS
+from src.utils.constants import IndexFields
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the response size and decode time of a result page per _source filter.")
+    parser.add_argument('--documents', type=int, default=200)
+    parser.add_argument('--size', type=int, default=10, help="Number of hits per page.")
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    with MockElasticsearch() as mock:
+        index = mock.get_index('benchmark', create=True)
+        for document in build_documents(args.documents):
+            document[IndexFields.PREVIEW.value] = make_preview(document[IndexFields.FULL_TEXT.value])
+            index['docs'][document[IndexFields.NAME.value]] = normalize_document(document)
+        search = Search(ElasticsearchClient(mock.url), result_cache=None)
+        es_client = search.es_client()
+
+        for source_mode in SOURCE_FILTERS:
+            source = search.get_source(source_mode)
+            raw_bytes = 0
+            decode_time = 0
+            for _ in range(args.repeats):
+                raw = es_client.perform_request('POST', '/benchmark/_search', headers={'accept': 'application/json', 'content-type': 'application/json'},
+                                                body={'query': {'match_all': {}}, 'size': args.size, '_source': source})
+                data = json.dumps(raw.body)
+                start = time.perf_counter()
+                response = json.loads(data)
+                documents = [Document(hit) for hit in response['hits']['hits']]
+                decode_time += time.perf_counter() - start
+                raw_bytes += len(data)
+            print(f"{source_mode:8} response {raw_bytes / args.repeats / 1024:9.1f} KB, "
+                  f"decode {decode_time / args.repeats * 1000:7.2f} ms for {len(documents)} documents")
+
+
+if __name__ == '__main__':
+    main()
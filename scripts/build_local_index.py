@@ -0,0 +1,36 @@
+import sys
+import os
+import time
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+from src.document_builder import build_document
+from src.local_search import LocalIndex, LOCAL_INDEX_FIELDS, LOCAL_INDEX_BLOCK_SIZE
+from src.utils import iter_venue_files, get_peak_memory_mb
+from src.utils.constants import DATA_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the local Boolean retrieval index of the IR Anthology (see LocalSearch).")
+    parser.add_argument('--data-path', default=DATA_PATH, help="Path to the files. Defaults to DATA_PATH.")
+    parser.add_argument('--output', default='local_index', help="Directory of the index.")
+    parser.add_argument('--fields', nargs='+', default=LOCAL_INDEX_FIELDS, help="Fields with postings.")
+    parser.add_argument('--block-size', type=int, default=LOCAL_INDEX_BLOCK_SIZE,
+                        help="Number of documents whose postings are kept in memory before they are written to a block.")
+    parser.add_argument('--num-workers', type=int, default=1, help="Number of processes used to load the files (0 for one per CPU core).")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    files = iter_venue_files(args.data_path, num_workers=args.num_workers or None)
+    documents = (build_document(bib_id, info_dict) for venue_files in files for bib_id, info_dict in venue_files.items())
+    num_documents = LocalIndex.build(documents, args.output, fields=args.fields, block_size=args.block_size)
+    elapsed = time.perf_counter() - start
+    size = sum(os.path.getsize(os.path.join(args.output, file)) for file in os.listdir(args.output))
+    print(f"Indexed {num_documents} documents in {elapsed:.1f}s ({size / 1024 / 1024:.1f} MB on disk, "
+          f"peak memory {get_peak_memory_mb():.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
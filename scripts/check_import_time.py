@@ -0,0 +1,94 @@
+import sys
+import os
+import re
+import argparse
+import subprocess
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+
+IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)')
+
+# Imports of the entry points, the modules they must not load and their import time budget in ms
+ENTRY_POINTS = {
+    'scripts/populate_index.py': {
+        'statement': 'from src import Index',
+        'forbidden': ['nicegui', 'papermage', 'sentence_transformers', 'torch'],
+        'budget': 1500,
+    },
+    'one-off search': {
+        'statement': 'from src.search import Search',
+        'forbidden': ['nicegui', 'papermage', 'pybtex', 'tqdm', 'sentence_transformers', 'torch'],
+        'budget': 1000,
+    },
+    'query parsing': {
+        'statement': 'from src.utils import QueryParser',
+        'forbidden': ['nicegui', 'papermage', 'pybtex', 'elasticsearch', 'numpy'],
+        'budget': 100,
+    },
+    'main.py': {
+        'statement': 'from src import start_app',
+        'forbidden': ['papermage', 'pybtex', 'sentence_transformers', 'torch'],
+        'budget': 3000,
+    },
+}
+
+
+def measure_imports(statement):
+    """
+    Runs an import statement in a new interpreter with -X importtime.
+
+    Args:
+        statement: The import statement.
+
+    Returns:
+        Dict with the top-level module name -> cumulative import time in ms (the maximum over its submodules),
+        and the total import time of the statement in ms.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=ROOT_DIR,
+                            capture_output=True, text=True, check=True)
+    modules = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match is None:
+            continue
+        cumulative = int(match.group(2)) / 1000
+        module = match.group(4)
+        top_level = module.split('.')[0]
+        modules[top_level] = max(modules.get(top_level, 0), cumulative)
+        if match.group(3) == ' ':
+            # Module imported directly by the statement
+            total += cumulative
+    return modules, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time of the entry points with python -X importtime. "
+                                                 "Fails if an entry point loads a forbidden module or exceeds its budget.")
+    parser.add_argument('--repeats', type=int, default=3, help="Number of measurements per entry point (the minimum counts).")
+    parser.add_argument('--budget-scale', type=float, default=1.0, help="Factor for the budgets, e.g. for slow machines.")
+    parser.add_argument('--top', type=int, default=5, help="Number of slowest top-level modules shown per entry point.")
+    args = parser.parse_args()
+
+    failures = []
+    for name, entry_point in ENTRY_POINTS.items():
+        measurements = [measure_imports(entry_point['statement']) for _ in range(args.repeats)]
+        modules, total = min(measurements, key=lambda measurement: measurement[1])
+        budget = entry_point['budget'] * args.budget_scale
+        forbidden = [module for module in entry_point['forbidden'] if module in modules]
+        slowest = sorted(modules.items(), key=lambda item: -item[1])[:args.top]
+        print(f"{name}: {total:.0f} ms (budget {budget:.0f} ms)")
+        print("    slowest: " + ", ".join(f"{module} {ms:.0f} ms" for module, ms in slowest))
+        if forbidden:
+            failures.append(f"{name} imports {', '.join(forbidden)}")
+        if total > budget:
+            failures.append(f"{name} takes {total:.0f} ms to import, budget {budget:.0f} ms")
+
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
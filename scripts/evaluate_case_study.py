@@ -1,50 +1,105 @@
-# This file calculates the metrics
-total_relevants = 30
-
-def print_metrics(total, relevants, total_relevants):
-    print(f'#Retrieved: {total}')
-    print(f'#Relevant: {relevants}')
-    recall = relevants/total_relevants
-    precision = relevants/total
-    print(f'Precision: {precision}')
-    print(f'Recall: {recall}')
-    print(f'F1: {2*((precision*recall)/(precision+recall))}')
-    print(f'F3: {(((1+3**2)*precision*recall)/((3**2 * precision)+recall))}\n')
-
-def get_total_retrieved_and_relevants_from_file(f):
-    total = 0
-    relevants = 0
-    while True:
-        line = f.readline()
-        if not line or line.startswith('#'):
-            break
-        if line.startswith('R') and not line.startswith('Results'):
-            total += 1
-            relevants += 1
-        if line.startswith('N'):
-            total += 1
-    return total, relevants
-
-
-# Read in evaluation file
-f = open("./case-study/evaluation-notes.txt", 'r', encoding='utf-8')
-while True:
-    line = f.readline()
-    if line.startswith('-'):
-        break
-
-
-print('Results for the query from the systematic review paper:')
-total, relevants = get_total_retrieved_and_relevants_from_file(f)
-print_metrics(total, relevants, total_relevants)
-
-print('Results for the Single Prompt LLM-generated query:')
-total, relevants = get_total_retrieved_and_relevants_from_file(f)
-print_metrics(total, relevants, total_relevants)
-
-
-print('Results for the Multi-Step LLM-generated query:')
-total, relevants = get_total_retrieved_and_relevants_from_file(f)
-print_metrics(total, relevants, total_relevants)
-
-f.close()
+# This file calculates the metrics of the queries of the case study
+import sys
+import os
+import json
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+from src.evaluation import (load_qrels, collect_runs, write_runs, read_runs, evaluate_runs, compute_metrics,
+                            write_results, print_results)
+
+QRELS_PATH = './case-study/FATE-papers-in-IRA.json'
+NOTES_PATH = './case-study/evaluation-notes.txt'
+
+
+def read_notes_queries(path, topic):
+    """
+    Reads the queries of the evaluation notes: every query follows a line starting with # and its name.
+
+    Returns:
+        Dict with topic -> (variant -> query).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    variants = {}
+    for line, next_line in zip(lines, lines[1:]):
+        if line.startswith('# ') and next_line.strip() and not next_line.startswith(('#', '-')):
+            variants[line[2:].strip().rstrip(':')] = next_line.strip()
+    return {topic: variants}
+
+
+def evaluate_notes(path, total_relevants):
+    """
+    Evaluates the manual annotations of the evaluation notes: lines starting with R are relevant
+    retrieved documents, lines starting with N are non-relevant ones.
+
+    Returns:
+        List with a row per query of the notes.
+    """
+    counts = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('Results'):
+                counts.append([0, 0])
+            elif counts and line.startswith('R'):
+                counts[-1][0] += 1
+                counts[-1][1] += 1
+            elif counts and line.startswith('N'):
+                counts[-1][0] += 1
+    retrieved = [total for total, _ in counts]
+    relevants = [relevant for _, relevant in counts]
+    metrics = compute_metrics(retrieved, [total_relevants] * len(counts), relevants)
+    return [dict({'variant': i + 1, 'retrieved': retrieved[i], 'relevant': total_relevants, 'relevant_retrieved': relevants[i]},
+                 **{name: float(values[i]) for name, values in metrics.items()}) for i in range(len(counts))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate query variants against the relevant papers of the case study "
+                                                 "(precision, recall, F1 and F3, matched by normalized titles).")
+    parser.add_argument('--qrels', default=QRELS_PATH, help="JSON file with the relevant papers (id -> title, or topic -> (id -> title)).")
+    parser.add_argument('--topic', default=None, help="Topic name of a qrels file with one topic. Defaults to its file name.")
+    parser.add_argument('--queries', default=None, help="JSON file with topic -> (variant -> query). Defaults to the queries of the evaluation notes.")
+    parser.add_argument('--run', default=None, help="Evaluate a run file written with --write-run instead of searching.")
+    parser.add_argument('--write-run', default=None, help="Write the retrieved documents to this run file.")
+    parser.add_argument('--local-index', default=None, help="Search a local index (see build_local_index.py) instead of Elasticsearch.")
+    parser.add_argument('--size', type=int, default=10000, help="Maximum number of documents retrieved per query.")
+    parser.add_argument('--betas', type=float, nargs='+', default=[1, 3], help="Betas of the F-measures.")
+    parser.add_argument('--output', default=None, help="Write the results table to this tab-separated file.")
+    parser.add_argument('--notes', action='store_true', help="Evaluate the manual annotations of the evaluation notes instead.")
+    args = parser.parse_args()
+
+    qrels = load_qrels(args.qrels, args.topic)
+    if args.notes:
+        rows = evaluate_notes(NOTES_PATH, sum(len(titles) for titles in qrels.values()))
+    else:
+        if args.run:
+            runs = read_runs(args.run)
+        else:
+            if args.queries:
+                with open(args.queries, 'r', encoding='utf-8') as f:
+                    queries = json.load(f)
+            else:
+                queries = read_notes_queries(NOTES_PATH, next(iter(qrels)))
+            if args.local_index:
+                from src.local_search import LocalSearch
+                search = LocalSearch(args.local_index)
+            else:
+                from src.search import Search
+                search = Search()
+            runs = collect_runs(search, queries, size=args.size)
+            for run in runs:
+                if 'error' in run:
+                    print(f"Error in {run['topic']}/{run['variant']}: {run['error']}")
+        if args.write_run:
+            write_runs(runs, args.write_run)
+        rows = evaluate_runs(runs, qrels, betas=args.betas)
+
+    print_results(rows)
+    if args.output:
+        write_results(rows, args.output)
+
+
+if __name__ == '__main__':
+    main()
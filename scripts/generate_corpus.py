@@ -0,0 +1,270 @@
+import sys
+import os
+import json
+import time
+import random
+import hashlib
+import argparse
+import itertools
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+# Venues of the generated tree at scale 1, every venue has one directory per year
+CONF_VENUES = ['sigir', 'ecir', 'cikm', 'ictir', 'chiir', 'wsdm', 'trec', 'clef']
+JRNL_VENUES = ['tois', 'irj']
+YEARS = list(range(2015, 2020))
+CASE_STUDY_PATH = os.path.join(os.path.dirname(SCRIPT_DIR), 'case-study', 'FATE-papers.json')
+MANIFEST_FILE = 'corpus.json'
+
+IR_TERMS = """retrieval ranking query search document relevance index evaluation user model learning neural dense sparse
+    embedding fairness bias transparency accountability ethics explanation explainable recommendation recommender
+    collaborative filtering click feedback session conversational question answering passage reranking bert
+    transformer language corpus collection test assessor judgment precision recall effectiveness efficiency
+    inverted postings compression latency boolean systematic review expansion reformulation suggestion snippet
+    summarization entity knowledge graph cross lingual multilingual web crawler spam link pagerank federated
+    metasearch personalization privacy diversity novelty exposure group individual demographic gender algorithmic
+    audit accountable ethical transparent trust interpretability counterfactual unbiased propensity simulation
+    interactive interface browsing exploratory information seeking behaviour study experiment dataset benchmark
+    baseline significant improvement approach method framework analysis results performance""".split()
+SYLLABLES = ['ka', 'ro', 'ti', 'men', 'sa', 'lu', 'ver', 'qua', 'do', 'nis', 'tra', 'pel', 'xi', 'gor', 'an', 'est']
+FIRST_NAMES = ['Anna', 'Bob', 'Chen', 'Dana', 'Emre', 'Fatima', 'Giulia', 'Hiro', 'Ines', 'Jonas', 'Kim', 'Lars']
+LAST_NAMES = ['M{\\"u}ller', 'Smith', 'Wang', 'Garc{\\\'i}a', 'Kowalski', 'Nguyen', 'Schr{\\"o}der', 'Rossi', 'Kim', 'Dubois']
+
+
+def build_vocabulary(size=2000, seed=0):
+    """
+    Returns the vocabulary of the generated texts: the IR terms followed by made-up words.
+    """
+    rng = random.Random(seed)
+    words = list(IR_TERMS)
+    seen = set(words)
+    while len(words) < size:
+        word = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+VOCABULARY = build_vocabulary()
+# Zipf distribution of the word frequencies, like in natural language
+CUM_WEIGHTS = list(itertools.accumulate(1 / rank for rank in range(1, len(VOCABULARY) + 1)))
+
+
+def load_case_study_titles(path=CASE_STUDY_PATH):
+    """
+    Returns the titles of the case study papers, so the generated corpus contains the relevant papers of the case study.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return list(json.load(f).values())
+
+
+def get_venue_directories(scale):
+    """
+    Returns the venue directories of a scale. Scale n contains the directories of all smaller scales,
+    the venues are repeated with a number (e.g. sigir2) to grow the corpus.
+
+    Returns:
+        List with tuples of (kind, venue, year) with kind conf or jrnl.
+    """
+    directories = []
+    for copy in range(scale):
+        suffix = str(copy + 1) if copy else ''
+        for kind, venues in (('conf', CONF_VENUES), ('jrnl', JRNL_VENUES)):
+            directories += [(kind, f'{venue}{suffix}', year) for venue in venues for year in YEARS]
+    return directories
+
+
+def generate_words(rng, num_words):
+    return rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=num_words)
+
+
+def generate_title(rng):
+    words = [rng.choice(IR_TERMS) for _ in range(rng.randint(3, 10))]
+    words[0] = words[0].capitalize()
+    title = ' '.join(words)
+    # Some titles have LaTeX markup, like the titles of the anthology
+    if rng.random() < 0.2:
+        title = title.replace(words[-1], f'{{{words[-1].upper()}}}', 1)
+    if rng.random() < 0.1:
+        title += f': \\textit{{{rng.choice(IR_TERMS)}}}'
+    return title
+
+
+def generate_bib_entry(rng, bib_id, kind, venue, year, title):
+    """
+    Returns a bib-entry in the BibTeX format of the anthology.
+    """
+    authors = ' and '.join(f'{rng.choice(LAST_NAMES)}, {rng.choice(FIRST_NAMES)}' for _ in range(rng.randint(1, 6)))
+    fields = [('title', title), ('author', authors), ('year', str(year))]
+    if kind == 'conf':
+        fields += [('booktitle', f'Proceedings of {venue.upper()} {year}'), ('series', venue.upper())]
+        if rng.random() < 0.3:
+            fields.append(('editor', f'{rng.choice(LAST_NAMES)}, {rng.choice(FIRST_NAMES)}'))
+    else:
+        fields += [('journal', venue.upper()), ('volume', str(year - 1990)), ('number', str(rng.randint(1, 4)))]
+    fields += [('pages', f'{rng.randint(1, 500)}--{rng.randint(501, 520)}'), ('venue', venue.upper())]
+    if rng.random() < 0.9:
+        fields.append(('doi', f'10.1145/{rng.randint(1000000, 9999999)}'))
+    # Underscores are escaped in the urls of the anthology
+    fields.append(('url', 'https://example.org/' + bib_id.replace('-', '\\_')))
+    if rng.random() < 0.4:
+        fields.append(('openaccess', 'true'))
+    body = ',\n'.join(f'  {name} = {{{value}}}' for name, value in fields)
+    return f'@{"inproceedings" if kind == "conf" else "article"}{{{bib_id},\n{body}\n}}\n'
+
+
+def generate_text(rng, title, text_kb):
+    """
+    Returns the full-text of a paper: the title, an abstract and sections with a log-normal length around text_kb KB.
+
+    Returns:
+        Tuple with (full-text, start and end offset of the abstract).
+    """
+    num_words = max(200, int(rng.lognormvariate(0, 0.6) * text_kb * 1024 / 8))
+    words = generate_words(rng, num_words)
+    abstract = ' '.join(words[:150])
+    header = f'{title}\n\nAbstract\n'
+    sections = [header + abstract]
+    for i in range(150, num_words, 600):
+        sections.append(f'{i // 600 + 1} {rng.choice(IR_TERMS).capitalize()}\n' + ' '.join(words[i:i + 600]))
+    text = '\n\n'.join(sections)
+    return text, (len(header), len(header) + len(abstract))
+
+
+def generate_papermage_json(rng, text, abstract_span):
+    """
+    Returns the json-content of a papermage document of a text with pages, rows, tokens and the abstracts layer.
+    """
+    tokens = []
+    position = 0
+    for i, word in enumerate(text.split(' ')):
+        if word:
+            # Tokens are laid out in rows of 12 tokens and pages of 500 tokens
+            tokens.append({'spans': [[position, position + len(word)]],
+                           'boxes': [[i % 12 / 12, i % 500 // 12 / 42, 0.08, 0.02, i // 500]]})
+        position += len(word) + 1
+    rows = [{'spans': [[tokens[i]['spans'][0][0], tokens[min(i + 11, len(tokens) - 1)]['spans'][0][1]]]}
+            for i in range(0, len(tokens), 12)]
+    pages = [{'spans': [[tokens[i]['spans'][0][0], tokens[min(i + 499, len(tokens) - 1)]['spans'][0][1]]]}
+             for i in range(0, len(tokens), 500)]
+    abstract = {'spans': [list(abstract_span)], 'metadata': {}}
+    if rng.random() < 0.05:
+        # Some abstracts also store their text in the metadata, which takes precedence over the spans
+        abstract['metadata']['text'] = text[abstract_span[0]:abstract_span[1]]
+    return {'symbols': text, 'entities': {'pages': pages, 'rows': rows, 'tokens': tokens, 'abstracts': [abstract]},
+            'metadata': {}}
+
+
+def generate_directory(path, kind, venue, year, seed, entries, text_kb, txt_ratio, json_ratio, titles):
+    """
+    Writes one venue directory with its bib-file and the txt- and json-files of its papers.
+    The content only depends on the seed and the venue, so the directories are the same at every scale.
+
+    Returns:
+        Dict with the number of papers, txt- and json-files and bytes written.
+    """
+    directory = os.path.join(path, kind, venue, f'{venue}-{year}')
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(int(hashlib.sha256(f'{seed}/{kind}/{venue}/{year}'.encode('utf8')).hexdigest()[:16], 16))
+    stats = {'papers': 0, 'txt': 0, 'json': 0, 'bytes': 0}
+    bib_entries = []
+    for i in range(rng.randint(entries // 2, entries * 3 // 2)):
+        bib_id = f'{venue}-{year}-{i + 1}'
+        title = titles.pop() if titles and rng.random() < 0.5 else generate_title(rng)
+        bib_entries.append(generate_bib_entry(rng, bib_id, kind, venue, year, title))
+        stats['papers'] += 1
+        if rng.random() >= txt_ratio:
+            continue
+        text, abstract_span = generate_text(rng, title, text_kb)
+        with open(os.path.join(directory, f'{bib_id}.txt'), 'w', encoding='utf-8') as f:
+            stats['bytes'] += f.write(text)
+        stats['txt'] += 1
+        if rng.random() >= json_ratio:
+            continue
+        data = json.dumps(generate_papermage_json(rng, text, abstract_span))
+        if rng.random() < 0.01:
+            # A few files are broken, like files of an interrupted extraction
+            data = data[:len(data) // 2]
+        with open(os.path.join(directory, f'{bib_id}.json'), 'w', encoding='utf-8') as f:
+            stats['bytes'] += f.write(data)
+        stats['json'] += 1
+    with open(os.path.join(directory, f'{venue}-{year}.bib'), 'w', encoding='utf-8') as f:
+        stats['bytes'] += f.write('\n'.join(bib_entries))
+    if rng.random() < 0.2:
+        # Files that the loaders skip (see NON_IMPORTANT_FILES)
+        with open(os.path.join(directory, 'log.txt'), 'w', encoding='utf-8') as f:
+            f.write('extraction log\n')
+    return stats
+
+
+def generate_corpus(path, scale=1, seed=0, entries=25, text_kb=10, txt_ratio=0.9, json_ratio=0.8, case_study=True):
+    """
+    Writes a synthetic IR Anthology tree (conf/ and jrnl/ with bib-, txt- and papermage json-files)
+    with the layout expected by the loaders of the indexing.
+
+    Args:
+        path: Directory of the corpus.
+        scale: Factor of the number of venue directories (scale 1 has 50 directories). Defaults to 1.
+        seed: Seed of the content. Defaults to 0.
+        entries: Average number of papers per venue directory. Defaults to 25.
+        text_kb: Median size of a full-text in KB. Defaults to 10.
+        txt_ratio: Share of the papers with a txt-file. Defaults to 0.9.
+        json_ratio: Share of the papers with a txt-file that also have a json-file. Defaults to 0.8.
+        case_study: Whether to use the titles of the case study papers for some papers. Defaults to True.
+
+    Returns:
+        Dict with the parameters and the number of directories, papers, txt- and json-files and bytes of the corpus.
+    """
+    start = time.perf_counter()
+    titles = load_case_study_titles() if case_study else []
+    directories = get_venue_directories(scale)
+    totals = {'directories': len(directories), 'papers': 0, 'txt': 0, 'json': 0, 'bytes': 0}
+    for kind, venue, year in directories:
+        stats = generate_directory(path, kind, venue, year, seed, entries, text_kb, txt_ratio, json_ratio, titles)
+        for key, value in stats.items():
+            totals[key] += value
+    with open(os.path.join(path, 'config.json'), 'w', encoding='utf-8') as f:
+        f.write('{}')
+    manifest = {'scale': scale, 'seed': seed, 'entries': entries, 'text_kb': text_kb, 'txt_ratio': txt_ratio,
+                'json_ratio': json_ratio, 'case_study': case_study, **totals, 'seconds': time.perf_counter() - start}
+    with open(os.path.join(path, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=4)
+    return manifest
+
+
+def read_manifest(path):
+    """
+    Returns the manifest of a generated corpus, or None if there is no complete corpus at the path.
+    """
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic IR Anthology corpus (conf/ and jrnl/ with bib-, txt- and "
+                                                 "papermage json-files) for benchmarks and tests without the real data.")
+    parser.add_argument('--output', required=True, help="Directory of the corpus.")
+    parser.add_argument('--scale', type=int, default=1, help="Factor of the corpus size, e.g. 1, 10 or 100 (about 1250 papers per 1).")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--entries', type=int, default=25, help="Average number of papers per venue directory.")
+    parser.add_argument('--text-kb', type=float, default=10, help="Median size of a full-text in KB.")
+    parser.add_argument('--txt-ratio', type=float, default=0.9, help="Share of the papers with a txt-file.")
+    parser.add_argument('--json-ratio', type=float, default=0.8, help="Share of the papers with a txt-file that have a json-file.")
+    parser.add_argument('--no-case-study', action='store_true', help="Do not use the titles of the case study papers.")
+    args = parser.parse_args()
+
+    manifest = generate_corpus(args.output, scale=args.scale, seed=args.seed, entries=args.entries, text_kb=args.text_kb,
+                               txt_ratio=args.txt_ratio, json_ratio=args.json_ratio, case_study=not args.no_case_study)
+    print(f"Generated {manifest['papers']} papers in {manifest['directories']} directories ({manifest['txt']} txt-files, "
+          f"{manifest['json']} json-files, {manifest['bytes'] / 1024 / 1024:.1f} MB) in {manifest['seconds']:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import sys
+import os
+import json
+import asyncio
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+from mock_ollama import MockOllama
+from src.query_generation import QueryGenerator, PIPELINES, to_queries
+from src.utils.constants import LLM_MODEL, LLM_CACHE_PATH, LLM_MAX_CONCURRENT
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate Boolean queries for many topics and seeds with the LLM prompt chains. "
+                                                 "Responses are cached and finished chains are skipped when the run is repeated.")
+    parser.add_argument('--topics', nargs='+', default=[], help="The topics.")
+    parser.add_argument('--topics-file', default=None, help="Text file with one topic per line.")
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0], help="Seeds of the sampling, one query variant per seed.")
+    parser.add_argument('--pipelines', nargs='+', default=['multi_step'], choices=list(PIPELINES), help="Prompt chains.")
+    parser.add_argument('--model', default=LLM_MODEL, help="The ollama model.")
+    parser.add_argument('--host', default=None, help="URL of the ollama server. Defaults to OLLAMA_HOST or the local server.")
+    parser.add_argument('--max-concurrent', type=int, default=LLM_MAX_CONCURRENT, help="Maximum number of concurrent requests.")
+    parser.add_argument('--cache-path', default=LLM_CACHE_PATH, help="Directory of the response cache.")
+    parser.add_argument('--progress', default='generated_queries.jsonl', help="File with the finished chains, used to resume.")
+    parser.add_argument('--output', default=None, help="Write the queries as JSON for evaluate_case_study.py --queries.")
+    parser.add_argument('--mock', action='store_true', help="Answer with a local stand-in of the ollama server.")
+    parser.add_argument('--mock-latency', type=float, default=0.2, help="Simulated generation time of the stand-in in seconds.")
+    args = parser.parse_args()
+
+    topics = list(args.topics)
+    if args.topics_file:
+        with open(args.topics_file, 'r', encoding='utf-8') as f:
+            topics += [line.strip() for line in f if line.strip()]
+    if not topics:
+        parser.error("No topics given")
+
+    mock = MockOllama(latency=args.mock_latency) if args.mock else None
+    host = mock.start() if mock else args.host
+    try:
+        generator = QueryGenerator(model=args.model, host=host, cache_path=args.cache_path, max_concurrent=args.max_concurrent)
+        results = asyncio.run(generator.run(topics, seeds=args.seeds, pipelines=args.pipelines, progress_path=args.progress))
+    finally:
+        if mock:
+            mock.stop()
+            print(f"Stand-in server: {mock.requests} requests, at most {mock.max_active} at once")
+
+    failed = [result for result in results if 'error' in result]
+    print(f"Generated {len(results) - len(failed)} queries, {len(failed)} chains failed (run again to retry them)")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(to_queries(results), f, indent=4, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
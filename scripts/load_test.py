@@ -0,0 +1,364 @@
+# This file simulates reviewers paging through search results at once, to measure the latency of the search frontend under load
+import sys
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+from functools import partial
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+import src.utils.constants as constants
+from generate_corpus import IR_TERMS, load_case_study_titles
+from mock_elasticsearch import MockElasticsearch
+
+NOTES_PATH = os.path.join(os.path.dirname(SCRIPT_DIR), 'case-study', 'evaluation-notes.txt')
+# Actions of a session: a new search (query check, new cursor and first page), the next page, or a jump to a later page
+ACTIONS = ['search', 'next', 'jump']
+PERCENTILES = [50, 95, 99]
+
+
+class QueryMix:
+    """
+    This class draws the queries of the simulated sessions from weighted sources of case study queries.
+
+    - notes: The queries of the evaluation notes.
+    - titles: Phrase queries with the titles of the case study papers.
+    - generated: The queries of generate_queries.py (or any JSON with topic -> (variant -> query)).
+    """
+    def __init__(self, weights, notes_path=NOTES_PATH, queries_paths=()):
+        """
+        Args:
+            weights: Dict with source -> weight (notes, titles, generated).
+            notes_path: Path of the evaluation notes. Defaults to NOTES_PATH.
+            queries_paths: Paths of JSON files with generated queries. Defaults to none.
+        """
+        from evaluate_case_study import read_notes_queries
+
+        self.sources = {}
+        if weights.get('notes'):
+            self.sources['notes'] = list(next(iter(read_notes_queries(notes_path, 'notes').values())).values())
+        if weights.get('titles'):
+            self.sources['titles'] = [f'"{title}"' for title in load_case_study_titles()]
+        if weights.get('generated'):
+            self.sources['generated'] = []
+            for path in queries_paths:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.sources['generated'] += [query for variants in json.load(f).values() for query in variants.values()]
+        self.sources = {source: queries for source, queries in self.sources.items() if queries}
+        if not self.sources:
+            raise ValueError("The query mix has no queries, check the weights and the query files.")
+        self.names = list(self.sources)
+        self.weights = [weights[source] for source in self.names]
+
+    def sample(self, rng):
+        """
+        Returns a random (source, query string).
+        """
+        source = rng.choices(self.names, weights=self.weights)[0]
+        return source, rng.choice(self.sources[source])
+
+
+class LoadTest:
+    """
+    This class simulates concurrent reviewers of the search demo.
+
+    Every session runs the steps of Userinterface.search without the widgets: the query is built by the QueryParser,
+    checked by the QueryGuard, paginated by an async cursor of the shared Search instance and every page request goes
+    through the SearchScheduler, like in the app. Between two actions a session waits for an exponential think time.
+    """
+    def __init__(self, search, scheduler, query_mix, actions, think_time=1.0, max_jump=10, page_size=10, seed=0):
+        """
+        Args:
+            search: The Search instance shared by all sessions (with an async client).
+            scheduler: The SearchScheduler shared by all sessions.
+            query_mix: The QueryMix.
+            actions: Dict with action (search, next, jump) -> weight, after the first search of a session.
+            think_time: Mean seconds between two actions of a session, 0 for none. Defaults to 1.
+            max_jump: Highest page a session jumps to. Defaults to 10.
+            page_size: Number of hits per page. Defaults to 10.
+            seed: Seed of the sessions.
+        """
+        from src.query_guard import QueryGuard
+        from src.utils import QueryParser
+
+        self.search = search
+        self.scheduler = scheduler
+        self.query_guard = QueryGuard(search)
+        self.query_parser = QueryParser(use_self_implemented=False)
+        self.query_mix = query_mix
+        self.actions = actions
+        self.think_time = think_time
+        self.max_jump = max_jump
+        self.page_size = page_size
+        self.seed = seed
+        self.samples = []
+
+    def record(self, session_id, action, source, outcome, start):
+        self.samples.append({'session': session_id, 'action': action, 'source': source, 'outcome': outcome,
+                             'start': start, 'seconds': time.perf_counter() - start})
+
+    async def fetch_page(self, session_id, cursor, page):
+        """
+        Fetches a page through the scheduler and prepares the documents like the results UI.
+        """
+        from src import Document
+        from src.utils.result_cache import ResultCache
+
+        # Like the UI, the requests of all sessions for the same page of the same shared cursor are coalesced
+        key = ResultCache.make_key(cursor=cursor.key, page=page)
+        response = await self.scheduler.run(session_id, key, partial(cursor.get_page, page))
+        documents = [Document(hit) for hit in response['hits']['hits']]
+        return response, documents
+
+    async def run_session(self, session_id, end_time, ramp_up):
+        """
+        Runs the actions of one session until end_time. The releases of the replaced cursors run in the background
+        and are awaited before the session returns, so no closing of a cursor outlives the client.
+        """
+        rng = random.Random(self.seed * 100003 + session_id)
+        await asyncio.sleep(rng.uniform(0, ramp_up))
+        background = []
+        try:
+            await self.run_actions(session_id, end_time, rng, background)
+        finally:
+            await asyncio.gather(*background, return_exceptions=True)
+
+    async def run_actions(self, session_id, end_time, rng, background):
+        """
+        Runs the actions of one session until end_time and adds the background tasks to the list background.
+        """
+        from src.search_scheduler import SearchQueueFull
+        from src.utils.boolean_query import QuerySyntaxError
+
+        cursor = None
+        page = 1
+        source = None
+        while time.perf_counter() < end_time:
+            action = 'search' if cursor is None else rng.choices(list(self.actions), weights=list(self.actions.values()))[0]
+            num_pages = cursor.num_pages() if cursor is not None else None
+            if action == 'next' and num_pages is not None and page >= num_pages:
+                action = 'search'
+            start = time.perf_counter()
+            try:
+                if action == 'search':
+                    source, query_string = self.query_mix.sample(rng)
+                    query = self.query_parser.build_query(query_string)
+                    decision = await self.query_guard.async_check(query['query'])
+                    if decision.allowed:
+                        if cursor is not None:
+                            # Like the UI, the old cursor is released in the background
+                            background.append(asyncio.ensure_future(self.search.async_release_cursor(cursor)))
+                        cursor = await self.search.async_acquire_cursor(query['query'], page_size=self.page_size)
+                        page = 1
+                elif action == 'next':
+                    page += 1
+                else:
+                    page = rng.randint(1, min(num_pages or 1, self.max_jump))
+                if action == 'search' and not decision.allowed:
+                    self.record(session_id, action, source, 'rejected', start)
+                else:
+                    await self.fetch_page(session_id, cursor, page)
+                    self.record(session_id, action, source, 'ok', start)
+            except SearchQueueFull:
+                self.record(session_id, action, source, 'queue_full', start)
+            except QuerySyntaxError:
+                self.record(session_id, action, source, 'invalid', start)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Session {session_id}: {type(e).__name__}: {e}")
+                self.record(session_id, action, source, 'error', start)
+            if self.think_time:
+                await asyncio.sleep(rng.expovariate(1 / self.think_time))
+        if cursor is not None:
+            background.append(asyncio.ensure_future(self.search.async_release_cursor(cursor)))
+
+    async def run(self, sessions, duration, ramp_up=0.0):
+        """
+        Runs the sessions concurrently.
+
+        Args:
+            sessions: Number of concurrent sessions.
+            duration: Seconds after which the sessions stop starting new actions.
+            ramp_up: Seconds over which the starts of the sessions are spread. Defaults to 0.
+
+        Returns:
+            Seconds from the start until the last session finished.
+        """
+        start = time.perf_counter()
+        end_time = start + duration
+        await asyncio.gather(*(self.run_session(session_id, end_time, ramp_up) for session_id in range(sessions)))
+        return time.perf_counter() - start
+
+
+def summarize(samples, elapsed):
+    """
+    Computes the latency percentiles (in milliseconds) and the throughput of the samples.
+
+    Args:
+        samples: List with the samples of LoadTest.
+        elapsed: Seconds of the test.
+
+    Returns:
+        Dict with the summary of all actions ('all') and per action.
+    """
+    groups = {'all': samples, **{action: [sample for sample in samples if sample['action'] == action] for action in ACTIONS}}
+    summary = {}
+    for name, group in groups.items():
+        if not group:
+            continue
+        ok = np.array([sample['seconds'] for sample in group if sample['outcome'] == 'ok']) * 1000
+        outcomes = {}
+        for sample in group:
+            outcomes[sample['outcome']] = outcomes.get(sample['outcome'], 0) + 1
+        summary[name] = {
+            'count': len(group),
+            'outcomes': outcomes,
+            'throughput': len(ok) / elapsed,
+            'mean_ms': float(ok.mean()) if len(ok) else None,
+            'max_ms': float(ok.max()) if len(ok) else None,
+            **{f'p{p}_ms': float(np.percentile(ok, p)) if len(ok) else None for p in PERCENTILES},
+        }
+    return summary
+
+
+def print_summary(summary, elapsed, sessions, scheduler_stats):
+    print(f"\n{sessions} sessions in {elapsed:.1f}s")
+    header = f"{'action':<8} {'count':>7} {'ok/s':>8} {'mean ms':>9} " + ' '.join(f"{f'p{p} ms':>9}" for p in PERCENTILES) + \
+             f" {'max ms':>9}  outcomes"
+    print(header)
+    for name, values in summary.items():
+        latencies = [values['mean_ms']] + [values[f'p{p}_ms'] for p in PERCENTILES] + [values['max_ms']]
+        latencies = ' '.join(f"{value:>9.1f}" if value is not None else f"{'-':>9}" for value in latencies)
+        outcomes = ', '.join(f"{outcome}: {count}" for outcome, count in sorted(values['outcomes'].items()))
+        print(f"{name:<8} {values['count']:>7} {values['throughput']:>8.1f} {latencies}  {outcomes}")
+    print(f"Scheduler: max queue depth {scheduler_stats['max_queue_depth']}, coalesced {scheduler_stats['coalesced']}, "
+          f"rejected {scheduler_stats['rejected']}, mean wait {scheduler_stats['mean_wait'] * 1000:.1f} ms, "
+          f"p95 wait {scheduler_stats['p95_wait'] * 1000:.1f} ms")
+
+
+def populate_mock(url, index, num_documents, seed=0):
+    """
+    Indexes synthetic documents with the fields shown by the results UI, the case study titles are among them.
+    """
+    from src.elasticsearch_client import ElasticsearchClient
+    from src.indexing import Index
+    from src.utils.constants import IndexFields
+
+    rng = random.Random(seed)
+    titles = load_case_study_titles()
+
+    def build_documents():
+        for i in range(num_documents):
+            title = titles[i] if i < len(titles) else ' '.join(rng.choices(IR_TERMS, k=rng.randint(4, 10))).capitalize()
+            full_text = ' '.join(rng.choices(IR_TERMS, k=rng.randint(500, 3000)))
+            yield {
+                IndexFields.NAME.value: f"paper-{i}",
+                IndexFields.TITLE.value: title,
+                IndexFields.YEAR.value: str(rng.randint(2000, 2024)),
+                IndexFields.VENUE.value: rng.choice(['SIGIR', 'ECIR', 'CIKM', 'TOIS']),
+                IndexFields.AUTHOR.value: [f"Author {rng.randint(1, 500)}" for _ in range(rng.randint(1, 5))],
+                IndexFields.URL.value: f"https://example.org/paper-{i}",
+                IndexFields.ABSTRACT.value: full_text[:1000],
+                IndexFields.PREVIEW.value: full_text[:300],
+                IndexFields.FULL_TEXT.value: full_text,
+            }
+
+    Index(ElasticsearchClient(url)).insert_documents(build_documents(), index=index)
+
+
+def parse_weights(values, names):
+    """
+    Parses name=weight arguments.
+    """
+    weights = {}
+    for value in values:
+        name, _, weight = value.partition('=')
+        if name not in names:
+            raise argparse.ArgumentTypeError(f"Unknown name {name}, expected one of {', '.join(names)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent reviewers searching and paging through results "
+                                                 "and report the latency percentiles and the throughput.")
+    parser.add_argument('--sessions', type=int, default=50, help="Number of concurrent sessions.")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds during which the sessions start new actions.")
+    parser.add_argument('--ramp-up', type=float, default=5, help="Seconds over which the starts of the sessions are spread.")
+    parser.add_argument('--think-time', type=float, default=1.0, help="Mean seconds between two actions of a session, 0 for none.")
+    parser.add_argument('--mix', nargs='+', default=['notes=3', 'titles=1'],
+                        help="Weights of the query sources (notes, titles, generated), e.g. notes=3 titles=1 generated=2.")
+    parser.add_argument('--queries', nargs='*', default=[], help="JSON files with generated queries (topic -> variant -> query).")
+    parser.add_argument('--actions', nargs='+', default=['search=2', 'next=6', 'jump=1'],
+                        help="Weights of the actions after the first search of a session (search, next, jump).")
+    parser.add_argument('--max-jump', type=int, default=10, help="Highest page a session jumps to.")
+    parser.add_argument('--max-concurrent', type=int, default=8, help="Maximum concurrent searches of the scheduler.")
+    parser.add_argument('--max-queue', type=int, default=64, help="Maximum queued searches of the scheduler.")
+    parser.add_argument('--url', default=None, help="URL of an Elasticsearch cluster, by default a local mock is started.")
+    parser.add_argument('--index', default='load_test', help="Index of the mock if ES_INDEX_NAME is not configured.")
+    parser.add_argument('--documents', type=int, default=2000, help="Number of documents in the mock.")
+    parser.add_argument('--latency', type=float, default=0.02, help="Simulated latency per request of the mock in seconds.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="JSON file for the summary and the samples.")
+    args = parser.parse_args()
+
+    mix = parse_weights(args.mix, ['notes', 'titles', 'generated'])
+    actions = parse_weights(args.actions, ACTIONS)
+    # The search modules read ES_INDEX_NAME on import, so it is set before they are imported
+    if constants.ES_INDEX_NAME is None:
+        constants.ES_INDEX_NAME = args.index
+    from src import Search
+    from src.elasticsearch_client import AsyncElasticsearchClient
+    from src.search_scheduler import SearchScheduler
+
+    mock = None
+    url = args.url
+    if url is None:
+        mock = MockElasticsearch(latency=args.latency, seed=args.seed)
+        url = mock.start()
+        print(f"Indexing {args.documents} documents into the mock...")
+        populate_mock(url, constants.ES_INDEX_NAME, args.documents, seed=args.seed)
+        mock.request_counts.clear()
+
+    async def run():
+        async_es_client = AsyncElasticsearchClient(url)
+        search = Search(async_es_client=async_es_client)
+        scheduler = SearchScheduler(max_concurrent=args.max_concurrent, max_queue=args.max_queue)
+        load_test = LoadTest(search, scheduler, QueryMix(mix, queries_paths=args.queries), actions, think_time=args.think_time,
+                             max_jump=args.max_jump, seed=args.seed)
+        await async_es_client()
+        try:
+            elapsed = await load_test.run(args.sessions, args.duration, ramp_up=args.ramp_up)
+        finally:
+            # The released cursors stay idle in the pool as a cache until they are closed here
+            await search.async_close_idle_cursors()
+            await async_es_client.close()
+        return load_test.samples, elapsed, scheduler.stats(), search.cursor_pool.stats()
+
+    try:
+        samples, elapsed, scheduler_stats, cursor_stats = asyncio.run(run())
+    finally:
+        if mock is not None:
+            mock.stop()
+
+    summary = summarize(samples, elapsed)
+    print_summary(summary, elapsed, args.sessions, scheduler_stats)
+    print(f"Cursor pool: {cursor_stats['hits']} of {cursor_stats['hits'] + cursor_stats['misses']} searches reused a cursor "
+          f"({cursor_stats['hit_rate'] * 100:.0f}%)")
+    if mock is not None:
+        print(f"Mock requests: {', '.join(f'{key}: {count}' for key, count in sorted(mock.request_counts.items()))}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'arguments': vars(args), 'elapsed': elapsed, 'summary': summary, 'scheduler': scheduler_stats,
+                       'cursor_pool': cursor_stats, 'samples': samples}, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
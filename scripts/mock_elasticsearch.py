@@ -0,0 +1,316 @@
+import re
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockElasticsearch:
+    """
+    Local stand-in for an Elasticsearch cluster, used by the benchmarks.
+
+    It keeps the indices in memory and answers the API calls used by Index and Search.
+    Bulk requests and items can be rejected with 429 to simulate an overloaded cluster,
+    and every request can be delayed to simulate the cluster latency.
+    """
+    def __init__(self, host='127.0.0.1', port=0, reject_request_rate=0.0, reject_item_rate=0.0, latency=0.0, seed=0,
+                 keep_sources=True):
+        """
+        Args:
+            host: Host to listen on. Defaults to 127.0.0.1.
+            port: Port to listen on. Defaults to 0 (a free port).
+            reject_request_rate: Probability that a whole bulk request is rejected with 429. Defaults to 0.
+            reject_item_rate: Probability that a single bulk item is rejected with 429. Defaults to 0.
+            latency: Seconds every request is delayed. Defaults to 0.
+            seed: Seed for the simulated rejections.
+            keep_sources: Whether to keep the sources of the indexed documents. Without them only the ids are kept,
+                so large ingest benchmarks do not fill the memory. Defaults to True.
+        """
+        self.reject_request_rate = reject_request_rate
+        self.reject_item_rate = reject_item_rate
+        self.latency = latency
+        self.keep_sources = keep_sources
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.indices = {}
+        self.aliases = {}
+        self.pits = {}
+        self.request_counts = {}
+        self.server = ThreadingHTTPServer((host, port), self.create_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """
+        Starts the server in a background thread.
+
+        Returns:
+            The URL of the server.
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.url
+
+    def stop(self):
+        """
+        Stops the server.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    # Index management
+
+    def resolve(self, name):
+        """
+        Resolves a comma-separated list of index names or aliases to the index names.
+        """
+        indices = []
+        for part in name.split(','):
+            indices += sorted(self.aliases[part]) if part in self.aliases else [part]
+        return indices
+
+    def get_index(self, name, create=False):
+        index = self.resolve(name)[0]
+        if index not in self.indices:
+            if not create:
+                return None
+            self.indices[index] = {'docs': {}, 'mappings': {}, 'settings': {}}
+        return self.indices[index]
+
+    def bulk(self, lines, default_index=None):
+        if self.random.random() < self.reject_request_rate:
+            return 429, {'error': {'type': 'es_rejected_execution_exception', 'reason': 'simulated rejection'}, 'status': 429}
+        items = []
+        i = 0
+        while i < len(lines):
+            action = json.loads(lines[i])
+            op, meta = next(iter(action.items()))
+            source = json.loads(lines[i+1]) if op != 'delete' else None
+            i += 1 if op == 'delete' else 2
+            index_name = meta.get('_index', default_index)
+            id = meta.get('_id') or f"{len(items)}-{time.time_ns()}"
+            if self.random.random() < self.reject_item_rate:
+                items.append({op: {'_index': index_name, '_id': id, 'status': 429,
+                                   'error': {'type': 'es_rejected_execution_exception', 'reason': 'simulated rejection'}}})
+                continue
+            index = self.get_index(index_name, create=op != 'delete')
+            if op == 'delete':
+                found = index is not None and index['docs'].pop(id, None) is not None
+                items.append({op: {'_index': index_name, '_id': id, 'status': 200 if found else 404,
+                                   'result': 'deleted' if found else 'not_found'}})
+            else:
+                if op == 'update':
+                    source = {**index['docs'].get(id, {}), **source.get('doc', {})}
+                created = id not in index['docs']
+                index['docs'][id] = source if self.keep_sources else {}
+                items.append({op: {'_index': index_name, '_id': id, 'status': 201 if created else 200,
+                                   'result': 'created' if created else 'updated'}})
+        errors = any(next(iter(item.values()))['status'] >= 300 and 'error' in next(iter(item.values())) for item in items)
+        return 200, {'took': 1, 'errors': errors, 'items': items}
+
+    def search(self, name, body, params):
+        if 'pit' in body:
+            if body['pit']['id'] not in self.pits:
+                return 404, {'error': {'type': 'search_context_missing_exception', 'reason': 'point in time expired'}, 'status': 404}
+            name = self.pits[body['pit']['id']]
+        docs = []
+        for index_name in self.resolve(name):
+            index = self.indices.get(index_name)
+            if index is not None:
+                docs += [(index_name, id, source) for id, source in index['docs'].items()]
+        docs.sort(key=lambda doc: doc[1])
+        terminated_early = 'terminate_after' in body and len(docs) > body['terminate_after']
+        if terminated_early:
+            docs = docs[:body['terminate_after']]
+        from_ = int(body.get('from', params.get('from', 0)))
+        size = int(body.get('size', params.get('size', 10)))
+        if 'search_after' in body:
+            # All hits have the same score, the position is the tiebreaker
+            from_ = body['search_after'][-1] + 1
+        hits = [{'_index': index_name, '_id': id, '_score': 1.0, '_source': source, 'sort': [1.0, from_ + i]}
+                for i, (index_name, id, source) in enumerate(docs[from_:from_+size])]
+        source_filter = body.get('_source', True)
+        for hit in hits:
+            if source_filter is False:
+                del hit['_source']
+            elif isinstance(source_filter, dict):
+                hit['_source'] = {field: value for field, value in hit['_source'].items()
+                                  if field in source_filter.get('includes', [field]) and field not in source_filter.get('excludes', [])}
+        total = len(docs)
+        if params.get('rest_total_hits_as_int') != 'true':
+            total = {'value': total, 'relation': 'eq'}
+        resp = {'took': 1, 'timed_out': False, 'hits': {'total': total, 'max_score': 1.0, 'hits': hits}}
+        if terminated_early:
+            resp['terminated_early'] = True
+        if 'pit' in body:
+            resp['pit_id'] = body['pit']['id']
+        return 200, resp
+
+    @staticmethod
+    def validate_query(query, index_name):
+        """
+        Validates a query like the _validate/query API: query strings need balanced parentheses and quotes.
+        """
+        nodes = [query]
+        query_strings = []
+        while nodes:
+            node = nodes.pop()
+            if isinstance(node, dict):
+                query_strings += [value['query'] for key, value in node.items() if key in ('query_string', 'simple_query_string')]
+                nodes += node.values()
+            elif isinstance(node, list):
+                nodes += node
+        for query_string in query_strings:
+            if query_string.count('(') != query_string.count(')') or query_string.count('"') % 2:
+                return {'valid': False, 'error': f"[{index_name}/mock] QueryShardException[Failed to parse query [{query_string}]]"}
+        return {'valid': True, '_shards': {'total': 1, 'successful': 1, 'failed': 0}}
+
+    def handle(self, method, path, params, body):
+        """
+        Answers one request.
+
+        Returns:
+            Tuple with (status, response body or None).
+        """
+        parts = [part for part in path.split('/') if part]
+        with self.lock:
+            key = parts[-1] if parts and parts[-1].startswith('_') else (parts[0] if parts else '/')
+            self.request_counts[key] = self.request_counts.get(key, 0) + 1
+
+            if not parts:
+                return 200, {'name': 'mock', 'cluster_name': 'mock', 'version': {'number': '8.17.1', 'build_flavor': 'default'},
+                             'tagline': 'You Know, for Search'}
+            if parts[-1] == '_bulk':
+                lines = [line for line in body.decode('utf8').split('\n') if line.strip()]
+                return self.bulk(lines, parts[0] if len(parts) == 2 else None)
+            if parts[-1] == '_msearch':
+                lines = [json.loads(line) for line in body.decode('utf8').split('\n') if line.strip()]
+                responses = []
+                for header, search_body in zip(lines[::2], lines[1::2]):
+                    status, resp = self.search(header.get('index', parts[0] if len(parts) == 2 else None), search_body, params)
+                    responses.append(dict(resp, status=status))
+                return 200, {'took': 1, 'responses': responses}
+            if parts[0] == '_aliases':
+                for action in json.loads(body)['actions']:
+                    op, args = next(iter(action.items()))
+                    if op == 'add':
+                        self.aliases.setdefault(args['alias'], set()).add(args['index'])
+                    elif op == 'remove':
+                        self.aliases.get(args['alias'], set()).discard(args['index'])
+                    elif op == 'remove_index':
+                        self.indices.pop(args['index'], None)
+                self.aliases = {alias: indices for alias, indices in self.aliases.items() if indices}
+                return 200, {'acknowledged': True}
+            if parts[0] == '_alias':
+                indices = self.aliases.get(parts[1])
+                if not indices:
+                    return 404, {'error': 'alias missing', 'status': 404}
+                return 200, {index: {'aliases': {parts[1]: {}}} for index in indices}
+            if parts[-1] == '_pit':
+                if method == 'DELETE':
+                    found = self.pits.pop(json.loads(body)['id'], None) is not None
+                    return (200 if found else 404), {'succeeded': found, 'num_freed': int(found)}
+                pit_id = f'pit-{self.request_counts[key]}-{parts[0]}'
+                self.pits[pit_id] = parts[0]
+                return 200, {'id': pit_id}
+            if parts == ['_search']:
+                return self.search(None, json.loads(body) if body else {}, params)
+            if len(parts) >= 2 and parts[1] in ('_search', '_count'):
+                status, resp = self.search(parts[0], json.loads(body) if body else {}, params)
+                if parts[1] == '_count':
+                    total = resp['hits']['total']
+                    return status, {'count': total if isinstance(total, int) else total['value']}
+                return status, resp
+            if parts[-2:] == ['_validate', 'query']:
+                return 200, self.validate_query(json.loads(body)['query'] if body else {'match_all': {}}, parts[0])
+            if parts[-1] == '_mget':
+                index = self.get_index(parts[0]) if len(parts) == 2 else None
+                includes = params['_source'].split(',') if '_source' in params else None
+                docs = []
+                for id in json.loads(body)['ids']:
+                    if index is None or id not in index['docs']:
+                        docs.append({'_index': parts[0], '_id': id, 'found': False})
+                        continue
+                    source = index['docs'][id]
+                    if includes is not None:
+                        source = {field: value for field, value in source.items() if field in includes}
+                    docs.append({'_index': parts[0], '_id': id, 'found': True, '_source': source})
+                return 200, {'docs': docs}
+            if len(parts) == 3 and parts[1] == '_doc' and method == 'GET':
+                index = self.get_index(parts[0])
+                if index is None or parts[2] not in index['docs']:
+                    return 404, {'_index': parts[0], '_id': parts[2], 'found': False}
+                return 200, {'_index': parts[0], '_id': parts[2], 'found': True, '_source': index['docs'][parts[2]]}
+            if len(parts) == 2 and parts[1] in ('_mapping', '_settings') and method == 'GET':
+                key = 'mappings' if parts[1] == '_mapping' else 'settings'
+                return 200, {index: {key: self.indices[index][key]} for index in self.resolve(parts[0]) if index in self.indices}
+            if len(parts) == 2 and parts[1] in ('_mapping', '_settings'):
+                index = self.get_index(parts[0], create=True)
+                index['mappings' if parts[1] == '_mapping' else 'settings'].update(json.loads(body) if body else {})
+                return 200, {'acknowledged': True}
+            if len(parts) == 2 and parts[1] == '_forcemerge' and params.get('wait_for_completion') == 'false':
+                # The merge finishes at once, the task is reported as completed
+                return 200, {'task': f"mock:{self.request_counts[key]}"}
+            if parts[0] == '_tasks' and len(parts) == 2:
+                return 200, {'completed': True, 'task': {'node': 'mock', 'id': parts[1], 'action': 'indices:admin/forcemerge'},
+                             'response': {'_shards': {'total': 1, 'successful': 1, 'failed': 0}}}
+            if len(parts) == 2 and parts[1] in ('_refresh', '_forcemerge'):
+                return 200, {'_shards': {'total': 1, 'successful': 1, 'failed': 0}}
+            if len(parts) == 1:
+                exists = any(index in self.indices for index in self.resolve(parts[0]))
+                if method == 'HEAD':
+                    return (200 if exists else 404), None
+                if method == 'PUT':
+                    self.indices[parts[0]] = {'docs': {}, 'mappings': {}, 'settings': json.loads(body) if body else {}}
+                    return 200, {'acknowledged': True, 'index': parts[0]}
+                if method == 'DELETE':
+                    for index in self.resolve(parts[0]):
+                        self.indices.pop(index, None)
+                        for alias_indices in self.aliases.values():
+                            alias_indices.discard(index)
+                    self.aliases = {alias: indices for alias, indices in self.aliases.items() if indices}
+                    return 200, {'acknowledged': True}
+            return 404, {'error': f'{method} {path} is not supported by the mock', 'status': 404}
+
+    def create_handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def respond(self):
+                path, _, query = self.path.partition('?')
+                params = dict(re.findall(r'([^&=]+)=([^&]*)', query))
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                if mock.latency:
+                    time.sleep(mock.latency)
+                status, resp = mock.handle(self.command, path, params, body)
+                data = json.dumps(resp).encode('utf8') if resp is not None else b''
+                self.send_response(status)
+                self.send_header('X-Elastic-Product', 'Elasticsearch')
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = respond
+
+        return Handler
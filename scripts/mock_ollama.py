@@ -0,0 +1,137 @@
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOPIC_PATTERN = re.compile(r'on the topic of (.+?)\. ')
+WORD_PATTERN = re.compile(r'[A-Za-z]+')
+
+
+class MockOllama:
+    """
+    Local stand-in for an ollama server, used to test and benchmark the query generation without a model.
+
+    It answers /api/generate with deterministic responses that depend on the prompt and the seed: a list of
+    sub-topics, a list of synonyms or a Boolean query built from the words of the topic. Every request can be
+    delayed to simulate the generation time, and requests can fail with 500 to simulate an overloaded server.
+    """
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0, seed=0):
+        """
+        Args:
+            host: Host to listen on. Defaults to 127.0.0.1.
+            port: Port to listen on. Defaults to 0 (a free port).
+            latency: Seconds every request is delayed. Defaults to 0.
+            error_rate: Probability that a request fails with 500. Defaults to 0.
+            seed: Seed for the simulated errors.
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self.server = ThreadingHTTPServer((host, port), self.create_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """
+        Starts the server in a background thread.
+
+        Returns:
+            The URL of the server.
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.url
+
+    def stop(self):
+        """
+        Stops the server.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @staticmethod
+    def respond_to(prompt, seed):
+        """
+        Returns the response to a prompt.
+        """
+        match = TOPIC_PATTERN.search(prompt)
+        words = [word.lower() for word in WORD_PATTERN.findall(match.group(1) if match else prompt) if len(word) > 3]
+        # The seed selects a different subset of words, like sampling a different query variant
+        digest = hashlib.sha256(f'{seed}'.encode('utf8')).digest()
+        words = [word for i, word in enumerate(words) if digest[i % len(digest)] % 4 != 0] or words
+        if 'list of these sub-topics' in prompt:
+            return '\n'.join(f'- {word}' for word in words)
+        if 'synonyms for each of these sub-topics' in prompt:
+            return '\n'.join(f'- {word}: {word}s, {word}*' for word in words)
+        return '```\n' + ' OR '.join(f'({word} OR "{word} research")' for word in words) + '\n```'
+
+    def generate(self, body):
+        """
+        Answers one /api/generate request.
+
+        Returns:
+            Tuple with (status, response body).
+        """
+        with self.lock:
+            self.requests += 1
+            failed = self.random.random() < self.error_rate
+        if failed:
+            return 500, {'error': 'simulated server error'}
+        seed = (body.get('options') or {}).get('seed')
+        return 200, {'model': body.get('model', ''), 'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                     'response': self.respond_to(body.get('prompt', ''), seed), 'done': True, 'done_reason': 'stop'}
+
+    def create_handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def respond(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else {}
+                with mock.lock:
+                    mock.active += 1
+                    mock.max_active = max(mock.max_active, mock.active)
+                try:
+                    if mock.latency:
+                        time.sleep(mock.latency)
+                    if self.path == '/api/generate':
+                        status, resp = mock.generate(body)
+                    else:
+                        status, resp = 404, {'error': f'{self.command} {self.path} is not supported by the mock'}
+                finally:
+                    with mock.lock:
+                        mock.active -= 1
+                data = json.dumps(resp).encode('utf8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = respond
+
+        return Handler
@@ -1,10 +1,31 @@
 import sys
 import os
+import argparse
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.dirname(SCRIPT_DIR))
 
 from src import Index
 
+parser = argparse.ArgumentParser(description="Reindex the IR Anthology.")
+parser.add_argument('--bulk-size', type=int, default=100, help="Maximum number of documents per bulk-operation.")
+parser.add_argument('--bulk-bytes', type=int, default=10 * 1024 * 1024, help="Maximum size of one bulk-operation in bytes.")
+parser.add_argument('--parallel-bulks', type=int, default=4, help="Number of bulk-operations sent in parallel.")
+parser.add_argument('--num-workers', type=int, default=1, help="Number of processes used to load the files (0 for one per CPU core).")
+parser.add_argument('--chunksize', type=int, default=1, help="Number of venue directories sent to a loading process at once.")
+parser.add_argument('--max-in-flight', type=int, default=4, help="Number of chunks of venue directories loaded ahead of the indexing.")
+parser.add_argument('--sync', action='store_true', help="Only index the changes since the last run instead of rebuilding the index.")
+parser.add_argument('--zero-downtime', action='store_true', help="Rebuild into a new index and switch the alias atomically.")
+parser.add_argument('--embeddings', action='store_true', help="Add the embeddings of the documents.")
+parser.add_argument('--full-text-index-options', choices=['offsets', 'term_vectors'], default=None,
+                    help="Index the offsets or term vectors of the full-text for faster highlighting (only for a new index).")
+args = parser.parse_args()
+
 index = Index()
-index.reindex()
+options = dict(bulk_size=args.bulk_size, bulk_bytes=args.bulk_bytes, parallel_bulks=args.parallel_bulks,
+               num_workers=args.num_workers or None, chunksize=args.chunksize, max_in_flight=args.max_in_flight,
+               embeddings=args.embeddings, full_text_index_options=args.full_text_index_options)
+if args.sync:
+    index.sync(**options)
+else:
+    index.reindex(**options, zero_downtime=args.zero_downtime)
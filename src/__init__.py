@@ -1,5 +1,25 @@
-from src.indexing import Index
-from src.search import Search
-from src.elasticsearch_client import ElasticsearchClient
-from src.document import Document
-from src.userinterface import start_app
+import importlib
+
+# The subsystems are imported on first access (e.g. src.Index), so scripts only load what they use:
+# the UI pulls in nicegui, the indexing pybtex, tqdm and the embedding libraries
+LAZY_ATTRIBUTES = {
+    'Index': 'src.indexing',
+    'Search': 'src.search',
+    'ElasticsearchClient': 'src.elasticsearch_client',
+    'Document': 'src.document',
+    'start_app': 'src.userinterface',
+}
+
+__all__ = list(LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name not in LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,210 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import json
+import time
+import random
+
+from elasticsearch import ApiError, ConnectionError, ConnectionTimeout
+
+from src.elasticsearch_client import ElasticsearchClient
+
+# Status codes of rejected requests or items that are worth retrying
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+class BulkResult:
+    """
+    This class collects the outcome of a bulk ingestion.
+    """
+    def __init__(self):
+        self.succeeded = 0
+        self.failed = []
+        self.retries = 0
+        self.requests = 0
+        self.bytes = 0
+
+    def add_failure(self, id, status, error):
+        """
+        Records a document that could not be indexed.
+
+        Args:
+            id: Elasticsearch id of the document.
+            status: HTTP status of the document in the bulk response.
+            error: Error of the document in the bulk response.
+        """
+        self.failed.append({'id': id, 'status': status, 'error': error})
+
+    def summary(self, max_failures=10):
+        """
+        Returns a human readable summary of the bulk ingestion.
+
+        Args:
+            max_failures: Maximum number of failed documents listed. Defaults to 10.
+
+        Returns:
+            String with the summary.
+        """
+        s = (f"{self.succeeded} documents succeeded, {len(self.failed)} failed "
+             f"({self.requests} bulk requests, {self.retries} retries, {self.bytes / (1024 * 1024):.1f} MB)")
+        for failure in self.failed[:max_failures]:
+            s += f"\n  {failure['id']}: {failure['status']} {failure['error']}"
+        if len(self.failed) > max_failures:
+            s += f"\n  ... and {len(self.failed) - max_failures} more"
+        return s
+
+
+class BulkIndexer:
+    """
+    This class handles the bulk ingestion into Elasticsearch.
+
+    Operations are grouped into bulk requests limited by the number of documents and by their size in bytes.
+    Several bulk requests are sent in parallel. Rejected requests (429) and rejected items are retried
+    with exponential backoff, all other failed items are collected in the BulkResult.
+    """
+    def __init__(self, es_client: ElasticsearchClient, max_documents=100, max_bytes=10 * 1024 * 1024, max_in_flight=4,
+                 max_retries=5, initial_backoff=0.5, max_backoff=30.0):
+        """
+        Args:
+            es_client: The Elasticsearch client.
+            max_documents: Maximum number of documents in one bulk request. Defaults to 100.
+            max_bytes: Maximum size of one bulk request in bytes. Defaults to 10 MB.
+            max_in_flight: Maximum number of bulk requests sent in parallel. Defaults to 4.
+            max_retries: Maximum number of retries of a rejected request or item. Defaults to 5.
+            initial_backoff: Seconds to wait before the first retry, doubled for every further retry. Defaults to 0.5.
+            max_backoff: Maximum seconds to wait before a retry. Defaults to 30.
+        """
+        self.es_client = es_client
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+    def serialize(self, data):
+        """
+        Serializes an action or document to one line of the bulk body.
+
+        Args:
+            data: Dict to serialize.
+
+        Returns:
+            UTF-8 encoded JSON.
+        """
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf8')
+
+    def iter_batches(self, operations):
+        """
+        Serializes the operations and groups them into batches.
+
+        Args:
+            operations: Iterable of tuples with (action, source). The source is None for delete actions.
+
+        Yields:
+            List with tuples of (id, serialized lines) per bulk request.
+        """
+        batch = []
+        batch_bytes = 0
+        for action, source in operations:
+            id = next(iter(action.values())).get('_id')
+            lines = [self.serialize(action)] if source is None else [self.serialize(action), self.serialize(source)]
+            size = sum(len(line) + 1 for line in lines)
+            if batch and (len(batch) >= self.max_documents or batch_bytes + size > self.max_bytes):
+                yield batch
+                batch = []
+                batch_bytes = 0
+            batch.append((id, lines))
+            batch_bytes += size
+        if batch:
+            yield batch
+
+    def get_backoff(self, attempt):
+        """
+        Returns the seconds to wait before a retry (exponential backoff with jitter).
+
+        Args:
+            attempt: Number of the retry, starting at 0.
+
+        Returns:
+            Seconds to wait.
+        """
+        return min(self.max_backoff, self.initial_backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def send_batch(self, batch):
+        """
+        Sends one batch as bulk request and retries rejected requests and items.
+
+        Args:
+            batch: List with tuples of (id, serialized lines).
+
+        Returns:
+            BulkResult of this batch.
+        """
+        result = BulkResult()
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                result.retries += 1
+                time.sleep(self.get_backoff(attempt - 1))
+            body = [line for _, lines in batch for line in lines]
+            result.requests += 1
+            result.bytes += sum(len(line) + 1 for line in body)
+            try:
+                resp = self.es_client().bulk(operations=body)
+            except (ApiError, ConnectionError, ConnectionTimeout) as e:
+                status = getattr(e, 'status_code', None)
+                if (status is None or status in RETRY_STATUS_CODES) and attempt < self.max_retries:
+                    continue
+                for id, _ in batch:
+                    result.add_failure(id, status, str(e))
+                return result
+
+            if not resp['errors']:
+                result.succeeded += len(batch)
+                return result
+
+            retry_batch = []
+            for (id, lines), item in zip(batch, resp['items']):
+                item = next(iter(item.values()))
+                status = item.get('status', 500)
+                if status < 300 or (status == 404 and 'error' not in item):
+                    # A 404 without error is a delete of a missing document
+                    result.succeeded += 1
+                elif status in RETRY_STATUS_CODES and attempt < self.max_retries:
+                    retry_batch.append((id, lines))
+                else:
+                    result.add_failure(id, status, item.get('error'))
+            if not retry_batch:
+                return result
+            batch = retry_batch
+        return result
+
+    def run(self, operations):
+        """
+        Sends all operations to Elasticsearch.
+
+        The operations are consumed lazily, so at most max_in_flight + 1 batches are held in memory.
+
+        Args:
+            operations: Iterable of tuples with (action, source). The source is None for delete actions.
+
+        Returns:
+            BulkResult with the summary of all bulk requests.
+        """
+        result = BulkResult()
+
+        def merge(batch_result):
+            result.succeeded += batch_result.succeeded
+            result.failed += batch_result.failed
+            result.retries += batch_result.retries
+            result.requests += batch_result.requests
+            result.bytes += batch_result.bytes
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            pending = deque()
+            for batch in self.iter_batches(operations):
+                if len(pending) >= self.max_in_flight:
+                    merge(pending.popleft().result())
+                pending.append(executor.submit(self.send_batch, batch))
+            while pending:
+                merge(pending.popleft().result())
+        return result
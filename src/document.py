@@ -10,14 +10,15 @@ class Document:
         self._index = document_dict['_index']
         self._id = document_dict['_id']
         self._score = document_dict['_score']
-        self._source = document_dict['_source']
+        self._source = document_dict.get('_source', {})
         try:
-            self.highlight = document_dict['highlight']
-            if not self.highlight[IndexFields.FULL_TEXT.value]:
-                self.highlight.update({IndexFields.FULL_TEXT.value: [str(self.full_text[:300])]})
+            # Copy the highlights, the response might be shared through the result cache
+            self.highlight = dict(document_dict['highlight'])
+            if not self.highlight.get(IndexFields.FULL_TEXT.value):
+                self.highlight.update({IndexFields.FULL_TEXT.value: [self.get_preview()]})
         except:
             self.highlight = {field.value: ["<em>Cannot show snippet for this query.</em>"] for field in IndexFields}
-            self.highlight.update({IndexFields.FULL_TEXT.value: [str(self.full_text[:300])]})
+            self.highlight.update({IndexFields.FULL_TEXT.value: [self.get_preview()]})
     
     def __getattr__(self, name: str) -> Any:
         return self._source[name]
@@ -25,9 +26,18 @@ class Document:
     def __str__(self) -> str:
         s = "-----------------------------------------------------------------------\n"
         for field in IndexFields:
-            s += f"{field.value}: {self._source[field.value]}\n"
+            s += f"{field.value}: {self._source.get(field.value)}\n"
         s += "-----------------------------------------------------------------------"
         return s
     
+    def get_preview(self):
+        """
+        Returns the preview of the full-text: the stored preview field, or the start of the full-text for documents indexed without it.
+        """
+        preview = self._source.get(IndexFields.PREVIEW.value)
+        if preview is None:
+            preview = self._source.get(IndexFields.FULL_TEXT.value, "")[:300]
+        return str(preview)
+
     def get_highlight(self, field: str):
         return self.highlight[field]
@@ -0,0 +1,210 @@
+import re
+
+from src.utils.constants import IndexFields
+
+# Maximum number of characters of the preview of the full-text
+PREVIEW_LENGTH = 300
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# LaTeX cleanup rules, applied in this order
+LATEX_RULES = [
+    (re.compile(r'\\.*?{([^}]*)}'), '\\1'), # Commands like \textit{...}
+    (re.compile(r'{([^}]*)}'), '\\1'), # Braces like {IR}
+]
+
+
+def clean_latex(value):
+    """
+    Removes LaTeX commands and braces from a string.
+
+    Args:
+        value: String to clean.
+
+    Returns:
+        The cleaned string.
+    """
+    for pattern, replacement in LATEX_RULES:
+        value = pattern.sub(replacement, value)
+    return value
+
+def clean_persons(persons):
+    """
+    Cleans a list of persons: erroneous persons are replaced by an empty string and LaTeX is removed.
+
+    Args:
+        persons: List with the persons as strings.
+
+    Returns:
+        The cleaned list.
+    """
+    return ["" if "ERROR" in person else clean_latex(person) for person in persons]
+
+def remove_backslashes(value):
+    """
+    Removes all backslashes from a string (e.g. escaped underscores in URLs).
+
+    Args:
+        value: String to clean.
+
+    Returns:
+        The cleaned string.
+    """
+    return value.replace('\\', '')
+
+def to_int(value):
+    """
+    Converts a value to an integer.
+
+    Args:
+        value: String or integer.
+
+    Returns:
+        The integer, or None if the value is not a number.
+    """
+    value = str(value).strip()
+    return int(value) if value.isdigit() else None
+
+def make_preview(value):
+    """
+    Returns the preview of a text: its first PREVIEW_LENGTH characters with collapsed whitespace.
+
+    Args:
+        value: The text.
+
+    Returns:
+        The preview.
+    """
+    return WHITESPACE_PATTERN.sub(' ', value[:PREVIEW_LENGTH * 2]).strip()[:PREVIEW_LENGTH].rstrip()
+
+def bib_type():
+    """
+    Returns an extractor of the type of the bib-entry.
+    """
+    def extract(info_dict):
+        bib_data = info_dict.get('bib-data')
+        return bib_data.type if bib_data is not None else None
+    return extract
+
+def bib_field(name):
+    """
+    Returns an extractor of a field of the bib-entry.
+
+    Args:
+        name: Name of the bib-field.
+    """
+    def extract(info_dict):
+        bib_data = info_dict.get('bib-data')
+        return bib_data.fields.get(name) if bib_data is not None else None
+    return extract
+
+def bib_persons(role):
+    """
+    Returns an extractor of the persons of the bib-entry as list of strings.
+
+    Args:
+        role: Role of the persons (author or editor).
+    """
+    def extract(info_dict):
+        bib_data = info_dict.get('bib-data')
+        persons = bib_data.persons.get(role) if bib_data is not None else None
+        return [str(person) for person in persons] if persons is not None else None
+    return extract
+
+def full_text():
+    """
+    Returns an extractor of the full-text.
+    """
+    def extract(info_dict):
+        return info_dict.get('full-text')
+    return extract
+
+def json_field(name):
+    """
+    Returns an extractor of a field of the data from the json-file.
+
+    Args:
+        name: Name of the field.
+    """
+    def extract(info_dict):
+        json_data = info_dict.get('json-data')
+        return json_data.get(name) if isinstance(json_data, dict) else None
+    return extract
+
+
+class FieldSpec:
+    """
+    This class describes how a field of the index document is built.
+    """
+    def __init__(self, extract, normalize=None, default=str):
+        """
+        Args:
+            extract: Function returning the raw value from the info_dict, or None if it is missing.
+            normalize: Function normalizing the raw value in a single pass. Defaults to None (keep the value).
+            default: Factory of the value used if the raw value is missing. Defaults to str (an empty string).
+        """
+        self.extract = extract
+        self.normalize = normalize
+        self.default = default
+
+    def build(self, info_dict):
+        """
+        Returns the value of the field for the given info_dict.
+        """
+        value = self.extract(info_dict)
+        if value is None:
+            return self.default()
+        return self.normalize(value) if self.normalize else value
+
+
+# Declarative schema of the index documents (without the name, which is the bib-id)
+DOCUMENT_SCHEMA = {
+    IndexFields.BIB_TYPE: FieldSpec(bib_type()),
+    IndexFields.TITLE: FieldSpec(bib_field('title'), clean_latex),
+    IndexFields.YEAR: FieldSpec(bib_field('year'), to_int, default=type(None)),
+    IndexFields.BOOKTITLE: FieldSpec(bib_field('booktitle')),
+    IndexFields.SERIES: FieldSpec(bib_field('series')),
+    IndexFields.AUTHOR: FieldSpec(bib_persons('author'), clean_persons, default=list),
+    IndexFields.EDITOR: FieldSpec(bib_persons('editor'), clean_persons, default=list),
+    IndexFields.FULL_TEXT: FieldSpec(full_text()),
+    IndexFields.VENUE: FieldSpec(bib_field('venue')),
+    IndexFields.URL: FieldSpec(bib_field('url'), remove_backslashes),
+    IndexFields.DOI: FieldSpec(bib_field('doi'), remove_backslashes),
+    IndexFields.OPENACCESS: FieldSpec(bib_field('openaccess')),
+    IndexFields.ABSTRACT: FieldSpec(json_field('abstract')),
+    IndexFields.PREVIEW: FieldSpec(full_text(), make_preview),
+}
+
+
+def build_document(bib_id, info_dict, schema=DOCUMENT_SCHEMA):
+    """
+    Returns the formatted document for the Elasticsearch index.
+
+    Args:
+        bib_id: Identifier in the bib-file for this paper.
+        info_dict: Dict containing the data about the paper (from the get_all_files-method).
+        schema: Dict with IndexFields -> FieldSpec. Defaults to DOCUMENT_SCHEMA.
+
+    Returns:
+        Dict containing the paper as formatted for the Elasticsearch index.
+    """
+    document = {IndexFields.NAME.value: bib_id}
+    for field, spec in schema.items():
+        document[field.value] = spec.build(info_dict)
+    return document
+
+def normalize_document(document, schema=DOCUMENT_SCHEMA):
+    """
+    Applies the normalization of the schema to an already built document.
+
+    Args:
+        document: Dict containing the document as formatted for the Elasticsearch index.
+        schema: Dict with IndexFields -> FieldSpec. Defaults to DOCUMENT_SCHEMA.
+
+    Returns:
+        The normalized document.
+    """
+    for field, spec in schema.items():
+        value = document.get(field.value)
+        if spec.normalize and value not in (None, ""):
+            document[field.value] = spec.normalize(value)
+    return document
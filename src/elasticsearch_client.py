@@ -1,9 +1,11 @@
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, AsyncElasticsearch
 from pprint import pprint
 from dotenv import load_dotenv
+import asyncio
+import time
 import os
 
-from src.utils.constants import ES_URL
+from src.utils.constants import ES_URL, ES_CONNECTIONS_PER_NODE, ES_HEALTH_CHECK_INTERVAL
 
 load_dotenv()
 
@@ -12,17 +14,129 @@ ES_USER = os.getenv('ES_USER')
 ES_PASSWORD = os.getenv('ES_PASSWORD')
 
 
-class ElasticsearchClient:
+def get_connection_args(url=None, basic_auth=None):
     """
-    This class handles the Elasticsearch client instance.
+    Returns the URL and authentication of Elasticsearch.
+
+    Args:
+        url: URL of Elasticsearch. Defaults to None (ES_URL with ES_USER and ES_PASSWORD from the environment).
+        basic_auth: Tuple with (user, password) for the given url. Defaults to None (no authentication).
+
+    Returns:
+        Tuple with (url, basic_auth).
     """
-    def __init__(self):
+    if url is None:
         if ES_USER == None or ES_PASSWORD == None:
             raise Exception("No Authentication provided for Elasticsearch.")
-        self.client = Elasticsearch(ES_URL, basic_auth=(ES_USER, ES_PASSWORD), request_timeout=30)
+        url = ES_URL
+        basic_auth = (ES_USER, ES_PASSWORD)
+    return url, basic_auth
+
+
+class ElasticsearchClient:
+    """
+    This class handles the Elasticsearch client instance.
+    """
+    def __init__(self, url=None, basic_auth=None):
+        """
+        Args:
+            url: URL of Elasticsearch. Defaults to None (ES_URL with ES_USER and ES_PASSWORD from the environment).
+            basic_auth: Tuple with (user, password) for the given url. Defaults to None (no authentication).
+        """
+        url, basic_auth = get_connection_args(url, basic_auth)
+        self.client = Elasticsearch(url, basic_auth=basic_auth, request_timeout=30)
         client_info = self.client.info()
         print('Connected to Elasticsearch!')
         pprint(client_info.body)
-    
+
     def __call__(self, *args, **kwds):
         return self.client
+
+
+class AsyncElasticsearchClient:
+    """
+    This class handles an AsyncElasticsearch client instance, which can be shared by all sessions of the app.
+
+    The client connects lazily with the first request. Its health is checked with a ping at most
+    every health_check_interval seconds, and a client whose cluster is unreachable is replaced by a new one.
+    Usage: client = await async_es_client()
+    """
+    def __init__(self, url=None, basic_auth=None, connections_per_node=ES_CONNECTIONS_PER_NODE,
+                 health_check_interval=ES_HEALTH_CHECK_INTERVAL):
+        """
+        Args:
+            url: URL of Elasticsearch. Defaults to None (ES_URL with ES_USER and ES_PASSWORD from the environment).
+            basic_auth: Tuple with (user, password) for the given url. Defaults to None (no authentication).
+            connections_per_node: Size of the connection pool per node. Defaults to ES_CONNECTIONS_PER_NODE.
+            health_check_interval: Minimum seconds between two health checks. Defaults to ES_HEALTH_CHECK_INTERVAL.
+        """
+        self.url, self.basic_auth = get_connection_args(url, basic_auth)
+        self.connections_per_node = connections_per_node
+        self.health_check_interval = health_check_interval
+        self.client = None
+        self.checked_at = None
+        self.lock = None
+
+    async def __call__(self, *args, **kwds):
+        if self.client is not None and time.monotonic() - self.checked_at < self.health_check_interval:
+            return self.client
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            # Another request might have connected or checked the client while waiting for the lock
+            if self.client is not None and time.monotonic() - self.checked_at < self.health_check_interval:
+                return self.client
+            if self.client is not None and not await self.client.ping():
+                print('Elasticsearch is unreachable, reconnecting.')
+                await self.close()
+            if self.client is None:
+                await self.connect()
+            self.checked_at = time.monotonic()
+        return self.client
+
+    async def connect(self):
+        """
+        Creates the client and checks the connection.
+        """
+        client = AsyncElasticsearch(self.url, basic_auth=self.basic_auth, request_timeout=30,
+                                    connections_per_node=self.connections_per_node)
+        try:
+            client_info = await client.info()
+        except Exception:
+            await client.close()
+            raise
+        print('Connected to Elasticsearch!')
+        pprint(client_info.body)
+        self.client = client
+
+    async def close(self):
+        """
+        Closes the client and its connections.
+        """
+        client, self.client = self.client, None
+        if client is not None:
+            await client.close()
+
+
+ELASTICSEARCH_CLIENT = None
+ASYNC_ELASTICSEARCH_CLIENT = None
+
+
+def get_elasticsearch_client():
+    """
+    Returns the process-wide ElasticsearchClient.
+    """
+    global ELASTICSEARCH_CLIENT
+    if ELASTICSEARCH_CLIENT is None:
+        ELASTICSEARCH_CLIENT = ElasticsearchClient()
+    return ELASTICSEARCH_CLIENT
+
+
+def get_async_elasticsearch_client():
+    """
+    Returns the process-wide AsyncElasticsearchClient. It connects with the first request.
+    """
+    global ASYNC_ELASTICSEARCH_CLIENT
+    if ASYNC_ELASTICSEARCH_CLIENT is None:
+        ASYNC_ELASTICSEARCH_CLIENT = AsyncElasticsearchClient()
+    return ASYNC_ELASTICSEARCH_CLIENT
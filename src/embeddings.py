@@ -0,0 +1,235 @@
+import os
+import re
+import hashlib
+import numpy as np
+
+from src.utils.constants import EMBEDDING_MODEL_NAME, EMBEDDING_CACHE_PATH
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+class HashingEmbeddingModel:
+    """
+    Small embedding model based on hashed bag-of-words vectors.
+    It runs on CPU without downloads and can be used instead of a sentence transformer for tests and benchmarks.
+    """
+    def __init__(self, dims=256):
+        self.dims = dims
+
+    def get_sentence_embedding_dimension(self):
+        return self.dims
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        """
+        Returns the normalized embeddings of the texts.
+
+        Args:
+            texts: A string or a list of strings.
+            batch_size: Unused, for compatibility with sentence transformers.
+
+        Returns:
+            Numpy array with one embedding per text (or a single embedding for a string).
+        """
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+        vectors = np.zeros((len(texts), self.dims), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in TOKEN_PATTERN.findall(text.lower()):
+                digest = hashlib.blake2b(token.encode('utf8'), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], 'little') % self.dims
+                vectors[i, bucket] += 1.0 if digest[4] & 1 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+        return vectors[0] if single else vectors
+
+
+class VectorCache:
+    """
+    Content-addressed on-disk store of embedding vectors.
+
+    The vectors are appended to a raw float32 file which is read through a memory map,
+    and the keys (content hashes) are appended to a text file, where line i is the key of row i.
+    The vectors are written before their keys, and both files are cut back to their complete rows when the cache
+    is opened (see load_rows), so an interrupted run never maps a key to the vector of another key.
+    """
+    def __init__(self, path, dims):
+        self.path = path
+        self.dims = dims
+        os.makedirs(path, exist_ok=True)
+        self.vectors_path = os.path.join(path, f'vectors-{dims}.f32')
+        self.keys_path = os.path.join(path, f'keys-{dims}.txt')
+        self.rows = {}
+        if os.path.exists(self.keys_path):
+            self.rows = self.load_rows()
+        if os.path.exists(self.vectors_path):
+            # Drop vectors without key from an interrupted write
+            with open(self.vectors_path, 'r+b') as f:
+                f.truncate(len(self.rows) * dims * 4)
+        self.vectors = None
+        self.map_vectors()
+
+    def load_rows(self):
+        """
+        Reads the keys and repairs the files after an interrupted write: a partially written last key line is removed,
+        so the next put starts on a new line, and keys without a completely written vector are dropped.
+
+        Returns:
+            Dict with key -> row of its vector.
+        """
+        with open(self.keys_path, 'rb') as f:
+            data = f.read()
+        complete = data[:data.rfind(b'\n') + 1]
+        keys = complete.decode('utf8').splitlines()
+        num_vectors = os.path.getsize(self.vectors_path) // (self.dims * 4) if os.path.exists(self.vectors_path) else 0
+        if len(keys) > num_vectors:
+            # The vectors are written before the keys, so this only happens if the vector file was damaged
+            print(f"Warning: {len(keys)} keys but {num_vectors} vectors in {self.path}, dropping the keys without vector.")
+            keys = keys[:num_vectors]
+            complete = ''.join(f'{key}\n' for key in keys).encode('utf8')
+        if complete != data:
+            with open(self.keys_path, 'wb') as f:
+                f.write(complete)
+        return {key: row for row, key in enumerate(keys)}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def map_vectors(self):
+        """
+        (Re-)creates the memory map of the vector file.
+        """
+        if self.rows:
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(len(self.rows), self.dims))
+
+    def get(self, keys):
+        """
+        Returns the cached vectors of the given keys.
+
+        Args:
+            keys: List with content hashes.
+
+        Returns:
+            Dict with key -> vector for the keys in the cache.
+        """
+        return {key: np.array(self.vectors[self.rows[key]]) for key in keys if key in self.rows}
+
+    def put(self, keys, vectors):
+        """
+        Appends new vectors to the cache.
+
+        Args:
+            keys: List with content hashes.
+            vectors: Numpy array with one vector per key.
+        """
+        new = [(key, vector) for key, vector in zip(keys, vectors) if key not in self.rows]
+        if not new:
+            return
+        # Write the vectors before the keys, so an interrupted write never maps a key to a missing vector
+        with open(self.vectors_path, 'ab') as f:
+            f.write(np.asarray([vector for _, vector in new], dtype=np.float32).tobytes())
+        with open(self.keys_path, 'a', encoding='utf8') as f:
+            f.write(''.join(f'{key}\n' for key, _ in new))
+        for key, _ in new:
+            self.rows[key] = len(self.rows)
+        self.map_vectors()
+
+
+class Embedder:
+    """
+    This class handles the batched embedding of texts with a cache of the vectors.
+
+    Long texts are split into chunks of at most max_chars characters (at most max_chunks chunks,
+    the rest is truncated). Every chunk is embedded once and cached by the hash of the model name and its text,
+    and the embedding of a text is the normalized mean of its chunk embeddings.
+    """
+    def __init__(self, model=None, model_name=EMBEDDING_MODEL_NAME, cache_path=EMBEDDING_CACHE_PATH, batch_size=32,
+                 max_chars=2000, max_chunks=8):
+        """
+        Args:
+            model: Model with encode and get_sentence_embedding_dimension (like a sentence transformer).
+                Defaults to None (load the sentence transformer model_name).
+            model_name: Name of the model, part of the cache keys. Defaults to EMBEDDING_MODEL_NAME.
+            cache_path: Directory of the vector cache, None to disable it. Defaults to EMBEDDING_CACHE_PATH.
+            batch_size: Number of chunks encoded at once. Defaults to 32.
+            max_chars: Maximum number of characters of a chunk. Defaults to 2000.
+            max_chunks: Maximum number of chunks per text. Defaults to 8.
+        """
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(model_name, trust_remote_code=True)
+        self.model = model
+        self.model_name = model_name
+        self.dims = model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+        self.max_chars = max_chars
+        self.max_chunks = max_chunks
+        self.cache = VectorCache(os.path.join(cache_path, self.safe_model_name()), self.dims) if cache_path else None
+
+    def safe_model_name(self):
+        return re.sub(r'[^\w.-]', '_', self.model_name)
+
+    def split(self, text):
+        """
+        Splits a text into chunks of at most max_chars characters, preferably at whitespace.
+
+        Args:
+            text: The text to split.
+
+        Returns:
+            List with at most max_chunks chunks.
+        """
+        chunks = []
+        start = 0
+        while start < len(text) and len(chunks) < self.max_chunks:
+            end = min(start + self.max_chars, len(text))
+            if end < len(text):
+                whitespace = text.rfind(' ', start, end)
+                if whitespace > start:
+                    end = whitespace
+            chunks.append(text[start:end])
+            start = end
+        return chunks or [""]
+
+    def get_key(self, chunk):
+        return hashlib.sha1(f'{self.model_name}\n{chunk}'.encode('utf8')).hexdigest()
+
+    def embed(self, texts):
+        """
+        Returns the embeddings of the texts, using the cached vectors of known chunks.
+
+        Args:
+            texts: List with the texts.
+
+        Returns:
+            Numpy array with one normalized embedding per text.
+        """
+        chunks = [self.split(text) for text in texts]
+        keys = [[self.get_key(chunk) for chunk in text_chunks] for text_chunks in chunks]
+
+        # Encode the chunks that are not in the cache
+        vectors = self.cache.get({key for text_keys in keys for key in text_keys}) if self.cache is not None else {}
+        missing = {}
+        for text_chunks, text_keys in zip(chunks, keys):
+            for chunk, key in zip(text_chunks, text_keys):
+                if key not in vectors:
+                    missing[key] = chunk
+        if missing:
+            missing_keys = list(missing)
+            encoded = np.asarray(self.model.encode([missing[key] for key in missing_keys], batch_size=self.batch_size), dtype=np.float32)
+            vectors.update(zip(missing_keys, encoded))
+            if self.cache is not None:
+                self.cache.put(missing_keys, encoded)
+
+        # Mean-pool the chunks of every text
+        embeddings = np.asarray([np.mean([vectors[key] for key in text_keys], axis=0) for text_keys in keys], dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.where(norms == 0, 1, norms)
+
+    def encode(self, text):
+        """
+        Returns the embedding of a single text.
+        """
+        return self.embed([text])[0]
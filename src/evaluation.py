@@ -0,0 +1,205 @@
+import os
+import re
+import csv
+import json
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+
+NON_ALPHANUMERIC_PATTERN = re.compile(r'[^0-9a-z]+')
+
+
+@lru_cache(maxsize=100000)
+def normalize_title(title):
+    """
+    Returns the normalized form of a paper title, so that titles only differing in case, accents,
+    punctuation or whitespace match (e.g. "FA*IR: A Fair Top-k..." and "FA IR a fair top k...").
+
+    Args:
+        title: The title.
+
+    Returns:
+        The normalized title.
+    """
+    title = unicodedata.normalize('NFKD', title or '')
+    title = ''.join(char for char in title if not unicodedata.combining(char))
+    return NON_ALPHANUMERIC_PATTERN.sub(' ', title.lower()).strip()
+
+
+def load_qrels(path, topic=None):
+    """
+    Loads the relevant papers of one or more topics from a JSON file.
+
+    Args:
+        path: Path of the JSON file, either with id -> title of the relevant papers of one topic
+            (like case-study/FATE-papers-in-IRA.json) or with topic -> (id -> title).
+        topic: Name of the topic of a file with one topic. Defaults to None (the file name without extension).
+
+    Returns:
+        Dict with topic -> set of the normalized titles of its relevant papers.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if all(isinstance(value, str) for value in data.values()):
+        data = {topic or os.path.splitext(os.path.basename(path))[0]: data}
+    return {topic: {normalize_title(title) for title in papers.values()} - {''} for topic, papers in data.items()}
+
+
+def collect_runs(search, queries, size=10000, batch_size=100):
+    """
+    Runs the query variants of all topics with Search.msearch and resolves the titles of the retrieved documents.
+
+    Args:
+        search: The Search (or LocalSearch) instance.
+        queries: Dict with topic -> (variant -> Boolean query string or Elasticsearch query).
+        size: Maximum number of documents retrieved per query. Defaults to 10000.
+        batch_size: Number of queries per _msearch request. Defaults to 100.
+
+    Returns:
+        List with a run per query: dict with topic, variant, query, total, ids and titles (or error).
+    """
+    runs = [{'topic': topic, 'variant': variant, 'query': query}
+            for topic, variants in queries.items() for variant, query in variants.items()]
+    results = search.msearch([run['query'] for run in runs], mode='ids', size=size, batch_size=batch_size)
+    titles = search.get_titles([id for result in results for id in result.get('ids', [])])
+    for run, result in zip(runs, results):
+        if 'error' in result:
+            run['error'] = result['error']
+            continue
+        if result['total'] > len(result['ids']):
+            print(f"Warning: {run['topic']}/{run['variant']} retrieved {result['total']} documents, "
+                  f"only the first {len(result['ids'])} are matched")
+        run['total'] = result['total']
+        run['ids'] = result['ids']
+        run['titles'] = [titles.get(id, '') for id in result['ids']]
+    return runs
+
+
+def write_runs(runs, path):
+    """
+    Writes runs to a run file with one JSON object per line.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        for run in runs:
+            f.write(json.dumps(run, ensure_ascii=False) + '\n')
+
+
+def read_runs(path):
+    """
+    Reads the runs of a run file written by write_runs.
+
+    Returns:
+        List with the runs.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def divide(numerator, denominator):
+    """
+    Divides two arrays element-wise, with 0 where the denominator is 0.
+    """
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    return np.divide(numerator, denominator, out=np.zeros(np.broadcast(numerator, denominator).shape), where=denominator != 0)
+
+
+def compute_metrics(retrieved, relevant, relevant_retrieved, betas=(1, 3)):
+    """
+    Computes the set-based metrics of many runs at once.
+
+    Args:
+        retrieved: Array with the number of retrieved documents per run.
+        relevant: Array with the number of relevant documents of the topic per run.
+        relevant_retrieved: Array with the number of retrieved relevant documents per run.
+        betas: The betas of the F-measures. Defaults to (1, 3), F3 weighs recall higher, as in systematic reviews.
+
+    Returns:
+        Dict with the arrays precision, recall and f<beta> per beta.
+    """
+    precision = divide(relevant_retrieved, retrieved)
+    recall = divide(relevant_retrieved, relevant)
+    metrics = {'precision': precision, 'recall': recall}
+    for beta in betas:
+        metrics[f'f{beta:g}'] = divide((1 + beta ** 2) * precision * recall, beta ** 2 * precision + recall)
+    return metrics
+
+
+def evaluate_runs(runs, qrels, betas=(1, 3)):
+    """
+    Evaluates runs against the relevant papers of their topics by their normalized titles.
+    The matching is vectorized over all retrieved documents of all runs, so thousands of query variants
+    are evaluated in one pass. A relevant paper retrieved several times (e.g. duplicates in the index) counts once.
+
+    Args:
+        runs: List with runs as returned by collect_runs (runs with an error are skipped).
+        qrels: Dict with topic -> set of normalized titles, as returned by load_qrels.
+        betas: The betas of the F-measures. Defaults to (1, 3).
+
+    Returns:
+        List with a row per run: dict with topic, variant, retrieved, relevant, relevant_retrieved, precision, recall and f<beta> per beta.
+    """
+    runs = [run for run in runs if 'error' not in run and run['topic'] in qrels]
+    if not runs:
+        return []
+    topics = sorted(qrels)
+    topic_numbers = {topic: i for i, topic in enumerate(topics)}
+    run_topics = np.array([topic_numbers[run['topic']] for run in runs], dtype=np.int64)
+    lengths = np.array([len(run['titles']) for run in runs], dtype=np.int64)
+
+    # Number every distinct title, then pair it with the topic of its run or of its judgment
+    retrieved_titles = [normalize_title(title) for run in runs for title in run['titles']]
+    judged_titles = [title for topic in topics for title in sorted(qrels[topic])]
+    titles, numbers = np.unique(np.array(retrieved_titles + judged_titles, dtype=str), return_inverse=True)
+    numbers = numbers.astype(np.int64)
+    retrieved_numbers = numbers[:len(retrieved_titles)]
+    judged_numbers = numbers[len(retrieved_titles):]
+    judged_topics = np.repeat(np.arange(len(topics)), [len(qrels[topic]) for topic in topics])
+    judged_pairs = judged_topics * len(titles) + judged_numbers
+
+    run_numbers = np.repeat(np.arange(len(runs)), lengths)
+    retrieved_pairs = run_topics[run_numbers] * len(titles) + retrieved_numbers
+    # Count every relevant title once per run, an unresolved document (empty title) is never relevant
+    is_relevant = np.isin(retrieved_pairs, judged_pairs) & (titles[retrieved_numbers] != '')
+    hits = np.unique((run_numbers * len(titles) + retrieved_numbers)[is_relevant])
+    relevant_retrieved = np.bincount(hits // len(titles), minlength=len(runs))
+
+    retrieved = np.array([run.get('total', len(run['titles'])) for run in runs], dtype=np.int64)
+    relevant = np.array([len(qrels[topics[topic]]) for topic in run_topics], dtype=np.int64)
+    metrics = compute_metrics(retrieved, relevant, relevant_retrieved, betas)
+
+    rows = []
+    for i, run in enumerate(runs):
+        row = {'topic': run['topic'], 'variant': run['variant'], 'retrieved': int(retrieved[i]),
+               'relevant': int(relevant[i]), 'relevant_retrieved': int(relevant_retrieved[i])}
+        row.update((name, float(values[i])) for name, values in metrics.items())
+        rows.append(row)
+    return rows
+
+
+def write_results(rows, path):
+    """
+    Writes the evaluation results as a tab-separated table.
+    """
+    if not rows:
+        return
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]), delimiter='\t')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_results(rows):
+    """
+    Prints the evaluation results as a table.
+    """
+    if not rows:
+        print("No runs to evaluate")
+        return
+    columns = list(rows[0])
+    cells = [[f"{row[column]:.4f}" if isinstance(row[column], float) else str(row[column]) for column in columns] for row in rows]
+    widths = [max(len(column), *(len(cell[i]) for cell in cells)) for i, column in enumerate(columns)]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    for cell in cells:
+        print('  '.join(value.ljust(width) for value, width in zip(cell, widths)))
@@ -0,0 +1,79 @@
+from src.utils.constants import IndexFields
+
+PRE_TAGS = ['<b>']
+POST_TAGS = ['</b>']
+
+
+class HighlightField:
+    """
+    This class describes how a field is highlighted.
+    """
+    def __init__(self, fragment_size=150, number_of_fragments=3, max_analyzed_offset=None, type=None):
+        """
+        Args:
+            fragment_size: Size of a highlighted fragment in characters. Defaults to 150.
+            number_of_fragments: Maximum number of fragments, 0 for the whole field. Defaults to 3.
+            max_analyzed_offset: Number of characters of the field analyzed for the highlighting,
+                None for the limit of the index. Defaults to None.
+            type: The highlighter (unified, plain or fvh), None to let Elasticsearch choose. Defaults to None.
+                The fvh highlighter needs term vectors (see Index.update_mapping).
+        """
+        self.fragment_size = fragment_size
+        self.number_of_fragments = number_of_fragments
+        self.max_analyzed_offset = max_analyzed_offset
+        self.type = type
+
+    def to_dict(self):
+        """
+        Returns the highlight options of the field for the search request.
+        """
+        options = {'fragment_size': self.fragment_size, 'number_of_fragments': self.number_of_fragments}
+        if self.max_analyzed_offset is not None:
+            options['max_analyzed_offset'] = self.max_analyzed_offset
+        if self.type is not None:
+            options['type'] = self.type
+        return options
+
+
+# Named highlight profiles with IndexFields -> HighlightField
+HIGHLIGHT_PROFILES = {
+    # Only the snippet shown in the result list
+    'display': {
+        IndexFields.FULL_TEXT: HighlightField(fragment_size=300, number_of_fragments=1, max_analyzed_offset=200000),
+    },
+    # Like display, with the fast vector highlighter (needs full_text_index_options='term_vectors')
+    'display_fvh': {
+        IndexFields.FULL_TEXT: HighlightField(fragment_size=300, number_of_fragments=1, type='fvh'),
+    },
+    # All text fields, e.g. to explain why a document matched
+    'full': {
+        IndexFields.TITLE: HighlightField(number_of_fragments=0),
+        IndexFields.ABSTRACT: HighlightField(number_of_fragments=0),
+        IndexFields.AUTHOR: HighlightField(number_of_fragments=0),
+        IndexFields.BOOKTITLE: HighlightField(number_of_fragments=0),
+        IndexFields.VENUE: HighlightField(number_of_fragments=0),
+        IndexFields.FULL_TEXT: HighlightField(fragment_size=300, number_of_fragments=3, max_analyzed_offset=1000000),
+    },
+    # No highlighting
+    'none': {},
+}
+
+
+def get_highlight(profile='display'):
+    """
+    Returns the highlight options of a search request for a highlight profile.
+
+    Args:
+        profile: Name of the profile in HIGHLIGHT_PROFILES. Defaults to display.
+
+    Returns:
+        Dict with the highlight options, or None if the profile highlights no field.
+    """
+    fields = HIGHLIGHT_PROFILES[profile]
+    if not fields:
+        return None
+    return {
+        'fields': {field.value: options.to_dict() for field, options in fields.items()},
+        'pre_tags': PRE_TAGS,
+        'post_tags': POST_TAGS,
+    }
@@ -1,9 +1,38 @@
 #from sentence_transformers import SentenceTransformer
-import re
+import os
+import time
+import warnings
+import itertools
+
+from elasticsearch.exceptions import GeneralAvailabilityWarning
 
 from src.elasticsearch_client import ElasticsearchClient
-from src.utils import get_all_files
-from src.utils.constants import IndexFields, DATA_PATH, ES_INDEX_NAME
+from src.bulk_indexer import BulkIndexer
+from src.document_builder import build_document, normalize_document
+from src.embeddings import Embedder
+from src.utils import iter_venue_files, get_peak_memory_mb
+from src.utils.file_loading_utils import get_venue_directories, iter_loaded_directories
+from src.utils.index_manifest import IndexManifest, hash_document
+from src.utils.constants import IndexFields, DATA_PATH, ES_INDEX_NAME, INDEX_MANIFEST_PATH
+
+
+# Index settings during a zero downtime rebuild
+INGEST_SETTINGS = {
+    'index': {
+        'refresh_interval': '-1',
+        'number_of_replicas': 0
+    }
+}
+
+# Seconds between two checks whether the force-merge of a versioned index finished
+FORCEMERGE_POLL_INTERVAL = 10
+
+# Mapping options of the full-text for faster highlighting: offsets in the postings for the unified highlighter,
+# or term vectors with offsets for the fast vector highlighter (fvh), which needs more disk space
+FULL_TEXT_INDEX_OPTIONS = {
+    'offsets': {"index_options": "offsets"},
+    'term_vectors': {"term_vector": "with_positions_offsets"},
+}
 
 
 class Index:
@@ -16,48 +45,305 @@ class Index:
             self.es_client = ElasticsearchClient()
         self.model = None
     
-    def reindex(self, bulk_size=100):
+    def reindex(self, bulk_size=100, bulk_bytes=10 * 1024 * 1024, parallel_bulks=4, num_workers=1, chunksize=1, max_in_flight=4,
+                zero_downtime=False, number_of_replicas=1, embeddings=False, embedding_batch_size=32, full_text_index_options=None):
         """
         Reindex the Elasticsearch index.
 
+        The files are streamed one venue directory at a time through create_document and insert_documents,
+        so only max_in_flight chunks of venue directories and one bulk of documents are held in memory.
+
+        With zero_downtime the documents are indexed into a new versioned index with ingest settings
+        (no refresh, no replicas). Afterwards the settings are restored, the index is force-merged and the
+        ES_INDEX_NAME alias is switched atomically to it, so searches keep working during the rebuild.
+
         Args:
-            bulk_size: The number of documents used in one bulk-operation. Defaults to 100.
+            bulk_size: The maximum number of documents used in one bulk-operation. Defaults to 100.
+            bulk_bytes: The maximum size of one bulk-operation in bytes. Defaults to 10 MB.
+            parallel_bulks: The number of bulk-operations sent in parallel. Defaults to 4.
+            num_workers: Number of processes used to load the files (None for one per CPU core). Defaults to 1.
+            chunksize: Number of venue directories sent to a loading process at once. Defaults to 1.
+            max_in_flight: Number of chunks of venue directories loaded ahead of the indexing. Defaults to 4.
+            zero_downtime: Whether to rebuild into a new index and switch the alias, only if all documents were indexed. Defaults to False.
+            number_of_replicas: Number of replicas of the new index after a zero downtime rebuild. Defaults to 1.
+            embeddings: Whether to add the embeddings of the documents (see embed_documents). Defaults to False.
+            embedding_batch_size: Number of documents embedded at once. Defaults to 32.
+            full_text_index_options: Key of FULL_TEXT_INDEX_OPTIONS to index the full-text for fast highlighting. Defaults to None.
         """
+        start_time = time.perf_counter()
+
         # Reset index
-        self.init_embedding_model()
-        self.reset_index()
-        self.update_mapping()
+        if embeddings and not self.model:
+            self.init_embedding_model()
+        if zero_downtime:
+            index = self.create_versioned_index(full_text_index_options=full_text_index_options)
+        else:
+            self.reset_index()
+            self.update_mapping(full_text_index_options=full_text_index_options)
+            index = ES_INDEX_NAME
+        if os.path.exists(INDEX_MANIFEST_PATH):
+            # The manifest does not describe the new index
+            os.remove(INDEX_MANIFEST_PATH)
 
-        # Collect and create all documents
-        files = get_all_files(DATA_PATH)
-        documents = [self.create_document(bib_id, info_dict) for bib_id, info_dict in files.items()]
+        try:
+            # Stream the documents into the index
+            files = iter_venue_files(DATA_PATH, num_workers=num_workers, chunksize=chunksize, max_in_flight=max_in_flight)
+            documents = (self.create_document(bib_id, info_dict) for venue_files in files for bib_id, info_dict in venue_files.items())
+            if embeddings:
+                documents = self.embed_documents(documents, batch_size=embedding_batch_size)
+            result = self.insert_documents(documents, index=index, max_documents=bulk_size, max_bytes=bulk_bytes, max_in_flight=parallel_bulks)
+            num_documents = result.succeeded
 
-        # Insert documents into the index
-        for i in range(0, len(documents), bulk_size):
-            self.insert_documents(documents[i:i+bulk_size])
+            self.bump_generation(index)
+            if zero_downtime:
+                # A partially ingested index must not go live
+                if result.failed:
+                    raise RuntimeError(f"{len(result.failed)} documents could not be indexed, the alias is not switched.\n{result.summary()}")
+                self.finalize_versioned_index(index, number_of_replicas=number_of_replicas)
+                self.switch_alias(index)
+        except BaseException:
+            if zero_downtime:
+                # The alias still points to the old index, the half-built one is dropped
+                self.delete_versioned_index(index)
+            raise
 
-        print(f"Successfully indexed {len(documents)} documents")
+        elapsed = time.perf_counter() - start_time
+        print(f"Successfully indexed {num_documents} documents in {elapsed:.1f}s "
+              f"({num_documents / elapsed:.1f} documents/s, peak memory {get_peak_memory_mb():.1f} MB)")
+        print(result.summary())
     
+    def create_versioned_index(self, full_text_index_options=None):
+        """
+        Creates a new versioned index with settings for fast bulk ingestion (no refresh, no replicas) and the mapping.
+
+        Args:
+            full_text_index_options: Key of FULL_TEXT_INDEX_OPTIONS for the full-text mapping. Defaults to None.
+
+        Returns:
+            Name of the new index.
+        """
+        index = f"{ES_INDEX_NAME}-{time.strftime('%Y%m%d%H%M%S')}"
+        self.es_client().indices.create(index=index, settings=INGEST_SETTINGS)
+        try:
+            self.update_mapping(index=index, full_text_index_options=full_text_index_options)
+        except BaseException:
+            self.delete_versioned_index(index)
+            raise
+        return index
+
+    def delete_versioned_index(self, index):
+        """
+        Deletes a versioned index of a failed rebuild, unless the ES_INDEX_NAME alias points to it.
+
+        Args:
+            index: Name of the versioned index.
+        """
+        try:
+            if index in self.get_alias_indices():
+                return
+            self.es_client().indices.delete(index=index, ignore_unavailable=True)
+            print(f"Deleted the versioned index {index} of the failed rebuild.")
+        except Exception as e:
+            print(f"Could not delete the versioned index {index}: {e}")
+
+    def finalize_versioned_index(self, index, number_of_replicas=1):
+        """
+        Force-merges a versioned index after the ingestion and then restores its search settings.
+        The force-merge runs before the replicas are added, so only the primaries merge and the replicas copy the merged segments.
+        The force-merge of the whole anthology takes longer than the request timeout of the client,
+        so it runs as a task on the cluster which is polled until it finished.
+
+        Args:
+            index: Name of the versioned index.
+            number_of_replicas: Number of replicas of the index. Defaults to 1.
+
+        Returns:
+            Elasticsearch response of the force-merge task.
+        """
+        # Refresh first, so the ingested documents are in segments that can be merged
+        self.es_client().indices.refresh(index=index)
+        resp = self.es_client().indices.forcemerge(index=index, max_num_segments=1, wait_for_completion=False)
+        while 'task' in resp:
+            with warnings.catch_warnings():
+                # The tasks API is marked as technical preview, but it is the way to follow a force-merge
+                warnings.simplefilter('ignore', GeneralAvailabilityWarning)
+                task = self.es_client().tasks.get(task_id=resp['task'])
+            if task.get('completed'):
+                if 'error' in task:
+                    raise RuntimeError(f"Force-merge of {index} failed: {task['error']}")
+                resp = task
+                break
+            time.sleep(FORCEMERGE_POLL_INTERVAL)
+        self.es_client().indices.put_settings(index=index, settings={
+            'index': {
+                'refresh_interval': None, # Default refresh interval
+                'number_of_replicas': number_of_replicas
+            }
+        })
+        return resp
+
+    def get_alias_indices(self):
+        """
+        Returns the indices behind the ES_INDEX_NAME alias.
+
+        Returns:
+            List with the names of the indices, empty if the alias does not exist.
+        """
+        if not self.es_client().indices.exists_alias(name=ES_INDEX_NAME):
+            return []
+        return list(self.es_client().indices.get_alias(name=ES_INDEX_NAME).body)
+
+    def switch_alias(self, index, delete_old=True):
+        """
+        Atomically points the ES_INDEX_NAME alias to the given index.
+
+        A concrete index named ES_INDEX_NAME (from a rebuild without zero downtime) is replaced by the alias.
+
+        Args:
+            index: Name of the index the alias should point to.
+            delete_old: Whether to delete the indices the alias pointed to before. Defaults to True.
+
+        Returns:
+            Elasticsearch response of the alias update.
+        """
+        old_indices = self.get_alias_indices()
+        actions = [{'remove': {'index': old_index, 'alias': ES_INDEX_NAME}} for old_index in old_indices]
+        if not old_indices and self.es_client().indices.exists(index=ES_INDEX_NAME):
+            actions.append({'remove_index': {'index': ES_INDEX_NAME}})
+        actions.append({'add': {'index': index, 'alias': ES_INDEX_NAME}})
+        resp = self.es_client().indices.update_aliases(actions=actions)
+        if delete_old:
+            for old_index in old_indices:
+                self.es_client().indices.delete(index=old_index)
+        return resp
+
+    def sync(self, bulk_size=100, bulk_bytes=10 * 1024 * 1024, parallel_bulks=4, num_workers=1, chunksize=1, max_in_flight=4,
+             manifest_path=INDEX_MANIFEST_PATH, embeddings=False, embedding_batch_size=32, full_text_index_options=None):
+        """
+        Incrementally updates the Elasticsearch index with the changes since the last sync.
+
+        The manifest stores the mtime, size and content hash of the files of every venue directory and the hash
+        of every document created from them. Only changed venue directories are loaded, and only added or changed
+        documents are upserted and removed documents are deleted. Without a manifest all documents are upserted.
+
+        Args:
+            bulk_size: The maximum number of documents used in one bulk-operation. Defaults to 100.
+            bulk_bytes: The maximum size of one bulk-operation in bytes. Defaults to 10 MB.
+            parallel_bulks: The number of bulk-operations sent in parallel. Defaults to 4.
+            num_workers: Number of processes used to load the files (None for one per CPU core). Defaults to 1.
+            chunksize: Number of venue directories sent to a loading process at once. Defaults to 1.
+            max_in_flight: Number of chunks of venue directories loaded ahead of the indexing. Defaults to 4.
+            manifest_path: Path to the manifest file. Defaults to INDEX_MANIFEST_PATH.
+            embeddings: Whether to add the embeddings of the upserted documents. Defaults to False.
+            embedding_batch_size: Number of documents embedded at once. Defaults to 32.
+            full_text_index_options: Key of FULL_TEXT_INDEX_OPTIONS for the full-text mapping if the index
+                is created. Defaults to None.
+        """
+        start_time = time.perf_counter()
+        if embeddings and not self.model:
+            self.init_embedding_model()
+        if not self.es_client().indices.exists(index=ES_INDEX_NAME):
+            self.es_client().indices.create(index=ES_INDEX_NAME)
+            self.update_mapping(full_text_index_options=full_text_index_options)
+
+        manifest = IndexManifest(manifest_path)
+        directories = get_venue_directories(DATA_PATH)
+
+        # Find the changed venue directories
+        changed_directories = {}
+        for directory in directories:
+            file_states = manifest.get_file_states(directory)
+            if manifest.has_changed(directory, file_states):
+                changed_directories[directory] = file_states
+            else:
+                manifest.update_directory(directory, file_states)
+
+        # Documents of removed venue directories, and documents whose delete failed in the last sync
+        deleted_ids = set(manifest.pending_deletes)
+        for directory in set(manifest.directories) - set(directories):
+            deleted_ids.update(manifest.remove_directory(directory))
+
+        # Upsert the added and changed documents of the changed venue directories
+        upserted_ids = {}
+        loaded = iter_loaded_directories(list(changed_directories), num_workers, chunksize, max_in_flight)
+
+        def iter_changed_documents():
+            for directory, venue_files in loaded:
+                old_hashes = manifest.get_document_hashes(directory)
+                new_hashes = {}
+                for bib_id, info_dict in venue_files.items():
+                    document = self.create_document(bib_id, info_dict)
+                    new_hashes[bib_id] = hash_document(document)
+                    if old_hashes.get(bib_id) != new_hashes[bib_id]:
+                        upserted_ids[self.get_document_id(document)] = directory
+                        yield document
+                deleted_ids.update(set(old_hashes) - set(new_hashes))
+                manifest.update_directory(directory, changed_directories[directory], new_hashes)
+
+        bulk_options = dict(max_documents=bulk_size, max_bytes=bulk_bytes, max_in_flight=parallel_bulks)
+        documents = iter_changed_documents()
+        if embeddings:
+            documents = self.embed_documents(documents, batch_size=embedding_batch_size)
+        result = self.insert_documents(documents, **bulk_options)
+        for failure in result.failed:
+            # Send the failed documents again with the next sync
+            manifest.forget_document(upserted_ids[failure['id']], failure['id'])
+
+        # Delete the removed documents, unless they moved to another venue directory
+        deleted_ids = sorted(deleted_ids - set(upserted_ids))
+        delete_result = self.delete_documents(deleted_ids, **bulk_options)
+        # The failed deletes are already removed from the document hashes, they are retried with the next sync
+        manifest.pending_deletes = sorted(failure['id'] for failure in delete_result.failed)
+
+        if upserted_ids or deleted_ids:
+            self.bump_generation()
+        manifest.save()
+        elapsed = time.perf_counter() - start_time
+        print(f"Synced {len(changed_directories)} of {len(directories)} venue directories in {elapsed:.1f}s: "
+              f"{len(upserted_ids)} documents upserted, {len(deleted_ids)} documents deleted")
+        print(f"Upserts: {result.summary()}")
+        print(f"Deletes: {delete_result.summary()}")
+
+    def bump_generation(self, index=ES_INDEX_NAME):
+        """
+        Stores a new generation in the mapping metadata of the index, so cached search results are dropped.
+
+        Args:
+            index: Name of the index. Defaults to ES_INDEX_NAME.
+
+        Returns:
+            Elasticsearch response of the mapping update.
+        """
+        return self.es_client().indices.put_mapping(index=index, meta={'generation': time.time_ns()})
+
     def reset_index(self):
         """
         Resets the index by deleting the current iranthology index and recreating it.
+        If ES_INDEX_NAME is an alias, the indices behind it are deleted.
 
         Returns:
             resp: Response of the Elasticsearch create operation.
         """
-        self.es_client().indices.delete(index=ES_INDEX_NAME)
+        for index in self.get_alias_indices() or [ES_INDEX_NAME]:
+            self.es_client().indices.delete(index=index, ignore_unavailable=True)
         resp = self.es_client().indices.create(index=ES_INDEX_NAME)
         return resp
 
-    def update_mapping(self):
+    def update_mapping(self, index=ES_INDEX_NAME, full_text_index_options=None):
         """
         Sets the mapping of the IR Anthology index.
 
+        Args:
+            index: Name of the index. Defaults to ES_INDEX_NAME.
+            full_text_index_options: Key of FULL_TEXT_INDEX_OPTIONS to index the offsets ('offsets') or
+                term vectors ('term_vectors') of the full-text for fast highlighting. Defaults to None.
+                These options cannot be changed on an existing field, only on a new index.
+
         Returns:
             Elasticsearch response of the mapping update.
         """
         return self.es_client().indices.put_mapping(
-            index=ES_INDEX_NAME,
+            index=index,
             properties={
                 IndexFields.NAME.value: { # bib-id
                     "type": "keyword"
@@ -84,7 +370,8 @@ class Index:
                     "type": "text" # Array
                 },
                 IndexFields.FULL_TEXT.value: {
-                    "type": "text"
+                    "type": "text",
+                    **(FULL_TEXT_INDEX_OPTIONS[full_text_index_options] if full_text_index_options else {})
                 },
                 IndexFields.VENUE.value: {
                     "type": "text"
@@ -101,37 +388,71 @@ class Index:
                 IndexFields.ABSTRACT.value: {
                     "type": "text"
                 },
-                #IndexFields.EMBEDDING.value: {
-                #    "type": "dense_vector",
-                #    "dims": 1536,
-                #    "index": True,
-                #    "similarity": "cosine"
-                #}
+                IndexFields.PREVIEW.value: { # Only returned, not searched
+                    "type": "text",
+                    "index": False,
+                    "store": True
+                },
+                **({
+                    IndexFields.EMBEDDING.value: {
+                        "type": "dense_vector",
+                        "dims": self.model.dims,
+                        "index": True,
+                        "similarity": "cosine"
+                    }
+                } if self.model else {})
             },
         )
     
-    def insert_documents(self, documents):
+    def insert_documents(self, documents, index=ES_INDEX_NAME, **bulk_options):
         """
         Insert multiple documents into the IR anthology index.
 
         Args:
-            documents: A list containing the documents to be inserted. Should already have the fitting format for the index.
+            documents: An iterable containing the documents to be inserted. Should already have the fitting format for the index.
+            index: Name of the index. Defaults to ES_INDEX_NAME.
+            bulk_options: Options of the BulkIndexer (max_documents, max_bytes, max_in_flight, max_retries, ...).
+
+        Returns:
+            BulkResult with the summary of the bulk operations.
+        """
+        operations = (
+            ({'index': {'_index': index, '_id': self.get_document_id(document)}}, document)
+            for document in documents
+        )
+        return BulkIndexer(self.es_client, **bulk_options).run(operations)
+
+    def delete_documents(self, ids, index=ES_INDEX_NAME, **bulk_options):
+        """
+        Delete multiple documents from the IR anthology index.
+
+        Args:
+            ids: An iterable containing the ids of the documents to be deleted.
+            index: Name of the index. Defaults to ES_INDEX_NAME.
+            bulk_options: Options of the BulkIndexer (max_documents, max_bytes, max_in_flight, max_retries, ...).
+
+        Returns:
+            BulkResult with the summary of the bulk operations.
+        """
+        operations = (({'delete': {'_index': index, '_id': id}}, None) for id in ids)
+        return BulkIndexer(self.es_client, **bulk_options).run(operations)
+
+    def get_document_id(self, document):
+        """
+        Returns the stable Elasticsearch id of a document, which is its bib-id.
+
+        Args:
+            document: Dict containing the document as formatted for the Elasticsearch index.
 
         Returns:
-            Elasticsearch response of the bulk operation.
-        """
-        operations = []
-        for document in documents:
-            operations.append({'index': {'_index': ES_INDEX_NAME}})
-            operations.append({
-                **document,
-                #'embedding': self.get_embedding(document[IndexFields.FULL_TEXT.value])
-            })
-        return self.es_client().bulk(operations=operations)
+            The id of the document.
+        """
+        return document[IndexFields.NAME.value]
     
     def create_document(self, bib_id, info_dict):
         """
         Returns the formatted document for the Elasticsearch index.
+        The fields are built and normalized with the DOCUMENT_SCHEMA (see document_builder).
 
         Args:
             bib_id: Identifier in the bib-file for this paper.
@@ -140,80 +461,12 @@ class Index:
         Returns:
             Dict containing the paper as formatted for the Elasticsearch index.
         """
-        document = {}
-        document[IndexFields.NAME.value] = bib_id
-        try:
-            document[IndexFields.BIB_TYPE.value] = info_dict['bib-data'].type
-        except:
-            # No bib-type in the bib entry
-            document[IndexFields.BIB_TYPE.value] = ""
-        try:
-            document[IndexFields.TITLE.value] = info_dict['bib-data'].fields['title']
-        except:
-            # No title in the bib entry
-            document[IndexFields.TITLE.value] = ""
-        try:
-            document[IndexFields.YEAR.value] = info_dict['bib-data'].fields['year']
-        except:
-            # No year in the bib entry
-            document[IndexFields.YEAR.value] = ""
-        try:
-            document[IndexFields.BOOKTITLE.value] = info_dict['bib-data'].fields['booktitle']
-        except:
-            # No booktitle in the bib entry
-            document[IndexFields.BOOKTITLE.value] = ""
-        try:
-            document[IndexFields.SERIES.value] = info_dict['bib-data'].fields['series']
-        except:
-            # No series in the bib entry
-            document[IndexFields.SERIES.value] = ""
-        try:
-            document[IndexFields.AUTHOR.value] = [str(a) for a in info_dict['bib-data'].persons[u'author']]
-        except:
-            # No author in the bib entry
-            document[IndexFields.AUTHOR.value] = []
-        try:
-            document[IndexFields.EDITOR.value] = [str(a) for a in info_dict['bib-data'].persons[u'editor']]
-        except:
-            # No editor in the bib entry
-            document[IndexFields.EDITOR.value] = []
-        try:
-            document[IndexFields.FULL_TEXT.value] = info_dict['full-text']
-        except:
-            # No full-text
-            document[IndexFields.FULL_TEXT.value] = ""
-        try:
-            document[IndexFields.VENUE.value] = info_dict['bib-data'].fields['venue']
-        except:
-            # No venue in the bib entry
-            document[IndexFields.VENUE.value] = ""
-        try:
-            document[IndexFields.URL.value] = info_dict['bib-data'].fields['url']
-        except:
-            # No url in the bib entry
-            document[IndexFields.URL.value] = ""
-        try:
-            document[IndexFields.DOI.value] = info_dict['bib-data'].fields['doi']
-        except:
-            # No doi in the bib entry
-            document[IndexFields.DOI.value] = ""
-        try:
-            document[IndexFields.OPENACCESS.value] = info_dict['bib-data'].fields['openaccess']
-        except:
-            # No openaccess in the bib entry
-            document[IndexFields.OPENACCESS.value] = ""
-        try:
-            document[IndexFields.ABSTRACT.value] = info_dict['json-data']['abstract']
-        except:
-            # No abstract in the bib entry
-            document[IndexFields.ABSTRACT.value] = ""
-
-        document = self.sanity_check_document(document)
-        return document
+        return build_document(bib_id, info_dict)
     
     def sanity_check_document(self, document):
         """
         Performs a sanity check on a document and corrects erros if possible.
+        Documents from create_document are already sanity checked.
 
         Args:
             document: Document to sanity check.
@@ -221,30 +474,18 @@ class Index:
         Returns:
             Sanity checked document.
         """
-        # Remove backslashes
-        document[IndexFields.URL.value] = document[IndexFields.URL.value].replace('\\', '')
-        document[IndexFields.DOI.value] = document[IndexFields.DOI.value].replace('\\', '')
-
-        # Replace ERROR with empty string
-        document[IndexFields.AUTHOR.value] = [author if "ERROR" not in str(author) else "" for author in document[IndexFields.AUTHOR.value]]
-        document[IndexFields.EDITOR.value] = [editor if "ERROR" not in str(editor) else "" for editor in document[IndexFields.EDITOR.value]]
-
-        # Remove Latex commands
-        document[IndexFields.AUTHOR.value] = [re.sub(r'\\.*?{([^}]*)}', '\\1', author) for author in document[IndexFields.AUTHOR.value]]
-        document[IndexFields.EDITOR.value] = [re.sub(r'\\.*?{([^}]*)}', '\\1', editor) for editor in document[IndexFields.EDITOR.value]]
-        document[IndexFields.TITLE.value] = re.sub(r'\\.*?{([^}]*)}', '\\1', document[IndexFields.TITLE.value])
-
-        document[IndexFields.AUTHOR.value] = [re.sub(r'{([^}]*)}', '\\1', author) for author in document[IndexFields.AUTHOR.value]]
-        document[IndexFields.EDITOR.value] = [re.sub(r'{([^}]*)}', '\\1', editor) for editor in document[IndexFields.EDITOR.value]]
-        document[IndexFields.TITLE.value] = re.sub(r'{([^}]*)}', '\\1', document[IndexFields.TITLE.value])
-
-        return document
+        return normalize_document(document)
     
-    def init_embedding_model(self):
+    def init_embedding_model(self, model=None, **embedder_options):
         """
         Initializes the embedding model.
+
+        Args:
+            model: Model with encode and get_sentence_embedding_dimension, e.g. a HashingEmbeddingModel to run
+                on CPU without downloads. Defaults to None (the sentence transformer EMBEDDING_MODEL_NAME).
+            embedder_options: Options of the Embedder (model_name, cache_path, batch_size, max_chars, max_chunks).
         """
-        self.model = None#SentenceTransformer('Alibaba-NLP/gte-Qwen2-1.5B-instruct', trust_remote_code=True)
+        self.model = Embedder(model, **embedder_options)
     
     def get_embedding(self, text):
         """
@@ -257,3 +498,24 @@ class Index:
             The embedding vector.
         """
         return self.model.encode(text)
+
+    def embed_documents(self, documents, batch_size=32):
+        """
+        Adds the embeddings to the documents, batch_size documents at a time.
+        The full-text is embedded, or the title and abstract if there is no full-text.
+        Vectors of unchanged texts are taken from the on-disk cache of the Embedder.
+
+        Args:
+            documents: An iterable containing the documents as formatted for the Elasticsearch index.
+            batch_size: Number of documents embedded at once. Defaults to 32.
+
+        Yields:
+            The documents with the embedding field.
+        """
+        documents = iter(documents)
+        while batch := list(itertools.islice(documents, batch_size)):
+            texts = [document[IndexFields.FULL_TEXT.value] or f"{document[IndexFields.TITLE.value]} {document[IndexFields.ABSTRACT.value]}"
+                     for document in batch]
+            for document, embedding in zip(batch, self.model.embed(texts)):
+                document[IndexFields.EMBEDDING.value] = embedding.tolist()
+                yield document
@@ -0,0 +1,590 @@
+import os
+import re
+import json
+import time
+import heapq
+import bisect
+import shutil
+import fnmatch
+import itertools
+import numpy as np
+
+from src.utils.constants import IndexFields, ES_INDEX_NAME
+from src.utils.boolean_query import compile_query, QuerySyntaxError
+
+TOKEN_PATTERN = re.compile(r'\w+')
+# Fields with postings, the other fields are only stored
+LOCAL_INDEX_FIELDS = [IndexFields.TITLE.value, IndexFields.ABSTRACT.value, IndexFields.FULL_TEXT.value]
+# Fields not stored in the local index
+UNSTORED_FIELDS = [IndexFields.EMBEDDING.value]
+# Record of a term in the postings file: where its doc ids, term frequencies and positions are and how they are encoded
+TERM_DTYPE = np.dtype([('docs_offset', '<i8'), ('num_docs', '<i8'), ('docs_dtype', 'u1'), ('tfs_dtype', 'u1'),
+                       ('positions_offset', '<i8'), ('num_positions', '<i8'), ('positions_dtype', 'u1')])
+UINT_DTYPES = [np.dtype('<u1'), np.dtype('<u2'), np.dtype('<u4'), np.dtype('<u8')]
+# Number of documents whose postings are kept in memory before they are written to a sorted block
+LOCAL_INDEX_BLOCK_SIZE = 1000
+
+
+def tokenize(text):
+    """
+    Splits a text into lowercase words, like the standard analyzer of Elasticsearch.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+def encode_uints(values):
+    """
+    Encodes non-negative integers with the smallest unsigned dtype that fits all of them.
+
+    Args:
+        values: Numpy array with the integers.
+
+    Returns:
+        Tuple with (index of the dtype in UINT_DTYPES, bytes).
+    """
+    maximum = int(values.max()) if len(values) else 0
+    code = 0 if maximum < 1 << 8 else 1 if maximum < 1 << 16 else 2 if maximum < 1 << 32 else 3
+    return code, values.astype(UINT_DTYPES[code]).tobytes()
+
+def segmented_cumsum(deltas, lengths):
+    """
+    Returns the cumulative sums of consecutive segments of an array, restarting at every segment.
+
+    Args:
+        deltas: Numpy array with the deltas of all segments.
+        lengths: Numpy array with the length of every segment.
+
+    Returns:
+        Numpy array with the decoded values.
+    """
+    sums = np.cumsum(deltas, dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+    bases = sums[starts] - deltas[starts]
+    return sums - np.repeat(bases, lengths)
+
+
+class Bitset:
+    """
+    Set of document numbers as packed bits.
+    """
+    def __init__(self, bits, size):
+        self.bits = bits
+        self.size = size
+
+    @classmethod
+    def from_docs(cls, docs, size):
+        bools = np.zeros(size, dtype=bool)
+        bools[docs] = True
+        return cls(np.packbits(bools), size)
+
+    @classmethod
+    def full(cls, size):
+        return cls.from_docs(np.arange(size), size)
+
+    def __and__(self, other):
+        return Bitset(self.bits & other.bits, self.size)
+
+    def __or__(self, other):
+        return Bitset(self.bits | other.bits, self.size)
+
+    def __sub__(self, other):
+        return Bitset(self.bits & ~other.bits, self.size)
+
+    def docs(self):
+        return np.flatnonzero(np.unpackbits(self.bits, count=self.size))
+
+    def count(self):
+        return int(np.unpackbits(self.bits, count=self.size).sum())
+
+
+class FieldIndex:
+    """
+    Positional inverted index of one field, read from the memory-mapped postings file.
+
+    The postings of a term are its document numbers (delta-encoded), its term frequency per document
+    and its positions per document (delta-encoded per document), each stored with the smallest unsigned dtype.
+    """
+    def __init__(self, path, field):
+        with open(os.path.join(path, f'{field}.terms'), encoding='utf8') as f:
+            self.terms = f.read().split('\n')[:-1]
+        self.term_ids = {term: i for i, term in enumerate(self.terms)}
+        self.records = np.load(os.path.join(path, f'{field}.records.npy'), mmap_mode='r')
+        postings_path = os.path.join(path, f'{field}.postings')
+        self.postings = np.memmap(postings_path, dtype=np.uint8, mode='r') if os.path.getsize(postings_path) else np.zeros(0, dtype=np.uint8)
+
+    def read(self, offset, count, code):
+        dtype = UINT_DTYPES[code]
+        return np.frombuffer(self.postings, dtype=dtype, count=count, offset=int(offset)).astype(np.int64)
+
+    def get_docs(self, term):
+        """
+        Returns the numbers of the documents containing a term.
+        """
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return np.zeros(0, dtype=np.int64)
+        record = self.records[term_id]
+        return np.cumsum(self.read(record['docs_offset'], record['num_docs'], record['docs_dtype']))
+
+    def get_postings(self, term_id):
+        """
+        Returns the postings of a term: its document numbers, term frequencies and positions (delta-encoded per document).
+        """
+        record = self.records[term_id]
+        num_docs = int(record['num_docs'])
+        docs = np.cumsum(self.read(record['docs_offset'], num_docs, record['docs_dtype']))
+        tfs_offset = int(record['docs_offset']) + num_docs * UINT_DTYPES[record['docs_dtype']].itemsize
+        tfs = self.read(tfs_offset, num_docs, record['tfs_dtype'])
+        position_deltas = self.read(record['positions_offset'], record['num_positions'], record['positions_dtype'])
+        return docs, tfs, position_deltas
+
+    def get_positions(self, term):
+        """
+        Returns the positions of a term as keys document number << 32 | position.
+        """
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return np.zeros(0, dtype=np.int64)
+        docs, tfs, position_deltas = self.get_postings(term_id)
+        return (np.repeat(docs, tfs) << 32) | segmented_cumsum(position_deltas, tfs)
+
+    def expand(self, pattern):
+        """
+        Returns the terms matching a wildcard pattern (* and ?).
+        """
+        prefix = re.split(r'[*?]', pattern, maxsplit=1)[0]
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix + '\uffff')
+        candidates = self.terms[start:end]
+        if pattern == prefix + '*':
+            return candidates
+        return fnmatch.filter(candidates, pattern)
+
+
+class LocalIndex:
+    """
+    This class handles an on-disk Boolean retrieval index of the IR Anthology, which is searched in-process.
+
+    The directory contains the stored documents (documents.jsonl with the offsets of the lines in documents.offsets.npy)
+    and per indexed field the sorted terms, the term records and the compressed postings, which are memory-mapped.
+    """
+    def __init__(self, path):
+        """
+        Args:
+            path: Directory of the index (see build).
+        """
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf8') as f:
+            self.meta = json.load(f)
+        self.num_docs = self.meta['num_docs']
+        self.fields = {field: FieldIndex(path, field) for field in self.meta['fields']}
+        self.offsets = np.load(os.path.join(path, 'documents.offsets.npy'), mmap_mode='r')
+        self.documents = open(os.path.join(path, 'documents.jsonl'), 'rb')
+        with open(os.path.join(path, 'ids.txt'), encoding='utf8') as f:
+            self.ids = f.read().split('\n')[:-1]
+        self.doc_numbers = {id: i for i, id in enumerate(self.ids)}
+
+    @staticmethod
+    def build(documents, path, fields=LOCAL_INDEX_FIELDS, block_size=LOCAL_INDEX_BLOCK_SIZE):
+        """
+        Builds the index from documents as created by create_document.
+
+        The postings of block_size documents at a time are collected in memory and written as a sorted block,
+        at the end the blocks of every field are merged term by term. So the memory is bounded by one block
+        and the postings of one term, not by the size of the anthology.
+
+        Args:
+            documents: Iterable with the documents (dicts with the IndexFields values as keys).
+            path: Directory of the index.
+            fields: Fields with postings. Defaults to LOCAL_INDEX_FIELDS.
+            block_size: Number of documents per block. Defaults to LOCAL_INDEX_BLOCK_SIZE.
+
+        Returns:
+            Number of indexed documents.
+        """
+        os.makedirs(path, exist_ok=True)
+        blocks_path = os.path.join(path, 'blocks')
+        shutil.rmtree(blocks_path, ignore_errors=True)
+        block_paths = []
+        postings = {field: {} for field in fields}
+
+        def write_block():
+            block_path = os.path.join(blocks_path, str(len(block_paths)))
+            os.makedirs(block_path)
+            for field in fields:
+                LocalIndex.write_field(block_path, field, postings[field])
+                postings[field] = {}
+            block_paths.append(block_path)
+
+        num_docs = 0
+        with open(os.path.join(path, 'documents.jsonl'), 'wb') as f, \
+                open(os.path.join(path, 'documents.offsets'), 'wb') as offsets, \
+                open(os.path.join(path, 'ids.txt'), 'w', encoding='utf8') as ids:
+            for doc, document in enumerate(documents):
+                ids.write(f'{document[IndexFields.NAME.value]}\n')
+                offsets.write(np.int64(f.tell()).tobytes())
+                stored = {key: value for key, value in document.items() if key not in UNSTORED_FIELDS}
+                f.write(json.dumps(stored, ensure_ascii=False).encode('utf8') + b'\n')
+                for field in fields:
+                    value = document.get(field) or ""
+                    text = " ".join(value) if isinstance(value, list) else str(value)
+                    term_positions = {}
+                    for position, term in enumerate(tokenize(text)):
+                        term_positions.setdefault(term, []).append(position)
+                    field_postings = postings[field]
+                    for term, positions in term_positions.items():
+                        field_postings.setdefault(term, []).append((doc, positions))
+                num_docs = doc + 1
+                if num_docs % block_size == 0:
+                    write_block()
+            offsets.write(np.int64(f.tell()).tobytes())
+        if num_docs % block_size or not block_paths:
+            write_block()
+
+        for field in fields:
+            LocalIndex.merge_blocks(path, field, block_paths)
+        shutil.rmtree(blocks_path)
+        offsets_path = os.path.join(path, 'documents.offsets')
+        np.save(os.path.join(path, 'documents.offsets.npy'), np.fromfile(offsets_path, dtype=np.int64))
+        os.remove(offsets_path)
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf8') as f:
+            json.dump({'num_docs': num_docs, 'fields': list(fields)}, f)
+        return num_docs
+
+    @staticmethod
+    def write_postings(f, docs, tfs, position_deltas):
+        """
+        Writes the compressed postings of one term.
+
+        Returns:
+            The term record (without the term).
+        """
+        docs_dtype, docs_bytes = encode_uints(np.diff(docs, prepend=0))
+        tfs_dtype, tfs_bytes = encode_uints(tfs)
+        positions_dtype, positions_bytes = encode_uints(position_deltas)
+        record = (f.tell(), len(docs), docs_dtype, tfs_dtype, f.tell() + len(docs_bytes) + len(tfs_bytes),
+                  len(position_deltas), positions_dtype)
+        f.write(docs_bytes)
+        f.write(tfs_bytes)
+        f.write(positions_bytes)
+        return record
+
+    @staticmethod
+    def write_field(path, field, field_postings):
+        """
+        Writes the sorted terms, the term records and the compressed postings of a field.
+        """
+        terms = sorted(field_postings)
+        records = np.zeros(len(terms), dtype=TERM_DTYPE)
+        with open(os.path.join(path, f'{field}.postings'), 'wb') as f:
+            for i, term in enumerate(terms):
+                entries = field_postings[term]
+                docs = np.fromiter((doc for doc, _ in entries), dtype=np.int64, count=len(entries))
+                tfs = np.fromiter((len(positions) for _, positions in entries), dtype=np.int64, count=len(entries))
+                positions = np.concatenate([np.diff(positions, prepend=0) for _, positions in entries])
+                records[i] = LocalIndex.write_postings(f, docs, tfs, positions)
+        np.save(os.path.join(path, f'{field}.records.npy'), records)
+        with open(os.path.join(path, f'{field}.terms'), 'w', encoding='utf8') as f:
+            f.write(''.join(f'{term}\n' for term in terms))
+
+    @staticmethod
+    def merge_blocks(path, field, block_paths):
+        """
+        Merges the sorted blocks of a field into its terms, term records and postings.
+        The blocks contain consecutive documents, so the postings of a term are concatenated in the order of the blocks.
+        """
+        blocks = [FieldIndex(block_path, field) for block_path in block_paths]
+        # Every block yields its (term, block number, term id) in the order of the terms
+        streams = [zip(block.terms, itertools.repeat(b), itertools.count()) for b, block in enumerate(blocks)]
+        records_path = os.path.join(path, f'{field}.records')
+        with open(os.path.join(path, f'{field}.postings'), 'wb') as f, open(records_path, 'wb') as records, \
+                open(os.path.join(path, f'{field}.terms'), 'w', encoding='utf8') as terms:
+            for term, entries in itertools.groupby(heapq.merge(*streams), key=lambda entry: entry[0]):
+                postings = [blocks[b].get_postings(term_id) for _, b, term_id in entries]
+                record = LocalIndex.write_postings(f, *(np.concatenate(parts) for parts in zip(*postings)))
+                records.write(np.array([record], dtype=TERM_DTYPE).tobytes())
+                terms.write(f'{term}\n')
+        for block in blocks:
+            # Release the memory maps before the blocks are deleted
+            del block.postings
+        np.save(os.path.join(path, f'{field}.records.npy'), np.fromfile(records_path, dtype=TERM_DTYPE))
+        os.remove(records_path)
+
+    def get_document(self, doc):
+        """
+        Returns the stored document with the given document number.
+        """
+        self.documents.seek(int(self.offsets[doc]))
+        return json.loads(self.documents.read(int(self.offsets[doc + 1] - self.offsets[doc])))
+
+    def close(self):
+        self.documents.close()
+
+    # Query evaluation
+
+    def empty(self):
+        return Bitset.from_docs(np.zeros(0, dtype=np.int64), self.num_docs)
+
+    def check_field(self, field):
+        # Searching a field without postings must fail instead of silently matching nothing, e.g. year:2020
+        if field not in self.fields:
+            raise ValueError(f"The field {field} is not indexed by the local index")
+
+    def term_bitset(self, field, term):
+        self.check_field(field)
+        if '*' in term or '?' in term:
+            docs = [self.fields[field].get_docs(expanded) for expanded in self.fields[field].expand(term)]
+            return Bitset.from_docs(np.concatenate(docs) if docs else np.zeros(0, dtype=np.int64), self.num_docs)
+        return Bitset.from_docs(self.fields[field].get_docs(term), self.num_docs)
+
+    def phrase_bitset(self, field, text):
+        """
+        Returns the documents containing the words of the text at consecutive positions.
+        """
+        self.check_field(field)
+        terms = tokenize(text)
+        if not terms:
+            return self.empty()
+        if len(terms) == 1:
+            return self.term_bitset(field, terms[0])
+        # Intersect the documents first, so only the positions of candidate documents are compared
+        candidates = self.term_bitset(field, terms[0])
+        for term in terms[1:]:
+            candidates &= self.term_bitset(field, term)
+        candidate_docs = candidates.docs()
+        if not len(candidate_docs):
+            return self.empty()
+        keys = None
+        for offset, term in enumerate(terms):
+            positions = self.fields[field].get_positions(term)
+            positions = positions[np.isin(positions >> 32, candidate_docs)] - offset
+            keys = positions if keys is None else np.intersect1d(keys, positions, assume_unique=True)
+        return Bitset.from_docs(np.unique(keys >> 32), self.num_docs)
+
+    def match_bitset(self, field, text, operator='or'):
+        self.check_field(field)
+        bitsets = [self.term_bitset(field, term) for term in dict.fromkeys(tokenize(text))]
+        if not bitsets:
+            return self.empty()
+        result = bitsets[0]
+        for bitset in bitsets[1:]:
+            result = result & bitset if operator.lower() == 'and' else result | bitset
+        return result
+
+    def evaluate(self, query):
+        """
+        Returns the documents matching a query of the Elasticsearch query DSL. Supported are match_all, bool,
+        match, match_phrase, multi_match, wildcard and query_string (compiled with the Boolean query compiler).
+
+        Args:
+            query: Dict with the query.
+
+        Returns:
+            Bitset with the matching documents.
+        """
+        (kind, body), = query.items()
+        if kind == 'match_all':
+            return Bitset.full(self.num_docs)
+        if kind == 'bool':
+            result = Bitset.full(self.num_docs)
+            for clause in body.get('must', []) + body.get('filter', []):
+                result &= self.evaluate(clause)
+            should = body.get('should', [])
+            # Like Elasticsearch, one should clause must match by default only if there are no must or filter clauses
+            minimum_should_match = body.get('minimum_should_match')
+            if minimum_should_match is None:
+                minimum_should_match = 0 if body.get('must') or body.get('filter') else 1
+            if should and int(minimum_should_match) != 0:
+                if int(minimum_should_match) != 1:
+                    raise ValueError("Only minimum_should_match 0 and 1 are supported by the local index")
+                matches = self.empty()
+                for clause in should:
+                    matches |= self.evaluate(clause)
+                result &= matches
+            for clause in body.get('must_not', []):
+                result -= self.evaluate(clause)
+            return result
+        if kind in ('match', 'match_phrase', 'wildcard'):
+            (field, options), = body.items()
+            options = options if isinstance(options, dict) else {'query': options, 'value': options}
+            if kind == 'match':
+                return self.match_bitset(field, options['query'], options.get('operator', 'or'))
+            if kind == 'match_phrase':
+                return self.phrase_bitset(field, options['query'])
+            return self.term_bitset(field, options['value'].lower())
+        if kind == 'multi_match':
+            result = self.empty()
+            for field in body['fields']:
+                if body.get('type') == 'phrase':
+                    result |= self.phrase_bitset(field, body['query'])
+                else:
+                    result |= self.match_bitset(field, body['query'], body.get('operator', 'or'))
+            return result
+        if kind == 'query_string':
+            fields = body.get('fields') or [body.get('default_field', IndexFields.FULL_TEXT.value)]
+            return self.evaluate(compile_query(body['query'], fields=tuple(fields),
+                                               default_operator=body.get('default_operator', 'OR').upper()))
+        raise ValueError(f"The query type {kind} is not supported by the local index")
+
+
+class LocalSearch:
+    """
+    This class searches a LocalIndex with the interface of Search, without an Elasticsearch cluster.
+
+    The responses look like the ones of Elasticsearch. All hits have the score 1.0 and are sorted
+    by their order in the index, highlights are not supported.
+    """
+    def __init__(self, path=None, local_index=None, source_mode='results'):
+        """
+        Args:
+            path: Directory of the local index. Defaults to None (local_index must be given).
+            local_index: The LocalIndex. Defaults to None (opened from path).
+            source_mode: Name of the default _source filter (see SOURCE_FILTERS). Defaults to results.
+        """
+        self.local_index = local_index if local_index is not None else LocalIndex(path)
+        self.source_mode = source_mode
+
+    def get_highlight(self, highlight_profile=None):
+        return None
+
+    def get_source(self, source_mode=None):
+        from src.search import SOURCE_FILTERS
+        return SOURCE_FILTERS[source_mode or self.source_mode]
+
+    def filter_source(self, document, source):
+        if source is False:
+            return None
+        if source is True:
+            return document
+        includes = source.get('includes')
+        excludes = source.get('excludes', [])
+        return {key: value for key, value in document.items() if (includes is None or key in includes) and key not in excludes}
+
+    def hit(self, doc, source):
+        hit = {'_index': ES_INDEX_NAME, '_id': self.local_index.ids[doc], '_score': 1.0}
+        document = self.filter_source(self.local_index.get_document(doc), source)
+        if document is not None:
+            hit['_source'] = document
+        return hit
+
+    def search(self, query, from_, size, use_cache=True, highlight_profile=None, source_mode=None):
+        """
+        Search the local index.
+
+        Args:
+            query: The Elasticsearch query.
+            from_: Offset of the first hit.
+            size: Number of hits.
+            use_cache: Unused, for compatibility with Search.
+            highlight_profile: Unused, for compatibility with Search.
+            source_mode: Name of the _source filter. Defaults to None (the default mode of this instance).
+
+        Returns:
+            Dict like the response of the Elasticsearch search operation.
+        """
+        start = time.perf_counter()
+        docs = self.local_index.evaluate(query).docs()
+        source = self.get_source(source_mode)
+        hits = [self.hit(doc, source) for doc in docs[from_:from_ + size]]
+        return {
+            'took': int((time.perf_counter() - start) * 1000),
+            'timed_out': False,
+            'hits': {'total': len(docs), 'max_score': 1.0 if len(docs) else None, 'hits': hits},
+        }
+
+    async def async_search(self, query, from_, size, use_cache=True, highlight_profile=None, source_mode=None):
+        return self.search(query, from_, size, use_cache, highlight_profile, source_mode)
+
+    def open_cursor(self, query, page_size=10, **cursor_options):
+        """
+        Returns a cursor paginating the hits of a query, like Search.open_cursor.
+        """
+        return LocalCursor(self, query, page_size)
+
+    def count(self, query):
+        """
+        Returns the number of documents matching a query.
+        """
+        return self.local_index.evaluate(query).count()
+
+    def get_ids(self, query):
+        """
+        Returns the ids of all documents matching a query.
+        """
+        return [self.local_index.ids[doc] for doc in self.local_index.evaluate(query).docs()]
+
+    def msearch(self, queries, mode='ids', size=10000, batch_size=100, max_concurrent_searches=None, use_self_implemented=True):
+        """
+        Runs many queries, like Search.msearch.
+
+        Args:
+            queries: List with Elasticsearch queries or Boolean query strings.
+            mode: ids (ids of the first size hits and the total) or count (only the total). Defaults to ids.
+            size: Maximum number of ids per query. Defaults to 10000.
+            batch_size: Unused, for compatibility with Search.
+            max_concurrent_searches: Unused, for compatibility with Search.
+            use_self_implemented: Unused, the local index has no Lucene query parser and always uses the Boolean query compiler.
+
+        Returns:
+            List with a dict per query: total (and ids in the ids mode), or error if the query failed.
+        """
+        results = []
+        for query in queries:
+            try:
+                docs = self.local_index.evaluate(compile_query(query) if isinstance(query, str) else query).docs()
+            except (QuerySyntaxError, ValueError) as e:
+                results.append({'error': str(e)})
+                continue
+            result = {'total': len(docs)}
+            if mode == 'ids':
+                result['ids'] = [self.local_index.ids[doc] for doc in docs[:size]]
+            results.append(result)
+        return results
+
+    def retrieve_document(self, id):
+        """
+        Retrieve a document given the documents index id.
+
+        Returns:
+            Dict like the response of the Elasticsearch get operation.
+        """
+        doc = self.local_index.doc_numbers.get(id)
+        if doc is None:
+            return {'_index': ES_INDEX_NAME, '_id': id, 'found': False}
+        return {'_index': ES_INDEX_NAME, '_id': id, 'found': True, '_source': self.local_index.get_document(doc)}
+
+    def get_titles(self, ids, batch_size=1000):
+        """
+        Returns the titles of documents, like Search.get_titles.
+        """
+        doc_numbers = self.local_index.doc_numbers
+        return {id: self.local_index.get_document(doc_numbers[id]).get(IndexFields.TITLE.value, '')
+                for id in ids if id in doc_numbers}
+
+    async def async_retrieve_document(self, id):
+        return self.retrieve_document(id)
+
+    def get_cache_stats(self):
+        return {}
+
+
+class LocalCursor:
+    """
+    Pagination of one query on a LocalSearch with the interface of SearchCursor.
+    The matching documents are evaluated once, the pages only load the stored documents.
+    """
+    def __init__(self, search, query, page_size=10):
+        self.search = search
+        self.query = query
+        self.page_size = page_size
+        self.docs = None
+
+    def get_page(self, page):
+        if self.docs is None:
+            self.docs = self.search.local_index.evaluate(self.query).docs()
+        source = self.search.get_source()
+        start = (page - 1) * self.page_size
+        hits = [self.search.hit(doc, source) for doc in self.docs[start:start + self.page_size]]
+        return {'hits': {'total': len(self.docs), 'hits': hits}}
+
+    def close(self):
+        self.docs = None
@@ -0,0 +1,458 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from elasticsearch import NotFoundError
+
+from src.utils.constants import ES_INDEX_NAME
+
+# Sort of the pages: by score, ties broken by the implicit _shard_doc of the point in time
+SORT = [{'_score': {'order': 'desc'}}]
+# Maximum number of hits fetched at once when walking to a page whose start is not known yet
+MAX_WALK_SIZE = 10000
+
+# Thread pool for the prefetching of the next pages, shared by all cursors
+PREFETCH_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='prefetch')
+
+
+class CursorClosedError(RuntimeError):
+    """
+    Raised if a request of a closed cursor would open a new point in time.
+    """
+
+
+class SearchCursor:
+    """
+    This class handles the pagination of one query with a point in time (PIT) and search_after.
+
+    Every page starts after the sort values of the last hit of the previous page, so fetching page N+1 costs the same
+    for every N and is not limited by max_result_window. After a page was fetched the next page is prefetched
+    in the background. To jump to a page whose start is not known yet, the cursor walks there by fetching
+    only the sort values of the pages in between.
+    """
+    def __init__(self, search, query, page_size=10, keep_alive='5m', prefetch=True, max_cached_pages=10):
+        """
+        Args:
+            search: The Search instance.
+            query: The Elasticsearch query.
+            page_size: Number of hits per page. Defaults to 10.
+            keep_alive: How long Elasticsearch keeps the point in time between two requests. Defaults to 5m.
+            prefetch: Whether to prefetch the next page. Defaults to True.
+            max_cached_pages: Maximum number of fetched pages kept in memory. Defaults to 10.
+        """
+        self.search = search
+        self.query = query
+        self.page_size = page_size
+        self.keep_alive = keep_alive
+        self.prefetch = prefetch
+        self.max_cached_pages = max_cached_pages
+        self.lock = threading.Lock()
+        self.closed = False
+        # Key and number of users of a cursor shared by a CursorPool
+        self.key = None
+        self.users = 0
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the point in time and all page starts.
+        """
+        self.pit_id = None
+        self.total = None
+        self.page_starts = {1: None}
+        self.pages = OrderedDict()
+
+    def es_client(self):
+        return self.search.es_client()
+
+    def open(self):
+        """
+        Opens the point in time if it is not open yet.
+
+        Raises:
+            CursorClosedError: If the cursor was closed, so requests still running after the close do not leak a point in time.
+        """
+        with self.lock:
+            if self.closed:
+                raise CursorClosedError("The cursor was closed.")
+            if self.pit_id is None:
+                self.pit_id = self.es_client().open_point_in_time(index=ES_INDEX_NAME, keep_alive=self.keep_alive)['id']
+
+    def close(self):
+        """
+        Closes the point in time. The cursor cannot be used afterwards.
+        """
+        with self.lock:
+            self.closed = True
+            pit_id = self.pit_id
+            self.reset()
+        if pit_id is not None:
+            try:
+                self.es_client().close_point_in_time(id=pit_id)
+            except NotFoundError:
+                pass
+
+    def num_pages(self):
+        """
+        Returns the number of pages, or None if the total is not known yet.
+        """
+        if self.total is None:
+            return None
+        return max(1, -(-self.total // self.page_size))
+
+    def build_request(self, search_after, size, sort_only=False):
+        """
+        Returns the arguments of one search request within the point in time.
+
+        Args:
+            search_after: Sort values after which the hits start, None for the first hit.
+            size: Number of hits.
+            sort_only: Whether to only return the sort values of the hits (no source, no highlights). Defaults to False.
+
+        Returns:
+            Dict with the arguments of the search operation.
+        """
+        kwargs = dict(
+            pit={'id': self.pit_id, 'keep_alive': self.keep_alive},
+            query=self.query,
+            size=size,
+            sort=SORT,
+            track_total_hits=self.total is None,
+            **self.search.get_limits(),
+        )
+        if search_after is not None:
+            kwargs['search_after'] = search_after
+        if sort_only:
+            kwargs['source'] = False
+            kwargs['filter_path'] = ['pit_id', 'hits.total', 'hits.hits.sort']
+        else:
+            kwargs['highlight'] = self.search.get_highlight()
+            kwargs['source'] = self.search.get_source()
+        return kwargs
+
+    def handle_response(self, resp):
+        """
+        Updates the point in time id and the total number of hits from a search response.
+
+        Returns:
+            The response.
+        """
+        with self.lock:
+            self.pit_id = resp.get('pit_id', self.pit_id)
+            total = resp.get('hits', {}).get('total')
+            if self.total is None and total is not None:
+                self.total = total['value'] if isinstance(total, dict) else total
+        return resp
+
+    def request(self, search_after, size, sort_only=False):
+        """
+        Sends one search request within the point in time (see build_request).
+
+        Returns:
+            Response of the Elasticsearch search operation.
+        """
+        self.open()
+        return self.handle_response(self.es_client().search(**self.build_request(search_after, size, sort_only)))
+
+    def next_walk(self, page):
+        """
+        Returns the next step of the walk to a page: the closest known page before it and the number of pages to skip.
+
+        Args:
+            page: The page number, starting at 1.
+
+        Returns:
+            Tuple with (known page, number of pages), or None if the start of the page is known.
+        """
+        if page in self.page_starts:
+            return None
+        known = max(p for p in list(self.page_starts) if p <= page)
+        return known, min(page - known, max(1, MAX_WALK_SIZE // self.page_size))
+
+    def record_walk(self, known, pages, resp):
+        """
+        Stores the page starts found by a step of the walk.
+
+        Returns:
+            Whether the walk can continue (False if the hits ended).
+        """
+        hits = resp.get('hits', {}).get('hits', [])
+        with self.lock:
+            for i in range(self.page_size - 1, len(hits), self.page_size):
+                self.page_starts[known + 1 + i // self.page_size] = hits[i]['sort']
+        return len(hits) == pages * self.page_size
+
+    def record_page(self, page, resp):
+        """
+        Stores the start of the next page.
+
+        Returns:
+            Dict with the hits of the page and the total number of hits (and timed_out or terminated_early), like a search response.
+        """
+        hits = resp['hits']['hits'] if resp is not None else []
+        if len(hits) == self.page_size:
+            with self.lock:
+                self.page_starts[page + 1] = hits[-1]['sort']
+        response = {'hits': {'total': self.total, 'hits': hits}}
+        # Flags of a search stopped by the timeout or terminate_after of the Search instance
+        for flag in ('timed_out', 'terminated_early'):
+            if resp is not None and resp.get(flag):
+                response[flag] = True
+        return response
+
+    def fetch_page(self, page):
+        """
+        Fetches a page from Elasticsearch, walking to its start if needed.
+
+        Args:
+            page: The page number, starting at 1.
+
+        Returns:
+            Dict with the hits of the page and the total number of hits, like a search response.
+        """
+        step = self.next_walk(page)
+        while step is not None:
+            resp = self.request(self.page_starts[step[0]], step[1] * self.page_size, sort_only=True)
+            if not self.record_walk(*step, resp):
+                break
+            step = self.next_walk(page)
+        resp = self.request(self.page_starts[page], self.page_size) if page in self.page_starts else None
+        return self.record_page(page, resp)
+
+    def get_page(self, page):
+        """
+        Returns a page, from the prefetched or cached pages if possible, and prefetches the next page.
+
+        Args:
+            page: The page number, starting at 1.
+
+        Returns:
+            Dict with the hits of the page and the total number of hits, like a search response.
+        """
+        with self.lock:
+            future = self.pages.get(page)
+            if future is not None:
+                self.pages.move_to_end(page)
+        if future is not None:
+            try:
+                response = future.result()
+            except Exception:
+                # A failed prefetch (e.g. a timeout or 429) must not stay cached, the page is fetched again
+                with self.lock:
+                    if self.pages.get(page) is future:
+                        del self.pages[page]
+                future = None
+        if future is None:
+            try:
+                response = self.fetch_page(page)
+            except NotFoundError:
+                # The point in time expired, start again with a new one
+                with self.lock:
+                    self.reset()
+                response = self.fetch_page(page)
+
+        with self.lock:
+            if future is None:
+                # A completed future, so a later result() never waits behind the prefetches in the pool
+                future = Future()
+                future.set_result(response)
+                self.pages[page] = future
+            if self.should_prefetch(page):
+                self.pages[page + 1] = PREFETCH_EXECUTOR.submit(self.fetch_page, page + 1)
+            self.evict_pages()
+        return response
+
+    def should_prefetch(self, page):
+        """
+        Returns whether the page after the given page should be prefetched.
+        """
+        num_pages = self.num_pages()
+        return self.prefetch and page + 1 not in self.pages and num_pages is not None and page < num_pages
+
+    def evict_pages(self):
+        """
+        Drops the least recently used pages if more than max_cached_pages are kept.
+        """
+        while len(self.pages) > self.max_cached_pages:
+            self.pages.popitem(last=False)
+
+
+class AsyncSearchCursor(SearchCursor):
+    """
+    Awaitable version of SearchCursor with the async client of the Search instance.
+    The next pages are prefetched in tasks of the event loop instead of threads.
+    """
+    async def es_client(self):
+        return await self.search.async_es_client()
+
+    async def open(self):
+        if self.closed:
+            raise CursorClosedError("The cursor was closed.")
+        if self.pit_id is None:
+            resp = await (await self.es_client()).open_point_in_time(index=ES_INDEX_NAME, keep_alive=self.keep_alive)
+            if self.pit_id is None and not self.closed:
+                self.pit_id = resp['id']
+            else:
+                # A concurrent request opened a point in time first, or the cursor was closed meanwhile
+                await (await self.es_client()).close_point_in_time(id=resp['id'])
+                if self.closed:
+                    raise CursorClosedError("The cursor was closed.")
+
+    async def close(self):
+        self.closed = True
+        pit_id = self.pit_id
+        tasks = list(self.pages.values())
+        for task in tasks:
+            task.cancel()
+        self.reset()
+        # The cancelled prefetches finish before the point in time is closed, so none of them outlives the cursor
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if pit_id is not None:
+            try:
+                await (await self.es_client()).close_point_in_time(id=pit_id)
+            except NotFoundError:
+                pass
+
+    async def request(self, search_after, size, sort_only=False):
+        await self.open()
+        return self.handle_response(await (await self.es_client()).search(**self.build_request(search_after, size, sort_only)))
+
+    async def fetch_page(self, page):
+        step = self.next_walk(page)
+        while step is not None:
+            resp = await self.request(self.page_starts[step[0]], step[1] * self.page_size, sort_only=True)
+            if not self.record_walk(*step, resp):
+                break
+            step = self.next_walk(page)
+        resp = await self.request(self.page_starts[page], self.page_size) if page in self.page_starts else None
+        return self.record_page(page, resp)
+
+    async def get_page(self, page):
+        task = self.pages.get(page)
+        if task is not None:
+            self.pages.move_to_end(page)
+            try:
+                # A cancelled caller does not cancel the prefetch, which later callers might still need
+                response = await asyncio.shield(task)
+            except (Exception, asyncio.CancelledError) as e:
+                # A cancelled caller stops here. A failed or cancelled prefetch (e.g. a timeout, 429 or close)
+                # must not stay cached, the page is fetched again
+                if isinstance(e, asyncio.CancelledError) and not task.cancelled():
+                    raise
+                if self.pages.get(page) is task:
+                    del self.pages[page]
+                task = None
+        if task is None:
+            try:
+                response = await self.fetch_page(page)
+            except NotFoundError:
+                # The point in time expired, start again with a new one
+                self.reset()
+                response = await self.fetch_page(page)
+            task = asyncio.get_running_loop().create_future()
+            task.set_result(response)
+            self.pages[page] = task
+        if self.should_prefetch(page):
+            prefetch = asyncio.ensure_future(self.fetch_page(page + 1))
+            # get_page drops a failed prefetch and fetches the page again, the exception must not be logged as unretrieved
+            prefetch.add_done_callback(lambda task: task.cancelled() or task.exception())
+            self.pages[page + 1] = prefetch
+        self.evict_pages()
+        return response
+
+
+class CursorPool:
+    """
+    This class shares cursors between the sessions of the app. Sessions searching the same query with the same options
+    (same key) page through the same cursor, so their requests for the same page can be coalesced by the SearchScheduler
+    and every page is fetched once.
+
+    The pool is the result cache of the paginated searches: a cursor without sessions stays idle with its fetched pages,
+    so a later search of the same query (e.g. by another reviewer) starts from the cached pages. At most max_idle cursors
+    are kept for at most idle_ttl seconds, the others are returned by release to be closed.
+    """
+    def __init__(self, max_idle=32, idle_ttl=300):
+        """
+        Args:
+            max_idle: Maximum number of idle cursors. Defaults to 32.
+            idle_ttl: Seconds an idle cursor is kept. Defaults to 300.
+        """
+        self.max_idle = max_idle
+        self.idle_ttl = idle_ttl
+        self.cursors = {}
+        self.idle = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, key, open_cursor):
+        """
+        Returns the cursor of a key and counts the caller as one of its users.
+
+        Args:
+            key: Key of the query and the options of the cursor (see ResultCache.make_key).
+            open_cursor: Function returning a new cursor if the key has none.
+
+        Returns:
+            The cursor, its key attribute is the key.
+        """
+        with self.lock:
+            cursor = self.cursors.get(key)
+            if cursor is None:
+                self.misses += 1
+                cursor = open_cursor()
+                cursor.key = key
+                self.cursors[key] = cursor
+            else:
+                self.hits += 1
+                self.idle.pop(key, None)
+            cursor.users += 1
+            return cursor
+
+    def release(self, cursor):
+        """
+        Releases a cursor returned by acquire. A cursor without users becomes idle.
+
+        Returns:
+            List with the cursors that were dropped from the pool (the oldest and expired idle ones), which the caller must close.
+        """
+        with self.lock:
+            cursor.users -= 1
+            if cursor.users > 0 or self.cursors.get(cursor.key) is not cursor:
+                return []
+            now = time.monotonic()
+            self.idle[cursor.key] = now
+            dropped = []
+            while self.idle:
+                key, released_at = next(iter(self.idle.items()))
+                if len(self.idle) <= self.max_idle and now - released_at < self.idle_ttl:
+                    break
+                del self.idle[key]
+                dropped.append(self.cursors.pop(key))
+            return dropped
+
+    def clear_idle(self):
+        """
+        Drops all idle cursors, e.g. before the client is closed.
+
+        Returns:
+            List with the dropped cursors, which the caller must close.
+        """
+        with self.lock:
+            dropped = [self.cursors.pop(key) for key in self.idle]
+            self.idle.clear()
+            return dropped
+
+    def stats(self):
+        """
+        Returns the hit and miss counters.
+
+        Returns:
+            Dict with hits (searches that reused a cursor), misses, hit_rate, cursors (in use and idle) and idle.
+        """
+        with self.lock:
+            requests = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / requests if requests else 0.0,
+                    'cursors': len(self.cursors), 'idle': len(self.idle)}
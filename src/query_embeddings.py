@@ -0,0 +1,121 @@
+import asyncio
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from src.embeddings import Embedder
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_query(query):
+    """
+    Normalizes a query for the cache lookup (lowercase, collapsed whitespace).
+
+    Args:
+        query: The query string.
+
+    Returns:
+        The normalized query.
+    """
+    return WHITESPACE_PATTERN.sub(' ', query).strip().lower()
+
+
+class QueryEmbeddingService:
+    """
+    This class handles the embedding of search queries for all sessions of the app.
+
+    The embeddings are kept in an LRU cache keyed by the normalized query, identical concurrent requests
+    share one computation (single-flight) and the model is encoded in a thread pool, so the event loop is never blocked.
+    """
+    def __init__(self, embedder_factory=None, max_size=1024, max_workers=2):
+        """
+        Args:
+            embedder_factory: Function returning the embedder (with an encode method).
+                Defaults to None (an Embedder with the default model and without disk cache).
+            max_size: Maximum number of cached query embeddings. Defaults to 1024.
+            max_workers: Number of threads encoding queries. Defaults to 2.
+        """
+        self.embedder_factory = embedder_factory or (lambda: Embedder(cache_path=None))
+        self.embedder = None
+        self.max_size = max_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='query-embeddings')
+        self.cache = OrderedDict()
+        self.in_flight = {}
+        self.loading = None
+        self.hits = 0
+        self.misses = 0
+
+    async def warm_up(self):
+        """
+        Loads the embedding model in the thread pool. Concurrent calls wait for the same loading.
+        """
+        if self.embedder is not None:
+            return
+        if self.loading is None:
+            loop = asyncio.get_running_loop()
+            self.loading = loop.run_in_executor(self.executor, self.embedder_factory)
+        try:
+            self.embedder = await asyncio.shield(self.loading)
+        except Exception:
+            # Allow a new attempt
+            self.loading = None
+            raise
+
+    async def get_embedding(self, query):
+        """
+        Returns the embedding of a query.
+
+        Args:
+            query: The query string.
+
+        Returns:
+            The embedding vector.
+        """
+        key = normalize_query(query)
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        if key in self.in_flight:
+            self.hits += 1
+            return await asyncio.shield(self.in_flight[key])
+
+        self.misses += 1
+        # The computation runs in its own task, so a cancelled caller does not cancel it for the others
+        task = asyncio.ensure_future(self.compute_embedding(key))
+        self.in_flight[key] = task
+        return await asyncio.shield(task)
+
+    async def compute_embedding(self, key):
+        """
+        Computes the embedding of a normalized query and stores it in the cache.
+
+        Args:
+            key: The normalized query.
+
+        Returns:
+            The embedding vector.
+        """
+        try:
+            await self.warm_up()
+            embedding = await asyncio.get_running_loop().run_in_executor(self.executor, self.embedder.encode, key)
+        finally:
+            self.in_flight.pop(key, None)
+        self.cache[key] = embedding
+        if len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+        return embedding
+
+
+QUERY_EMBEDDING_SERVICE = None
+
+
+def get_query_embedding_service():
+    """
+    Returns the process-wide QueryEmbeddingService.
+    """
+    global QUERY_EMBEDDING_SERVICE
+    if QUERY_EMBEDDING_SERVICE is None:
+        QUERY_EMBEDDING_SERVICE = QueryEmbeddingService()
+    return QUERY_EMBEDDING_SERVICE
@@ -0,0 +1,223 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+
+from ollama import AsyncClient
+
+from src.utils.constants import LLM_MODEL, LLM_CACHE_PATH, LLM_MAX_CONCURRENT
+
+INTRODUCTION_PROMPT = 'You are an information specialist who develops Boolean queries for systematic reviews. \
+    You have extensive experience developing highly effective queries for searching information retrieval literature. \
+    Your specialty is developing queries that retrieve as few irrelevant documents as possible and retrieve all relevant documents \
+    for your information need. \
+    Now you have your information need to conduct research on the topic of {topic}. \
+    '
+SINGLE_PROMPT = INTRODUCTION_PROMPT + 'Please construct a highly effective systematic review Boolean query that can best serve your information need. \
+    The Boolean query should be designed for the IR Anthology, a collection containing all papers related to information retrieval research. \
+    Do not answer with anything else than the Boolean query (like explanations)!'
+SUB_TOPICS_PROMPT = INTRODUCTION_PROMPT + 'First, please disassemble the topic into multiple relevant subtopics and return a list of these sub-topics. \
+    Do not answer with anything else than the list of sub-topics (like explanations)!'
+SYNONYMS_PROMPT = INTRODUCTION_PROMPT + 'Given is a list of sub-topics for this topic: {sub_topics}. \
+    Please find relevant synonyms for each of these sub-topics and return them as a list. \
+    Do not answer with anything else than the list of synonyms for each sub-topic (like explanations)!'
+QUERY_PROMPT = INTRODUCTION_PROMPT + 'Given is a list of sub-topics with corresponding synonyms for this topic: {synonyms}. \
+    Please construct a highly effective systematic review Boolean query that can best serve your information need and that uses the given list of synonyms. \
+    The Boolean query should be designed for the IR Anthology, a collection containing all papers related to information retrieval research. \
+    The IR Anthology contains the following searchable index fields: full_text (standard searched field), year, title, author, editor, doi. \
+    Do not answer with anything else than the Boolean query (like explanations)!'
+
+# Prompt chains: every step is formatted with the topic and the responses of the previous steps, the last step returns the query
+PIPELINES = {
+    'single': [('query', SINGLE_PROMPT)],
+    'multi_step': [('sub_topics', SUB_TOPICS_PROMPT), ('synonyms', SYNONYMS_PROMPT), ('query', QUERY_PROMPT)],
+}
+CODE_FENCE_PATTERN = re.compile(r'^```[\w-]*\s*|\s*```$')
+
+
+def read_json_lines(path):
+    """
+    Reads a file with one JSON object per line. A partially written last line (from an interrupted run) is removed,
+    so that new lines can be appended.
+
+    Args:
+        path: Path of the file.
+
+    Returns:
+        List with the objects, empty if the file does not exist.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, 'rb') as f:
+        data = f.read()
+    complete = data[:data.rfind(b'\n') + 1]
+    if len(complete) < len(data):
+        with open(path, 'r+b') as f:
+            f.truncate(len(complete))
+    return [json.loads(line) for line in complete.decode('utf8').splitlines() if line.strip()]
+
+
+def clean_query(response):
+    """
+    Returns the Boolean query of an LLM response without surrounding whitespace and markdown code fences.
+    """
+    return CODE_FENCE_PATTERN.sub('', response.strip()).strip()
+
+
+class ResponseCache:
+    """
+    On-disk cache of LLM responses, keyed by the hash of the model, the prompt and the options (including the seed).
+    The responses are appended to a file with one JSON object per line, so the cache survives interrupted runs.
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.responses_path = os.path.join(path, 'responses.jsonl')
+        self.responses = {entry['key']: entry['response'] for entry in read_json_lines(self.responses_path)}
+
+    def __len__(self):
+        return len(self.responses)
+
+    @staticmethod
+    def make_key(model, prompt, options):
+        return hashlib.sha256(json.dumps([model, prompt, options], sort_keys=True).encode('utf8')).hexdigest()
+
+    def get(self, key):
+        return self.responses.get(key)
+
+    def put(self, key, response):
+        if key in self.responses:
+            return
+        self.responses[key] = response
+        with open(self.responses_path, 'a', encoding='utf8') as f:
+            f.write(json.dumps({'key': key, 'response': response}, ensure_ascii=False) + '\n')
+
+
+class QueryGenerator:
+    """
+    This class generates Boolean queries for many topics and seeds with the prompt chains of PIPELINES.
+
+    The chains of all topics and seeds run concurrently, at most max_concurrent requests are sent to ollama at once.
+    Every response is cached on disk, and every finished chain is appended to a progress file, so an interrupted
+    run continues where it stopped and a repeated run sends no requests.
+    """
+    def __init__(self, model=LLM_MODEL, host=None, cache_path=LLM_CACHE_PATH, max_concurrent=LLM_MAX_CONCURRENT, options=None):
+        """
+        Args:
+            model: The ollama model. Defaults to LLM_MODEL.
+            host: URL of the ollama server. Defaults to None (OLLAMA_HOST or the local default).
+            cache_path: Directory of the response cache, None to disable it. Defaults to LLM_CACHE_PATH.
+            max_concurrent: Maximum number of concurrent requests. Defaults to LLM_MAX_CONCURRENT.
+            options: Dict with further model options (e.g. temperature). Defaults to None.
+        """
+        self.model = model
+        self.client = AsyncClient(host=host)
+        self.cache = ResponseCache(cache_path) if cache_path else None
+        self.max_concurrent = max_concurrent
+        self.options = options or {}
+        self.semaphore = None
+        self.requests = 0
+        self.cache_hits = 0
+
+    async def generate(self, prompt, seed=None):
+        """
+        Returns the response of the model to a prompt, from the cache if possible.
+
+        Args:
+            prompt: The prompt.
+            seed: Seed of the sampling, different seeds give different query variants. Defaults to None.
+
+        Returns:
+            The response text.
+        """
+        options = dict(self.options) if seed is None else dict(self.options, seed=seed)
+        key = ResponseCache.make_key(self.model, prompt, options)
+        if self.cache is not None and self.cache.get(key) is not None:
+            self.cache_hits += 1
+            return self.cache.get(key)
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrent)
+        async with self.semaphore:
+            self.requests += 1
+            response = (await self.client.generate(model=self.model, prompt=prompt, options=options))['response']
+        if self.cache is not None:
+            self.cache.put(key, response)
+        return response
+
+    async def run_chain(self, topic, seed=None, pipeline='multi_step'):
+        """
+        Runs the prompt chain of a pipeline for one topic.
+
+        Args:
+            topic: The topic.
+            seed: Seed of the sampling. Defaults to None.
+            pipeline: Name of the pipeline in PIPELINES. Defaults to multi_step.
+
+        Returns:
+            Dict with topic, seed, pipeline, model, the response of every step and the query.
+        """
+        steps = {}
+        for name, prompt in PIPELINES[pipeline]:
+            steps[name] = await self.generate(prompt.format(topic=topic, **steps), seed)
+        return {'topic': topic, 'seed': seed, 'pipeline': pipeline, 'model': self.model, 'steps': steps,
+                'query': clean_query(steps['query'])}
+
+    async def run(self, topics, seeds=(None,), pipelines=('multi_step',), progress_path=None):
+        """
+        Runs the pipelines for all combinations of topics and seeds.
+
+        Args:
+            topics: List with the topics.
+            seeds: List with the seeds. Defaults to one run without seed.
+            pipelines: List with the names of the pipelines. Defaults to multi_step.
+            progress_path: File to which every finished chain is appended. The chains already in it are skipped.
+                Defaults to None (no progress file).
+
+        Returns:
+            List with the result of every chain (see run_chain), or dict with topic, seed, pipeline and error if it failed.
+        """
+        done = {}
+        if progress_path:
+            for result in read_json_lines(progress_path):
+                if result['model'] == self.model:
+                    done[(result['topic'], result['seed'], result['pipeline'])] = result
+        chains = [(topic, seed, pipeline) for topic in topics for seed in seeds for pipeline in pipelines]
+        todo = [chain for chain in chains if chain not in done]
+        print(f"{len(chains) - len(todo)} of {len(chains)} chains already done")
+        start = time.perf_counter()
+
+        async def run_and_record(topic, seed, pipeline):
+            try:
+                result = await self.run_chain(topic, seed, pipeline)
+            except Exception as e:
+                print(f"Failed {pipeline} for {topic!r} (seed {seed}): {e!r}")
+                return {'topic': topic, 'seed': seed, 'pipeline': pipeline, 'error': repr(e)}
+            if progress_path:
+                with open(progress_path, 'a', encoding='utf8') as f:
+                    f.write(json.dumps(result, ensure_ascii=False) + '\n')
+            return result
+
+        results = await asyncio.gather(*(run_and_record(*chain) for chain in todo))
+        print(f"Ran {len(todo)} chains in {time.perf_counter() - start:.1f}s "
+              f"({self.requests} requests, {self.cache_hits} cached responses)")
+        done.update(((result['topic'], result['seed'], result['pipeline']), result) for result in results)
+        return [done[chain] for chain in chains]
+
+
+def to_queries(results):
+    """
+    Returns the generated queries in the format of evaluate_case_study.py --queries.
+
+    Args:
+        results: List with the results of QueryGenerator.run.
+
+    Returns:
+        Dict with topic -> (variant -> query), the variant is <pipeline>-<seed>.
+    """
+    queries = {}
+    for result in results:
+        if 'error' not in result:
+            queries.setdefault(result['topic'], {})[f"{result['pipeline']}-{result['seed']}"] = result['query']
+    return queries
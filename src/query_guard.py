@@ -0,0 +1,260 @@
+import re
+
+from elasticsearch import ApiError
+
+from src.utils.constants import ES_INDEX_NAME
+
+# Queries whose value is a term pattern that Elasticsearch expands to the matching terms of the index
+PATTERN_QUERIES = {'wildcard', 'prefix', 'regexp', 'fuzzy'}
+# Queries with a query string in the Lucene syntax
+QUERY_STRING_QUERIES = {'query_string', 'simple_query_string'}
+PHRASE_PATTERN = re.compile(r'"[^"]*"')
+QUERY_STRING_TERM_PATTERN = re.compile(r'[^\s()"]+')
+QUERY_STRING_OPERATORS = {'AND', 'OR', 'NOT', '&&', '||', '!', '+', '-'}
+FIELD_PREFIX_PATTERN = re.compile(r'^[+\-!]?[\w.*]+:')
+# A range like [2000 TO 2020] or {a TO b} is one clause, although it contains spaces
+RANGE_PATTERN = re.compile(r'[\[{][^\]}]*\sTO\s[^\]}]*[\]}]')
+# A backslash-escaped character is a literal, e.g. \* is not a wildcard
+ESCAPED_PATTERN = re.compile(r'\\.')
+REGEXP_META_CHARACTERS = '.?+*|{}[]()"\\#@&<>~'
+
+
+class GuardDecision:
+    """
+    Decision of the QueryGuard about one query, with the cost estimate it is based on.
+    """
+    def __init__(self, clauses=0, expansions=None):
+        self.clauses = clauses
+        self.expansions = expansions or []
+        self.reasons = []
+        self.warnings = []
+        self.valid = None
+
+    @property
+    def allowed(self):
+        return not self.reasons
+
+    def reject(self, reason):
+        self.reasons.append(reason)
+
+    def warn(self, warning):
+        self.warnings.append(warning)
+
+    def get_message(self):
+        """
+        Returns the message for the user: the reasons of a rejection, otherwise the warnings (empty if there are none).
+        """
+        if self.reasons:
+            return 'The query was not run: ' + ' '.join(self.reasons)
+        return ' '.join(self.warnings)
+
+
+def get_literal_prefix(pattern, query_type='wildcard'):
+    """
+    Returns the literal characters before the first wildcard or regular expression operator of a term pattern.
+    The shorter the prefix, the more terms of the index the pattern can expand to.
+
+    Args:
+        pattern: The term pattern.
+        query_type: wildcard, prefix, regexp or fuzzy. Defaults to wildcard.
+
+    Returns:
+        The literal prefix.
+    """
+    if query_type in ('prefix', 'fuzzy'):
+        return pattern
+    meta_characters = REGEXP_META_CHARACTERS if query_type == 'regexp' else '*?'
+    prefix = []
+    i = 0
+    while i < len(pattern):
+        if pattern[i] == '\\' and i + 1 < len(pattern):
+            # Escaped characters are literal
+            prefix.append(pattern[i + 1])
+            i += 2
+            continue
+        if pattern[i] in meta_characters:
+            break
+        prefix.append(pattern[i])
+        i += 1
+    return ''.join(prefix)
+
+
+def analyze_query_string(query_string):
+    """
+    Estimates the cost of a query string in the Lucene syntax.
+
+    Args:
+        query_string: The query string.
+
+    Returns:
+        Tuple with (number of clauses, list with the (type, pattern) of the terms with wildcards or fuzziness).
+    """
+    phrases = PHRASE_PATTERN.findall(query_string)
+    query_string = PHRASE_PATTERN.sub(' ', query_string)
+    ranges = RANGE_PATTERN.findall(query_string)
+    expansions = []
+    clauses = len(phrases) + len(ranges)
+    for term in QUERY_STRING_TERM_PATTERN.findall(RANGE_PATTERN.sub(' ', query_string)):
+        if term in QUERY_STRING_OPERATORS:
+            continue
+        # Operators before a term (+, - or !) and field names are not part of the term pattern
+        term = FIELD_PREFIX_PATTERN.sub('', term).lstrip('+-!')
+        if not term:
+            continue
+        clauses += 1
+        # Only unescaped characters are operators
+        operators = ESCAPED_PATTERN.sub('', term)
+        if operators.startswith('/') and operators.endswith('/') and len(term) > 1:
+            expansions.append(('regexp', term[1:-1]))
+        elif '*' in operators or '?' in operators:
+            expansions.append(('wildcard', term))
+        elif '~' in operators:
+            expansions.append(('fuzzy', term.split('~')[0]))
+    return clauses, expansions
+
+
+def analyze_query(query):
+    """
+    Estimates the cost of an Elasticsearch query: the number of its leaf clauses and its term patterns,
+    which Elasticsearch expands to all matching terms of the index.
+
+    Args:
+        query: The Elasticsearch query.
+
+    Returns:
+        GuardDecision with the clauses and expansions, without a decision yet.
+    """
+    decision = GuardDecision()
+    stack = [query]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        if not isinstance(node, dict):
+            continue
+        for key, value in node.items():
+            if key in PATTERN_QUERIES and isinstance(value, dict):
+                for pattern in value.values():
+                    if isinstance(pattern, dict):
+                        pattern = pattern.get('value', pattern.get('wildcard', ''))
+                    decision.clauses += 1
+                    decision.expansions.append((key, str(pattern)))
+            elif key in QUERY_STRING_QUERIES and isinstance(value, dict):
+                clauses, expansions = analyze_query_string(value.get('query', ''))
+                decision.clauses += clauses
+                decision.expansions += expansions
+            elif key in ('match', 'match_phrase', 'match_phrase_prefix', 'term', 'match_bool_prefix'):
+                decision.clauses += len(value) if isinstance(value, dict) else 1
+            elif key == 'terms' and isinstance(value, dict):
+                decision.clauses += sum(len(terms) for terms in value.values() if isinstance(terms, list))
+            elif key == 'multi_match' and isinstance(value, dict):
+                decision.clauses += len(value.get('fields', [])) or 1
+            elif key not in ('script', 'query_vector') and isinstance(value, (dict, list)):
+                stack.append(value)
+    return decision
+
+
+class QueryGuard:
+    """
+    This class checks queries before they are sent to the cluster, so that one pathological query
+    (e.g. an LLM-generated query with leading wildcards or hundreds of OR terms) does not stall the searches of everyone.
+
+    - Cost heuristics: the number of clauses and of term patterns (wildcard, prefix, regexp, fuzzy) are limited,
+      and patterns without enough literal characters before the first wildcard are rejected,
+      because they expand to a large part of the terms of the index.
+    - Validation: the query is checked with the _validate/query API, so malformed queries fail before the search.
+
+    Queries that pass are run with the timeout and terminate_after of the Search instance (see Search.get_limits).
+    """
+    def __init__(self, search, max_clauses=1024, max_expansions=32, min_prefix_length=1, warn_prefix_length=3, validate=True):
+        """
+        Args:
+            search: The Search instance whose clients validate the queries.
+            max_clauses: Maximum number of leaf clauses of a query. Defaults to 1024.
+            max_expansions: Maximum number of term patterns of a query. Defaults to 32.
+            min_prefix_length: Minimum number of literal characters before the first wildcard. Defaults to 1 (no leading wildcards).
+            warn_prefix_length: Patterns with shorter literal prefixes are allowed with a warning. Defaults to 3.
+            validate: Whether to validate the queries with the _validate/query API. Defaults to True.
+        """
+        self.search = search
+        self.max_clauses = max_clauses
+        self.max_expansions = max_expansions
+        self.min_prefix_length = min_prefix_length
+        self.warn_prefix_length = warn_prefix_length
+        self.validate = validate
+
+    def estimate(self, query):
+        """
+        Decides about a query by the cost heuristics, without a request to the cluster.
+
+        Args:
+            query: The Elasticsearch query.
+
+        Returns:
+            The GuardDecision.
+        """
+        decision = analyze_query(query)
+        if decision.clauses > self.max_clauses:
+            decision.reject(f"It has {decision.clauses} terms, at most {self.max_clauses} are allowed.")
+        if len(decision.expansions) > self.max_expansions:
+            decision.reject(f"It has {len(decision.expansions)} wildcard or fuzzy terms, at most {self.max_expansions} are allowed.")
+        short = []
+        broad = []
+        for query_type, pattern in decision.expansions:
+            prefix = get_literal_prefix(pattern, query_type)
+            if len(prefix) < self.min_prefix_length and query_type != 'fuzzy':
+                short.append(pattern)
+            elif len(prefix) < self.warn_prefix_length:
+                broad.append(pattern)
+        if short:
+            rule = "Terms must not start with a wildcard" if self.min_prefix_length == 1 else \
+                f"Terms need at least {self.min_prefix_length} characters before a wildcard"
+            decision.reject(f"{rule} ({', '.join(short)}).")
+        if broad:
+            decision.warn(f"The search may be slow because of the broad terms {', '.join(broad)}.")
+        return decision
+
+    @staticmethod
+    def parse_validation(decision, response):
+        """
+        Adds the result of the _validate/query API to a decision.
+        """
+        decision.valid = response.get('valid', False)
+        if not decision.valid:
+            explanations = [explanation.get('error') for explanation in response.get('explanations', []) if explanation.get('error')]
+            decision.reject(f"It is not a valid query: {explanations[0] if explanations else response.get('error', 'unknown error')}")
+        return decision
+
+    def check(self, query):
+        """
+        Decides about a query by the cost heuristics and validates it with the cluster.
+
+        Args:
+            query: The Elasticsearch query.
+
+        Returns:
+            The GuardDecision.
+        """
+        decision = self.estimate(query)
+        if decision.allowed and self.validate:
+            try:
+                response = self.search.es_client().indices.validate_query(index=ES_INDEX_NAME, query=query, explain=True)
+            except ApiError as e:
+                response = {'valid': False, 'error': str(e)}
+            self.parse_validation(decision, dict(response))
+        return decision
+
+    async def async_check(self, query):
+        """
+        Awaitable version of check with the async client.
+        """
+        decision = self.estimate(query)
+        if decision.allowed and self.validate:
+            try:
+                es_client = await self.search.async_es_client()
+                response = await es_client.indices.validate_query(index=ES_INDEX_NAME, query=query, explain=True)
+            except ApiError as e:
+                response = {'valid': False, 'error': str(e)}
+            self.parse_validation(decision, dict(response))
+        return decision
@@ -1,15 +1,61 @@
-from src.utils.constants import IndexFields, ES_INDEX_NAME
-from src.elasticsearch_client import ElasticsearchClient
+from src.utils.constants import IndexFields, ES_INDEX_NAME, ES_SEARCH_TIMEOUT
+from src.utils.result_cache import ResultCache
+from src.utils.boolean_query import QuerySyntaxError
+from src.utils.query_parser import QueryParser
+from src.pagination import SearchCursor, AsyncSearchCursor, CursorPool
+from src.highlighting import get_highlight
+from src.elasticsearch_client import ElasticsearchClient, AsyncElasticsearchClient
+
+# Result cache shared by all Search instances of the process. It serves search and async_search (scripts, evaluations)
+SEARCH_RESULT_CACHE = ResultCache()
+
+# Cursors shared by the sessions of the process that search the same query. It caches the pages of the demo,
+# which pages through cursors: the fetched pages of a cursor are reused by all sessions with the same cursor key
+SEARCH_CURSOR_POOL = CursorPool()
+
+# Maximum number of ids per query in the ids mode of msearch (index.max_result_window)
+MAX_BATCH_IDS = 10000
+
+# _source filters of the search modes
+SOURCE_FILTERS = {
+    # Result list: everything but the large fields, the preview replaces the full-text
+    'results': {'excludes': [IndexFields.FULL_TEXT.value, IndexFields.EMBEDDING.value]},
+    # Only the ids and scores of the hits
+    'ids': False,
+    # The complete documents
+    'full': True,
+}
 
 
 class Search:
     """
     This class handles search the iranthology Elasticsearch index.
     """
-    def __init__(self, es_client: ElasticsearchClient=None):
+    def __init__(self, es_client: ElasticsearchClient=None, result_cache: ResultCache=SEARCH_RESULT_CACHE, highlight_profile='display',
+                 source_mode='results', async_es_client: AsyncElasticsearchClient=None, timeout=ES_SEARCH_TIMEOUT, terminate_after=None,
+                 cursor_pool: CursorPool=SEARCH_CURSOR_POOL):
+        """
+        Args:
+            es_client: The Elasticsearch client. Defaults to None (a new ElasticsearchClient, unless async_es_client is given).
+            result_cache: Cache of the search responses, None to disable it. Defaults to SEARCH_RESULT_CACHE.
+            highlight_profile: Name of the default highlight profile (see HIGHLIGHT_PROFILES). Defaults to display.
+            source_mode: Name of the default _source filter (see SOURCE_FILTERS). Defaults to results.
+            async_es_client: The async Elasticsearch client used by the awaitable methods (async_search, ...). Defaults to None.
+            timeout: Time after which Elasticsearch stops a search and returns the hits found so far (timed_out is set),
+                None for no limit. Defaults to ES_SEARCH_TIMEOUT.
+            terminate_after: Maximum number of documents collected per shard, None for no limit (terminated_early is set). Defaults to None.
+            cursor_pool: Pool of the cursors shared between sessions (see acquire_cursor). Defaults to SEARCH_CURSOR_POOL.
+        """
         self.es_client = es_client
-        if not self.es_client:
+        self.async_es_client = async_es_client
+        if not self.es_client and not self.async_es_client:
             self.es_client = ElasticsearchClient()
+        self.result_cache = result_cache
+        self.highlight_profile = highlight_profile
+        self.source_mode = source_mode
+        self.timeout = timeout
+        self.terminate_after = terminate_after
+        self.cursor_pool = cursor_pool
     
     def retrieve_document(self, id):
         """
@@ -23,8 +69,371 @@ class Search:
         """
         return self.es_client().get(index=ES_INDEX_NAME, id=id)
 
-    def search(self, query, from_, size):
-        return self.es_client().search(index=ES_INDEX_NAME, query=query, from_=from_, size=size, rest_total_hits_as_int=True, highlight={"fields": {field.value: {} for field in IndexFields}, 'pre_tags': ['<b>'], 'post_tags': ['</b>']})
+    async def async_retrieve_document(self, id):
+        """
+        Awaitable version of retrieve_document with the async client.
+        """
+        return await (await self.async_es_client()).get(index=ES_INDEX_NAME, id=id)
+
+    @staticmethod
+    def parse_index_generation(mappings):
+        """
+        Returns the index generation from the mappings of the indices behind ES_INDEX_NAME.
+        """
+        return tuple(sorted((index, str(mapping.get('mappings', {}).get('_meta', {}).get('generation')))
+                            for index, mapping in mappings.items()))
+
+    def get_index_generation(self):
+        """
+        Returns the generation of the index: the indices behind ES_INDEX_NAME with the generation in their mapping metadata.
+        It changes with every reindex and every sync that changed documents.
+
+        Returns:
+            Tuple with (index name, generation) pairs.
+        """
+        return self.parse_index_generation(self.es_client().indices.get_mapping(index=ES_INDEX_NAME).body)
+
+    def check_index_generation(self):
+        """
+        Drops the cached results if the index generation changed. The generation is only requested
+        once per generation_check_interval of the result cache.
+        """
+        if self.result_cache.needs_generation_check():
+            try:
+                self.result_cache.update_generation(self.get_index_generation())
+            except Exception as e:
+                print(f"Could not check the index generation: {e}")
+
+    async def async_check_index_generation(self):
+        """
+        Awaitable version of check_index_generation with the async client.
+        """
+        if self.result_cache.needs_generation_check():
+            try:
+                mappings = (await (await self.async_es_client()).indices.get_mapping(index=ES_INDEX_NAME)).body
+                self.result_cache.update_generation(self.parse_index_generation(mappings))
+            except Exception as e:
+                print(f"Could not check the index generation: {e}")
+
+    def get_highlight(self, highlight_profile=None):
+        """
+        Returns the highlight options of the search requests.
+
+        Args:
+            highlight_profile: Name of the highlight profile. Defaults to None (the default profile of this instance).
+
+        Returns:
+            Dict with the highlight options, or None if nothing is highlighted.
+        """
+        return get_highlight(highlight_profile or self.highlight_profile)
+
+    def get_source(self, source_mode=None):
+        """
+        Returns the _source filter of the search requests.
+
+        Args:
+            source_mode: Name of the search mode in SOURCE_FILTERS. Defaults to None (the default mode of this instance).
+
+        Returns:
+            The _source filter (bool or dict with includes and excludes).
+        """
+        return SOURCE_FILTERS[source_mode or self.source_mode]
+
+    def get_limits(self):
+        """
+        Returns the server-side limits of a search request.
+
+        Returns:
+            Dict with the timeout and terminate_after arguments of the search operation, if set.
+        """
+        limits = {}
+        if self.timeout is not None:
+            limits['timeout'] = self.timeout
+        if self.terminate_after is not None:
+            limits['terminate_after'] = self.terminate_after
+        return limits
+
+    def open_cursor(self, query, page_size=10, **cursor_options):
+        """
+        Returns a cursor paginating the hits of a query with a point in time and search_after.
+        The point in time is opened with the first page request.
+
+        Args:
+            query: The Elasticsearch query.
+            page_size: Number of hits per page. Defaults to 10.
+            cursor_options: Further options of the SearchCursor (keep_alive, prefetch, max_cached_pages).
+
+        Returns:
+            The SearchCursor.
+        """
+        return SearchCursor(self, query, page_size=page_size, **cursor_options)
+
+    def open_async_cursor(self, query, page_size=10, **cursor_options):
+        """
+        Awaitable version of open_cursor with the async client (see AsyncSearchCursor).
+        """
+        return AsyncSearchCursor(self, query, page_size=page_size, **cursor_options)
+
+    def get_cursor_key(self, query, page_size, asynchronous):
+        """
+        Returns the key of a cursor in the cursor pool: the query, the page size, the options of the requests
+        and the index generation, so a reindex gives new searches a new point in time.
+        """
+        generation = self.result_cache.generation if self.result_cache is not None else None
+        return ResultCache.make_key(query=query, page_size=page_size, highlight=self.get_highlight(), source=self.get_source(),
+                                    limits=self.get_limits(), generation=generation, asynchronous=asynchronous)
+
+    def acquire_cursor(self, query, page_size=10):
+        """
+        Returns a cursor of a query from the cursor pool, shared with the other sessions searching the same query,
+        so their searches of the same page can be coalesced. It is released with release_cursor instead of being closed.
+
+        Args:
+            query: The Elasticsearch query.
+            page_size: Number of hits per page. Defaults to 10.
+
+        Returns:
+            The SearchCursor.
+        """
+        if self.result_cache is not None:
+            self.check_index_generation()
+        key = self.get_cursor_key(query, page_size, asynchronous=False)
+        return self.cursor_pool.acquire(key, lambda: self.open_cursor(query, page_size=page_size))
+
+    def release_cursor(self, cursor):
+        """
+        Releases a cursor of acquire_cursor. If no other session uses it, it stays idle in the pool with its fetched pages,
+        and the idle cursors dropped from the pool are closed.
+        """
+        for unused in self.cursor_pool.release(cursor):
+            unused.close()
+
+    async def async_acquire_cursor(self, query, page_size=10):
+        """
+        Awaitable version of acquire_cursor with the async client (see AsyncSearchCursor).
+        """
+        if self.result_cache is not None:
+            await self.async_check_index_generation()
+        key = self.get_cursor_key(query, page_size, asynchronous=True)
+        return self.cursor_pool.acquire(key, lambda: self.open_async_cursor(query, page_size=page_size))
+
+    async def async_release_cursor(self, cursor):
+        """
+        Awaitable version of release_cursor.
+        """
+        for unused in self.cursor_pool.release(cursor):
+            await unused.close()
+
+    def close_idle_cursors(self):
+        """
+        Closes the cursors of the pool that no session uses, e.g. before the client is closed.
+        """
+        for cursor in self.cursor_pool.clear_idle():
+            cursor.close()
+
+    async def async_close_idle_cursors(self):
+        """
+        Awaitable version of close_idle_cursors.
+        """
+        for cursor in self.cursor_pool.clear_idle():
+            await cursor.close()
+
+    def search(self, query, from_, size, use_cache=True, highlight_profile=None, source_mode=None):
+        """
+        Search the index. Responses are cached by query, from_, size, highlight options and _source filter in the result cache.
+
+        Args:
+            query: The Elasticsearch query.
+            from_: Offset of the first hit.
+            size: Number of hits.
+            use_cache: Whether to use the result cache. Defaults to True.
+            highlight_profile: Name of the highlight profile. Defaults to None (the default profile of this instance).
+            source_mode: Name of the _source filter. Defaults to None (the default mode of this instance).
+
+        Returns:
+            Response of the Elasticsearch search operation.
+        """
+        highlight = self.get_highlight(highlight_profile)
+        source = self.get_source(source_mode)
+        if not use_cache or self.result_cache is None:
+            return self.es_client().search(index=ES_INDEX_NAME, query=query, from_=from_, size=size, rest_total_hits_as_int=True,
+                                           highlight=highlight, source=source, **self.get_limits())
+
+        self.check_index_generation()
+        key = self.result_cache.make_key(query=query, from_=from_, size=size, highlight=highlight, source=source,
+                                         terminate_after=self.terminate_after)
+        response = self.result_cache.get(key)
+        if response is None:
+            response = self.es_client().search(index=ES_INDEX_NAME, query=query, from_=from_, size=size, rest_total_hits_as_int=True,
+                                               highlight=highlight, source=source, **self.get_limits())
+            # A search that timed out only has part of the hits, it is not cached
+            if not response.get('timed_out'):
+                self.result_cache.put(key, response)
+        return response
+
+    async def async_search(self, query, from_, size, use_cache=True, highlight_profile=None, source_mode=None):
+        """
+        Awaitable version of search with the async client. It shares the result cache with search.
+        """
+        highlight = self.get_highlight(highlight_profile)
+        source = self.get_source(source_mode)
+        es_client = await self.async_es_client()
+        if not use_cache or self.result_cache is None:
+            return await es_client.search(index=ES_INDEX_NAME, query=query, from_=from_, size=size, rest_total_hits_as_int=True,
+                                          highlight=highlight, source=source, **self.get_limits())
+
+        await self.async_check_index_generation()
+        key = self.result_cache.make_key(query=query, from_=from_, size=size, highlight=highlight, source=source,
+                                         terminate_after=self.terminate_after)
+        response = self.result_cache.get(key)
+        if response is None:
+            response = await es_client.search(index=ES_INDEX_NAME, query=query, from_=from_, size=size, rest_total_hits_as_int=True,
+                                              highlight=highlight, source=source, **self.get_limits())
+            # A search that timed out only has part of the hits, it is not cached
+            if not response.get('timed_out'):
+                self.result_cache.put(key, response)
+        return response
+
+    def get_titles(self, ids, batch_size=1000):
+        """
+        Returns the titles of documents, e.g. to match the ids returned by msearch against a list of relevant papers.
+
+        Args:
+            ids: List with the ids of the documents.
+            batch_size: Number of documents per _mget request. Defaults to 1000.
+
+        Returns:
+            Dict with id -> title of the documents that were found.
+        """
+        ids = list(dict.fromkeys(ids))
+        titles = {}
+        for start in range(0, len(ids), batch_size):
+            response = self.es_client().mget(index=ES_INDEX_NAME, ids=ids[start:start + batch_size],
+                                             source=[IndexFields.TITLE.value])
+            titles.update((doc['_id'], doc['_source'].get(IndexFields.TITLE.value, '')) for doc in response['docs'] if doc.get('found'))
+        return titles
+
+    @staticmethod
+    def build_msearch_body(queries, mode='ids', size=MAX_BATCH_IDS, timeout=None):
+        """
+        Returns the body of a multi search request.
+
+        Args:
+            queries: List with Elasticsearch queries.
+            mode: ids (ids of the first size hits and the total) or count (only the total). Defaults to ids.
+            size: Maximum number of ids per query. Defaults to MAX_BATCH_IDS.
+            timeout: Time after which Elasticsearch stops a query (its result gets timed_out). Defaults to None (no limit).
+
+        Returns:
+            List with a header and a body per query.
+        """
+        searches = []
+        for query in queries:
+            body = {'query': query, 'track_total_hits': True, '_source': False, 'size': size if mode == 'ids' else 0}
+            if mode == 'ids':
+                # Skip the scoring and loading of stored fields, only the ids are needed
+                body['sort'] = ['_doc']
+                body['stored_fields'] = '_none_'
+            if timeout is not None:
+                body['timeout'] = timeout
+            searches += [{'index': ES_INDEX_NAME}, body]
+        return searches
+
+    @staticmethod
+    def parse_msearch_response(response, mode='ids'):
+        """
+        Returns the results of a multi search response.
+
+        Returns:
+            List with a dict per query: total (and ids in the ids mode, and timed_out if the query was stopped
+            by the timeout), or error if the query failed.
+        """
+        results = []
+        for resp in response['responses']:
+            if 'error' in resp:
+                error = resp['error']
+                results.append({'error': error.get('reason', str(error)) if isinstance(error, dict) else str(error)})
+                continue
+            total = resp['hits']['total']
+            result = {'total': total['value'] if isinstance(total, dict) else total}
+            if mode == 'ids':
+                result['ids'] = [hit['_id'] for hit in resp['hits'].get('hits', [])]
+            if resp.get('timed_out'):
+                result['timed_out'] = True
+            results.append(result)
+        return results
+
+    @staticmethod
+    def compile_queries(queries, use_self_implemented=False):
+        """
+        Builds the Elasticsearch queries of the query strings of a list of queries with the QueryParser.
+        By default they are query_string queries like in the demo, so the counts match what a reviewer sees.
+
+        Args:
+            queries: List with Elasticsearch queries or query strings.
+            use_self_implemented: Whether to compile the query strings with the Boolean query compiler. Defaults to False.
+
+        Returns:
+            Tuple with (dict with position -> Elasticsearch query, dict with position -> error of the queries that could not be parsed).
+        """
+        query_parser = QueryParser(use_self_implemented=use_self_implemented)
+        compiled = {}
+        errors = {}
+        for i, query in enumerate(queries):
+            try:
+                compiled[i] = query_parser.build_query(query)['query'] if isinstance(query, str) else query
+            except QuerySyntaxError as e:
+                errors[i] = {'error': str(e)}
+        return compiled, errors
+
+    def msearch(self, queries, mode='ids', size=MAX_BATCH_IDS, batch_size=100, max_concurrent_searches=None, use_self_implemented=False):
+        """
+        Runs many queries with one _msearch request per batch, e.g. to evaluate LLM-generated query variants.
+        The hits are neither scored by relevance, nor highlighted, nor loaded from _source.
+
+        Args:
+            queries: List with Elasticsearch queries or query strings (built like in the demo, see compile_queries).
+            mode: ids (ids of the first size hits and the total) or count (only the total). Defaults to ids.
+            size: Maximum number of ids per query. Defaults to MAX_BATCH_IDS.
+            batch_size: Number of queries per _msearch request. Defaults to 100.
+            max_concurrent_searches: Number of queries Elasticsearch runs in parallel. Defaults to None (cluster default).
+            use_self_implemented: Whether to compile the query strings with the Boolean query compiler
+                instead of query_string queries. Defaults to False.
+
+        Returns:
+            List with a dict per query: total (and ids in the ids mode), or error if the query failed.
+        """
+        compiled, results = self.compile_queries(queries, use_self_implemented)
+        positions = list(compiled)
+        for start in range(0, len(positions), batch_size):
+            batch = positions[start:start + batch_size]
+            searches = self.build_msearch_body([compiled[i] for i in batch], mode, size, self.timeout)
+            response = self.es_client().msearch(searches=searches, max_concurrent_searches=max_concurrent_searches,
+                                                rest_total_hits_as_int=True)
+            results.update(zip(batch, self.parse_msearch_response(response, mode)))
+        return [results[i] for i in range(len(queries))]
+
+    async def async_msearch(self, queries, mode='ids', size=MAX_BATCH_IDS, batch_size=100, max_concurrent_searches=None,
+                            use_self_implemented=False):
+        """
+        Awaitable version of msearch with the async client.
+        """
+        compiled, results = self.compile_queries(queries, use_self_implemented)
+        positions = list(compiled)
+        es_client = await self.async_es_client()
+        for start in range(0, len(positions), batch_size):
+            batch = positions[start:start + batch_size]
+            searches = self.build_msearch_body([compiled[i] for i in batch], mode, size, self.timeout)
+            response = await es_client.msearch(searches=searches, max_concurrent_searches=max_concurrent_searches,
+                                               rest_total_hits_as_int=True)
+            results.update(zip(batch, self.parse_msearch_response(response, mode)))
+        return [results[i] for i in range(len(queries))]
+
+    def get_cache_stats(self):
+        """
+        Returns the hit and miss counters of the result cache.
+        """
+        return self.result_cache.stats() if self.result_cache is not None else {}
     
     # TODO: Unused method, could be deleted
     def boolean_search(self, query_args, minimum_should_match=0):
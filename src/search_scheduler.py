@@ -0,0 +1,194 @@
+import asyncio
+import time
+from collections import deque
+
+
+class SearchQueueFull(Exception):
+    """
+    Raised if a search is rejected because the queue of the SearchScheduler is full.
+    """
+
+
+class ScheduledSearch:
+    """
+    A search in the SearchScheduler and the number of sessions waiting for it.
+    """
+    def __init__(self):
+        self.task = None
+        self.waiters = 0
+        self.queued_at = time.monotonic()
+        self.dequeued = False
+
+
+class SearchScheduler:
+    """
+    This class schedules the searches of all sessions of the app.
+
+    - At most max_concurrent searches run at once, the others wait in a queue of at most max_queue searches.
+      Further searches are rejected with SearchQueueFull, so the waiting time stays bounded under load.
+    - Identical concurrent searches (same key) are coalesced into one search. The search runs with the search_factory
+      of the first session, so the sessions of a key must be able to share its result, e.g. by paging through
+      the same shared cursor (see Search.acquire_cursor).
+    - A new search of a session cancels its previous one. A search is cancelled when no session waits for it anymore.
+    """
+    def __init__(self, max_concurrent=8, max_queue=64, max_samples=1000):
+        """
+        Args:
+            max_concurrent: Maximum number of searches running at once. Defaults to 8.
+            max_queue: Maximum number of searches waiting to run. Defaults to 64.
+            max_samples: Number of recent queue waiting times kept for the metrics. Defaults to 1000.
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.semaphore = None
+        self.searches = {}
+        self.sessions = {}
+        self.queue_depth = 0
+        self.running = 0
+        self.max_queue_depth = 0
+        self.submitted = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.completed = 0
+        self.wait_times = deque(maxlen=max_samples)
+
+    async def run(self, session_id, key, search_factory):
+        """
+        Runs a search, or waits for an identical search that is already scheduled.
+
+        Args:
+            session_id: Identifier of the session. Its previous search is cancelled.
+            key: Key of the search, identical searches have equal keys (see ResultCache.make_key).
+            search_factory: Function returning an awaitable with the search response.
+
+        Returns:
+            The search response.
+
+        Raises:
+            SearchQueueFull: If the queue is full.
+            asyncio.CancelledError: If the search was cancelled by a newer search of the session.
+        """
+        self.cancel_session(session_id)
+        self.submitted += 1
+        scheduled = self.searches.get(key)
+        if scheduled is None:
+            if self.queue_depth >= self.max_queue:
+                self.rejected += 1
+                raise SearchQueueFull(f"{self.queue_depth} searches are waiting, please try again later.")
+            scheduled = ScheduledSearch()
+            self.queue_depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+            scheduled.task = asyncio.ensure_future(self.execute(scheduled, search_factory))
+            scheduled.task.add_done_callback(lambda task: self.finish(key, scheduled))
+            self.searches[key] = scheduled
+        else:
+            self.coalesced += 1
+        scheduled.waiters += 1
+
+        # Every session waits on its own future, so it can be cancelled without cancelling the search for the others
+        waiter = asyncio.get_running_loop().create_future()
+        scheduled.task.add_done_callback(lambda task: self.resolve(waiter, task))
+        self.sessions[session_id] = waiter
+        try:
+            return await waiter
+        finally:
+            if self.sessions.get(session_id) is waiter:
+                del self.sessions[session_id]
+            self.release(scheduled)
+
+    def cancel_session(self, session_id):
+        """
+        Cancels the search a session is waiting for.
+
+        Args:
+            session_id: Identifier of the session.
+        """
+        waiter = self.sessions.pop(session_id, None)
+        if waiter is not None and not waiter.done():
+            waiter.cancel()
+
+    @staticmethod
+    def resolve(waiter, task):
+        """
+        Passes the outcome of a search to the future of a waiting session, unless the session stopped waiting.
+        """
+        if waiter.done():
+            return
+        if task.cancelled():
+            waiter.cancel()
+        elif task.exception() is not None:
+            waiter.set_exception(task.exception())
+        else:
+            waiter.set_result(task.result())
+
+    def release(self, scheduled):
+        """
+        Removes a waiting session from a search and cancels the search if nobody waits for it anymore.
+        """
+        scheduled.waiters -= 1
+        if scheduled.waiters == 0 and not scheduled.task.done():
+            self.cancelled += 1
+            scheduled.task.cancel()
+
+    async def execute(self, scheduled, search_factory):
+        """
+        Waits in the queue for a free slot and runs the search.
+        """
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrent)
+        async with self.semaphore:
+            self.queue_depth -= 1
+            scheduled.dequeued = True
+            self.wait_times.append(time.monotonic() - scheduled.queued_at)
+            self.running += 1
+            try:
+                response = await search_factory()
+            finally:
+                self.running -= 1
+        self.completed += 1
+        return response
+
+    def finish(self, key, scheduled):
+        """
+        Removes a finished search (also one cancelled while queued) from the scheduler.
+        """
+        if not scheduled.dequeued:
+            self.queue_depth -= 1
+        if self.searches.get(key) is scheduled:
+            del self.searches[key]
+
+    def stats(self):
+        """
+        Returns the metrics of the scheduler.
+
+        Returns:
+            Dict with the current queue_depth and running searches, the max_queue_depth, the counters
+            (submitted, coalesced, cancelled, rejected, completed) and the mean and p95 queue waiting time in seconds.
+        """
+        wait_times = sorted(self.wait_times)
+        return {
+            'queue_depth': self.queue_depth,
+            'running': self.running,
+            'max_queue_depth': self.max_queue_depth,
+            'submitted': self.submitted,
+            'coalesced': self.coalesced,
+            'cancelled': self.cancelled,
+            'rejected': self.rejected,
+            'completed': self.completed,
+            'mean_wait': sum(wait_times) / len(wait_times) if wait_times else 0.0,
+            'p95_wait': wait_times[int(0.95 * (len(wait_times) - 1))] if wait_times else 0.0,
+        }
+
+
+SEARCH_SCHEDULER = None
+
+
+def get_search_scheduler():
+    """
+    Returns the process-wide SearchScheduler.
+    """
+    global SEARCH_SCHEDULER
+    if SEARCH_SCHEDULER is None:
+        SEARCH_SCHEDULER = SearchScheduler()
+    return SEARCH_SCHEDULER
@@ -1,11 +1,17 @@
-from nicegui import ui, binding
+from nicegui import ui, app, binding
 import asyncio
-import threading
 from functools import partial
 import math
 
-from src import Index, Search, Document, ElasticsearchClient
+from src import Search, Document
+from src.elasticsearch_client import get_elasticsearch_client, get_async_elasticsearch_client
+from src.query_embeddings import get_query_embedding_service
+from src.search_scheduler import get_search_scheduler, SearchQueueFull
+from src.query_guard import QueryGuard
+from src.utils.result_cache import ResultCache
+from src.utils.constants import ES_ASYNC_CLIENT
 from src.utils import QueryParser
+from src.utils.boolean_query import QuerySyntaxError
 
 
 class Userinterface:
@@ -15,17 +21,24 @@ class Userinterface:
     use_embeddings = binding.BindableProperty()
 
     def __init__(self):
-        self.queue_lock = threading.Lock()
-        self.es_client = ElasticsearchClient()
-        self._index = Index(self.es_client)
-        self._search = Search(self.es_client)
+        self.query_embeddings = get_query_embedding_service()
+        self.scheduler = get_search_scheduler()
+        # The clients are shared by all sessions, the async client connects with the first search
+        if ES_ASYNC_CLIENT:
+            self._search = Search(async_es_client=get_async_elasticsearch_client())
+        else:
+            self._search = Search(get_elasticsearch_client())
+        self.query_guard = QueryGuard(self._search)
         self.query_parser = QueryParser(use_self_implemented=False)
         self.use_embeddings = False
         self.only_search_title_abstract = False
         self.search_bar_input = ""
         self.last_response = None
+        self.notices = []
         self.page = 1
         self.max_num_results = 10
+        self.cursor = None
+        self.guard_warnings = []
     
     def update_search_bar_input(self, new_search_bar_input):
         """
@@ -79,32 +92,76 @@ class Userinterface:
         """
         self.results.clear()
         self.page = 1
+        # A new search gets a new cursor, the old one is released in the background (and closed if no other session uses it)
+        if self.cursor is not None:
+            if ES_ASYNC_CLIENT:
+                asyncio.ensure_future(self._search.async_release_cursor(self.cursor))
+            else:
+                asyncio.get_event_loop().run_in_executor(None, self._search.release_cursor, self.cursor)
+            self.cursor = None
         await self.search()
     
     async def search(self):
         """
         Searches the IR anthology index with the current search_bar_input and refreshes the UI with the results.
+        The pages of a search are fetched with the same cursor, so the pagination stays consistent and the next page is prefetched.
         """
         self.search_field.disable()
         with self.root:
             spinner = ui.spinner(size='128px', color='#9f371d')
         
         loop = asyncio.get_event_loop()
-        input_string = self.search_bar_input
-        # Build the Elasticsearch query
-        query = self.query_parser.build_query(input_string, only_search_title_abstract=self.only_search_title_abstract)
-        if self.use_embeddings:
-            with self.queue_lock:
-                if not self._index.model:
-                    await loop.run_in_executor(None, self._index.init_embedding_model)
-                embedding = await loop.run_in_executor(None, partial(self._index.get_embedding, input_string))
-            query = self.query_parser.build_dense_vector_query(query, embedding)
-        
-        # Perform the search
-        from_ = (self.page-1)*self.max_num_results
-        size = self.max_num_results
         try:
-            response = await loop.run_in_executor(None, partial(self._search.search, query['query'], from_, size))
+            if self.cursor is None:
+                input_string = self.search_bar_input
+                # Build the Elasticsearch query
+                query = self.query_parser.build_query(input_string, only_search_title_abstract=self.only_search_title_abstract)
+                if self.use_embeddings:
+                    embedding = await self.query_embeddings.get_embedding(input_string)
+                    query = self.query_parser.build_dense_vector_query(query, embedding)
+                # Check the cost and validity of the query before it reaches the cluster
+                if ES_ASYNC_CLIENT:
+                    decision = await self.query_guard.async_check(query['query'])
+                else:
+                    decision = await loop.run_in_executor(None, self.query_guard.check, query['query'])
+                if not decision.allowed:
+                    spinner.delete()
+                    self.show_error(decision.get_message())
+                    self.search_field.enable()
+                    return
+                self.guard_warnings = decision.warnings
+                # Sessions searching the same query share a cursor, so their searches of the same page are coalesced
+                if ES_ASYNC_CLIENT:
+                    self.cursor = await self._search.async_acquire_cursor(query['query'], page_size=self.max_num_results)
+                else:
+                    self.cursor = await loop.run_in_executor(None, partial(self._search.acquire_cursor, query['query'],
+                                                                           page_size=self.max_num_results))
+
+            # Perform the search through the scheduler, which limits the concurrent searches of all sessions
+            # and coalesces identical requests. The key of the shared cursor does not depend on the session,
+            # so all sessions searching the same page of the same query wait for one request
+            cursor = self.cursor
+            if ES_ASYNC_CLIENT:
+                search_factory = partial(cursor.get_page, self.page)
+            else:
+                search_factory = partial(loop.run_in_executor, None, partial(cursor.get_page, self.page))
+            key = ResultCache.make_key(cursor=cursor.key, page=self.page)
+            response = await self.scheduler.run(id(self), key, search_factory)
+        except asyncio.CancelledError:
+            # A newer search of this session replaced this one
+            spinner.delete()
+            return
+        except QuerySyntaxError as e:
+            spinner.delete()
+            self.show_error(f'Invalid query: {e}.')
+            self.search_field.enable()
+            return
+        except SearchQueueFull as e:
+            print(e)
+            spinner.delete()
+            self.show_error('Too many searches are running right now. Please try again in a moment.')
+            self.search_field.enable()
+            return
         except Exception as e:
             print(e)
             spinner.delete()
@@ -115,7 +172,12 @@ class Userinterface:
         # Update the UI with the documents in the response
         self.last_response = response['hits']['hits']
         self.current_total = response['hits']['total']
-        await loop.run_in_executor(None, partial(self.update_results))
+        self.notices = list(self.guard_warnings)
+        if response.get('timed_out'):
+            self.notices.append('The search took too long and was stopped, the results may be incomplete.')
+        if response.get('terminated_early'):
+            self.notices.append('The search was stopped after the maximum number of documents, the results may be incomplete.')
+        self.update_results()
         spinner.delete()
         self.search_field.enable()
     
@@ -123,6 +185,9 @@ class Userinterface:
         """
         Update the results UI with the last_response.
         """
+        with self.results:
+            for notice in self.notices:
+                ui.label(notice).style('color: #b45309;')
         if len(self.last_response) == 0:
             with self.results:
                 ui.label(f'No results with this query.')
@@ -166,12 +231,15 @@ class Userinterface:
         ui.navigate.to(self.title_label)
         await self.search()
 
-    def show_error(self):
+    def show_error(self, message='Something went wrong. Please make sure to use the search operators correctly!'):
         """
         Show an error message on the results UI.
+
+        Args:
+            message: The error message.
         """
         with self.results:
-            ui.label('Something went wrong. Please make sure to use the search operators correctly!').style('color: red;')
+            ui.label(message).style('color: red;')
 
 
 @ui.page('/demo')
@@ -182,6 +250,14 @@ def start_demo():
     webUI = Userinterface()
     webUI.build_userinterface()
 
+@app.get('/stats')
+def get_stats():
+    """
+    Returns the metrics of the search scheduler (queue depth, coalesced, cancelled and rejected searches, waiting times)
+    as JSON, to monitor the demo under load.
+    """
+    return get_search_scheduler().stats()
+
 @ui.page('/')
 def start_app():
     """
@@ -1,2 +1,23 @@
-from src.utils.file_loading_utils import get_all_files
-from src.utils.query_parser import QueryParser
+import importlib
+
+# Imported on first access, see src/__init__.py
+LAZY_ATTRIBUTES = {
+    'get_all_files': 'src.utils.file_loading_utils',
+    'iter_venue_files': 'src.utils.file_loading_utils',
+    'QueryParser': 'src.utils.query_parser',
+    'get_peak_memory_mb': 'src.utils.resource_utils',
+}
+
+__all__ = list(LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name not in LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,429 @@
+import re
+from functools import lru_cache
+
+from src.utils.constants import IndexFields
+
+# Typographic quotes as produced by LLMs and word processors, replaced by plain double quotes
+SMART_QUOTES = str.maketrans({'“': '"', '”': '"', '„': '"', '‟': '"', '«': '"', '»': '"',
+                              '″': '"', '‘': "'", '’': "'", '‚': "'", '‛': "'"})
+TOKEN_PATTERN = re.compile(r'\s*(?:(?P<lparen>\()|(?P<rparen>\))|"(?P<phrase>[^"]*)"|(?P<and>&&)|(?P<or>\|\|)|(?P<not>!)|(?P<plus>\+)|'
+                           r'(?P<minus>-)|(?P<field>[A-Za-z_]\w*):|(?P<range>[\[{][^\]}]*[\]}])|(?P<word>[^\s()"]+))')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+# A phrase of one token of the standard analyzer can be searched as a term
+SINGLE_TOKEN_PATTERN = re.compile(r'\w+')
+# Characters of the query_string syntax (escapes, boosts, fuzziness) that the compiler does not support
+UNSUPPORTED_PATTERN = re.compile(r'[:\\^~\[\]{}]')
+OPERATORS = {'AND': 'and', 'OR': 'or', 'NOT': 'not'}
+# Fields that can be searched with field:, the numeric fields only accept numbers and ranges
+QUERY_FIELDS = [IndexFields.FULL_TEXT.value, IndexFields.TITLE.value, IndexFields.ABSTRACT.value, IndexFields.YEAR.value,
+                IndexFields.AUTHOR.value, IndexFields.EDITOR.value, IndexFields.BOOKTITLE.value, IndexFields.SERIES.value,
+                IndexFields.VENUE.value, IndexFields.DOI.value, IndexFields.URL.value]
+NUMERIC_FIELDS = [IndexFields.YEAR.value]
+# Tokens that start an operand
+OPERAND_TOKENS = ('and', 'not', 'plus', 'minus', 'lparen', 'phrase', 'field', 'range', 'word')
+
+
+class QuerySyntaxError(ValueError):
+    """
+    Raised if a Boolean query cannot be parsed.
+    """
+    def __init__(self, message, position):
+        super().__init__(f"{message} at position {position}")
+        self.position = position
+
+
+class Node:
+    """
+    Node of the AST of a Boolean query.
+    Nodes are immutable and compared by their canonical string, so equal queries have equal canonical forms.
+    """
+    def canonical(self):
+        raise NotImplementedError
+
+    def __eq__(self, other):
+        return isinstance(other, Node) and self.canonical() == other.canonical()
+
+    def __hash__(self):
+        return hash(self.canonical())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.canonical()})"
+
+
+class Term(Node):
+    """
+    A single word, optionally with a * wildcard.
+    """
+    def __init__(self, text):
+        self.text = text.lower()
+        self.wildcard = '*' in self.text or '?' in self.text
+
+    def canonical(self):
+        return self.text
+
+
+class Phrase(Node):
+    """
+    Words in quotes that must appear in this order.
+    """
+    def __init__(self, text):
+        self.text = WHITESPACE_PATTERN.sub(' ', text).strip().lower()
+
+    def canonical(self):
+        return f'"{self.text}"'
+
+
+class Range(Node):
+    """
+    A range like [2000 TO 2020] (inclusive) or {2000 TO 2020} (exclusive), * is an open bound.
+    """
+    def __init__(self, lower, upper, include_lower=True, include_upper=True):
+        self.lower = lower
+        self.upper = upper
+        self.include_lower = include_lower
+        self.include_upper = include_upper
+
+    def canonical(self):
+        return f"{'[' if self.include_lower else '{'}{self.lower} TO {self.upper}{']' if self.include_upper else '}'}"
+
+
+class Field(Node):
+    """
+    An operand that is only searched in one field, e.g. title:(fairness OR bias).
+    """
+    def __init__(self, field, child):
+        self.field = field
+        self.child = child
+
+    def canonical(self):
+        return f'{self.field}:{self.child.canonical()}'
+
+
+class Not(Node):
+    def __init__(self, child):
+        self.child = child
+
+    def canonical(self):
+        return f'NOT {self.child.canonical()}'
+
+
+class Operator(Node):
+    """
+    AND or OR with any number of children.
+    """
+    name = None
+
+    def __init__(self, children):
+        self.children = tuple(children)
+        self._canonical = None
+
+    def canonical(self):
+        if self._canonical is None:
+            self._canonical = '(' + f' {self.name} '.join(child.canonical() for child in self.children) + ')'
+        return self._canonical
+
+
+class And(Operator):
+    name = 'AND'
+
+
+class Or(Operator):
+    name = 'OR'
+
+
+def tokenize(query):
+    """
+    Splits a Boolean query into tokens. Smart quotes are replaced by plain quotes first.
+
+    Args:
+        query: The query string.
+
+    Returns:
+        List with (kind, value, position) tuples, kind is one of lparen, rparen, phrase, and, or, not, plus, minus,
+        field (the name without the colon), range or word.
+
+    Raises:
+        QuerySyntaxError: If a quote is not closed or a word contains unsupported query_string syntax.
+    """
+    query = query.translate(SMART_QUOTES).rstrip()
+    tokens = []
+    position = 0
+    while position < len(query):
+        match = TOKEN_PATTERN.match(query, position)
+        if match is None:
+            raise QuerySyntaxError("Unclosed quote", query.index('"', position))
+        kind = match.lastgroup
+        value = match.group(kind)
+        start = match.start(kind)
+        if kind == 'word' and value in OPERATORS:
+            kind = OPERATORS[value]
+        elif kind == 'word' and (unsupported := UNSUPPORTED_PATTERN.search(value)):
+            raise QuerySyntaxError(f"Unsupported character '{unsupported.group()}'", start + unsupported.start())
+        tokens.append((kind, value, start))
+        position = match.end()
+    return tokens
+
+
+class Parser:
+    """
+    Recursive descent parser of Boolean queries:
+
+        or_expr  := and_expr (OR and_expr)*
+        and_expr := operand ((AND | implicit) operand)*
+        operand  := (NOT | '!' | '-') operand | '+' operand | atom
+        atom     := '(' or_expr ')' | phrase | word | field ':' (atom | range)
+
+    Adjacent operands without operator are combined with the default_operator, like in query_string.
+    Negated operands exclude documents from the whole sequence of adjacent operands, so "fairness -bias"
+    and "fairness NOT bias" mean fairness AND NOT bias. +operands are required, which only changes the
+    meaning if the default_operator is OR.
+    """
+    def __init__(self, tokens, default_operator='OR'):
+        self.tokens = tokens
+        self.index = 0
+        self.default_operator = default_operator
+
+    def peek(self):
+        return self.tokens[self.index][0] if self.index < len(self.tokens) else None
+
+    def position(self):
+        return self.tokens[self.index][2] if self.index < len(self.tokens) else (self.tokens[-1][2] + len(self.tokens[-1][1]) if self.tokens else 0)
+
+    def parse(self):
+        if not self.tokens:
+            raise QuerySyntaxError("Empty query", 0)
+        node = self.parse_or()
+        if self.index < len(self.tokens):
+            raise QuerySyntaxError(f"Unexpected '{self.tokens[self.index][1]}'", self.position())
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == 'or':
+            self.index += 1
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def parse_and(self):
+        position = self.position()
+        groups = [[self.parse_operand()]]
+        while self.peek() in OPERAND_TOKENS:
+            if self.peek() == 'and':
+                self.index += 1
+                groups[-1].append(self.parse_operand())
+            elif self.default_operator == 'AND':
+                groups[-1].append(self.parse_operand())
+            else:
+                groups.append([self.parse_operand()])
+        required, prohibited, optional = [], [], []
+        for group in groups:
+            if len(group) > 1:
+                optional.append(And(node for node, _ in group))
+                continue
+            node, is_required = group[0]
+            if is_required:
+                required.append(node)
+            elif isinstance(node, Not):
+                prohibited.append(node)
+            else:
+                optional.append(node)
+        if required and optional:
+            # query_string would only use the optional operands for the ranking
+            raise QuerySyntaxError("Operands without '+' next to '+' operands, combine them with AND or OR", position)
+        nodes = required or ([Or(optional)] if len(optional) > 1 else optional)
+        nodes = nodes + prohibited
+        return nodes[0] if len(nodes) == 1 else And(nodes)
+
+    def parse_operand(self):
+        """
+        Returns a tuple with (node, whether the operand is required by a + prefix).
+        """
+        if self.peek() in ('not', 'minus'):
+            self.index += 1
+            return Not(self.parse_operand()[0]), False
+        if self.peek() == 'plus':
+            self.index += 1
+            return self.parse_operand()[0], True
+        return self.parse_atom(), False
+
+    def parse_atom(self):
+        kind = self.peek()
+        if kind is None:
+            raise QuerySyntaxError("Unexpected end of query", self.position())
+        _, value, position = self.tokens[self.index]
+        self.index += 1
+        if kind == 'lparen':
+            node = self.parse_or()
+            if self.peek() != 'rparen':
+                raise QuerySyntaxError("Missing ')'", self.position())
+            self.index += 1
+            return node
+        if kind == 'phrase':
+            if not value.strip():
+                raise QuerySyntaxError("Empty phrase", position)
+            return Phrase(value)
+        if kind == 'word':
+            return Term(value)
+        if kind == 'field':
+            if value not in QUERY_FIELDS:
+                raise QuerySyntaxError(f"Unknown field '{value}'", position)
+            if self.peek() == 'range':
+                child = self.parse_range()
+            else:
+                child = self.parse_atom()
+            if value in NUMERIC_FIELDS and not is_numeric(child):
+                raise QuerySyntaxError(f"The field '{value}' only accepts numbers and ranges", position)
+            return Field(value, child)
+        if kind == 'range':
+            raise QuerySyntaxError("A range needs a field, e.g. year:[2000 TO 2020]", position)
+        raise QuerySyntaxError(f"Unexpected '{value}'", position)
+
+    def parse_range(self):
+        _, value, position = self.tokens[self.index]
+        self.index += 1
+        bounds = value[1:-1].split()
+        if len(bounds) != 3 or bounds[1] != 'TO':
+            raise QuerySyntaxError("A range must look like [lower TO upper]", position)
+        return Range(bounds[0], bounds[2], include_lower=value[0] == '[', include_upper=value[-1] == ']')
+
+
+def is_numeric(node):
+    """
+    Returns whether all operands of an AST are numbers or ranges.
+    """
+    if isinstance(node, Term):
+        return node.text.isdigit()
+    if isinstance(node, Range):
+        return all(bound == '*' or bound.isdigit() for bound in (node.lower, node.upper))
+    if isinstance(node, Not):
+        return is_numeric(node.child)
+    if isinstance(node, Operator):
+        return all(is_numeric(child) for child in node.children)
+    return False
+
+
+def normalize(node):
+    """
+    Returns the canonical form of an AST: nested operators of the same kind are flattened, duplicate
+    children (also after lowercasing) are removed, the children are sorted, phrases of a single token
+    become terms and double negations are removed.
+
+    Args:
+        node: The AST.
+
+    Returns:
+        The normalized AST.
+    """
+    if isinstance(node, Phrase):
+        # A quoted word is only a term if the analyzer keeps it as one token, "e-commerce" stays a phrase
+        # (as a term it would match e OR commerce) and wildcard characters are literal in a phrase
+        return Term(node.text) if SINGLE_TOKEN_PATTERN.fullmatch(node.text) else node
+    if isinstance(node, Field):
+        return Field(node.field, normalize(node.child))
+    if isinstance(node, Not):
+        child = normalize(node.child)
+        return child.child if isinstance(child, Not) else Not(child)
+    if isinstance(node, Operator):
+        children = {}
+        for child in node.children:
+            child = normalize(child)
+            for grandchild in (child.children if type(child) is type(node) else (child,)):
+                children.setdefault(grandchild.canonical(), grandchild)
+        if len(children) == 1:
+            return next(iter(children.values()))
+        return type(node)(children[key] for key in sorted(children))
+    return node
+
+
+def to_dsl(node, fields):
+    """
+    Returns the Elasticsearch query DSL of an AST.
+
+    Args:
+        node: The (normalized) AST.
+        fields: List with the searched fields.
+
+    Returns:
+        Dict with the query (bool, match, match_phrase, multi_match, range and wildcard queries).
+    """
+    if isinstance(node, Field):
+        return to_dsl(node.child, [node.field])
+    if isinstance(node, Range):
+        bounds = {}
+        if node.lower != '*':
+            bounds['gte' if node.include_lower else 'gt'] = node.lower
+        if node.upper != '*':
+            bounds['lte' if node.include_upper else 'lt'] = node.upper
+        return {'range': {fields[0]: bounds}}
+    if isinstance(node, Term):
+        if node.wildcard:
+            queries = [{'wildcard': {field: {'value': node.text, 'case_insensitive': True}}} for field in fields]
+            return queries[0] if len(queries) == 1 else {'bool': {'should': queries, 'minimum_should_match': 1}}
+        if len(fields) == 1:
+            return {'match': {fields[0]: {'query': node.text}}}
+        return {'multi_match': {'query': node.text, 'fields': list(fields)}}
+    if isinstance(node, Phrase):
+        if len(fields) == 1:
+            return {'match_phrase': {fields[0]: {'query': node.text}}}
+        return {'multi_match': {'query': node.text, 'fields': list(fields), 'type': 'phrase'}}
+    if isinstance(node, Not):
+        return {'bool': {'must': [{'match_all': {}}], 'must_not': [to_dsl(node.child, fields)]}}
+    if isinstance(node, And):
+        must = [to_dsl(child, fields) for child in node.children if not isinstance(child, Not)]
+        must_not = [to_dsl(child.child, fields) for child in node.children if isinstance(child, Not)]
+        query = {'must': must or [{'match_all': {}}]}
+        if must_not:
+            query['must_not'] = must_not
+        return {'bool': query}
+    if isinstance(node, Or):
+        return {'bool': {'should': [to_dsl(child, fields) for child in node.children], 'minimum_should_match': 1}}
+    raise TypeError(f"Unknown node {node!r}")
+
+
+@lru_cache(maxsize=1024)
+def parse_query(query, default_operator='OR'):
+    """
+    Parses and normalizes a Boolean query. The results are cached, the ASTs are immutable.
+
+    Args:
+        query: The query string with AND, OR, NOT, parentheses, "phrases", * wildcards, +/- prefixes
+            and field: scopes, e.g. title:(fairness OR bias) AND year:[2015 TO *].
+        default_operator: Operator between adjacent operands without operator. Defaults to OR (like query_string).
+
+    Returns:
+        The normalized AST.
+
+    Raises:
+        QuerySyntaxError: If the query cannot be parsed.
+    """
+    return normalize(Parser(tokenize(query), default_operator=default_operator).parse())
+
+
+def compile_query(query, fields=(IndexFields.FULL_TEXT.value,), default_operator='OR'):
+    """
+    Compiles a Boolean query to the Elasticsearch query DSL.
+
+    Args:
+        query: The query string.
+        fields: The searched fields. Defaults to the full-text.
+        default_operator: Operator between adjacent operands without operator. Defaults to OR.
+
+    Returns:
+        Dict with the query.
+    """
+    return to_dsl(parse_query(query, default_operator), list(fields))
+
+
+def canonical_query(query, default_operator='OR'):
+    """
+    Returns the canonical form of a Boolean query, e.g. as cache key. Queries that only differ in the order
+    of their operands, duplicates, nesting of equal operators, case, whitespace or quote style have the same form.
+
+    Args:
+        query: The query string.
+        default_operator: Operator between adjacent operands without operator. Defaults to OR.
+
+    Returns:
+        The canonical query string.
+    """
+    return parse_query(query, default_operator).canonical()
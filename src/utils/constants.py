@@ -4,6 +4,16 @@ from enum import Enum
 DATA_PATH=None
 ES_URL=None
 ES_INDEX_NAME=None
+INDEX_MANIFEST_PATH="index_manifest.json"
+EMBEDDING_MODEL_NAME="Alibaba-NLP/gte-Qwen2-1.5B-instruct"
+EMBEDDING_CACHE_PATH="embedding_cache"
+ES_ASYNC_CLIENT=True
+ES_CONNECTIONS_PER_NODE=25
+ES_HEALTH_CHECK_INTERVAL=30
+ES_SEARCH_TIMEOUT="10s"
+LLM_MODEL="gemma2:2b"
+LLM_CACHE_PATH="llm_cache"
+LLM_MAX_CONCURRENT=4
 
 
 class IndexFields(Enum):
@@ -22,3 +32,4 @@ class IndexFields(Enum):
     OPENACCESS = "openaccess"
     EMBEDDING = "embedding"
     ABSTRACT = "abstract"
+    PREVIEW = "preview"
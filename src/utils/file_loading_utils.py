@@ -1,12 +1,50 @@
 import os
 import glob
+import re
 import json
-from papermage import Document
+import itertools
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pybtex.database.input import bibtex
 from tqdm import tqdm
 
 NON_IMPORTANT_FILES = ['log.txt', 'dblp_bibtex_cache.txt', 'config.json']
 
+# A quote inside a JSON string is always escaped, so these can only match object keys
+SYMBOLS_KEY_PATTERN = re.compile(r'"symbols"\s*:\s*')
+ABSTRACTS_KEY_PATTERN = re.compile(r'"abstracts"\s*:\s*')
+JSON_DECODER = json.JSONDecoder()
+
+
+class BibEntry:
+    """
+    Lightweight and picklable version of a pybtex Entry.
+    It offers the attributes that are used to create the index documents (type, fields, persons).
+    """
+    def __init__(self, key, type, fields, persons):
+        self.key = key
+        self.type = type
+        self.fields = fields
+        self.persons = persons
+
+    @classmethod
+    def from_pybtex(cls, entry):
+        """
+        Creates a BibEntry from a pybtex Entry.
+
+        Args:
+            entry: The pybtex Entry.
+
+        Returns:
+            BibEntry with the fields as plain dict and the persons as lists of strings.
+        """
+        return cls(
+            entry.key,
+            entry.type,
+            {name.lower(): value for name, value in entry.fields.items()},
+            {role: [str(person) for person in persons] for role, persons in entry.persons.items()}
+        )
+
 
 def load_txt_file(file):
     """
@@ -45,16 +83,96 @@ def load_json_file(file):
         file: Path to the json-file to load.
 
     Returns:
-        Papermage document with the contents of the json-file.
+        Papermage document with the contents of the json-file, or None if it does not exist or cannot be parsed.
     """
+    if not os.path.exists(file):
+        return None
     with open(file, encoding="utf8") as f:
         try:
+            # papermage is only imported when needed, it is slow to import
+            from papermage import Document
             doc_dict = json.load(f)
             doc = Document.from_json(doc_dict)
         except:
             return None
     return doc
 
+def extract_abstract(doc_dict):
+    """
+    Returns the text of the abstracts layer from the json-content of a papermage document.
+
+    Only the abstract entities are read, without building the papermage Document with all of its layers.
+    The text of an entity is computed like papermage does it: the stored text in the metadata
+    or the joined symbols of its spans.
+
+    Args:
+        doc_dict: The json-content of the papermage document.
+
+    Returns:
+        String with the concatenated abstract, or None if an entity only has boxes (then papermage is needed).
+    """
+    symbols = doc_dict.get("symbols") or ""
+    texts = []
+    for entity in doc_dict.get("entities", {}).get("abstracts", []):
+        text = entity.get("metadata", {}).get("text")
+        if not text:
+            spans = entity.get("spans", [])
+            if not spans and entity.get("boxes"):
+                return None
+            text = " ".join(symbols[span[0]:span[-1]] for span in spans).replace("\n", " ")
+        texts.append(text)
+    return "".join(texts)
+
+def scan_abstract_json(json_string):
+    """
+    Decodes only the symbols and the abstracts layer of the json-content of a papermage document.
+
+    The other layers (pages, rows, tokens, ...) make up most of the file and are skipped without being decoded.
+
+    Args:
+        json_string: The json-content of the papermage document as string.
+
+    Returns:
+        Dict with the symbols and the abstract entities in the papermage json format, or None if they cannot be found.
+    """
+    symbols_match = SYMBOLS_KEY_PATTERN.search(json_string)
+    if not symbols_match:
+        return None
+    symbols, _ = JSON_DECODER.raw_decode(json_string, symbols_match.end())
+    abstracts = []
+    abstracts_match = ABSTRACTS_KEY_PATTERN.search(json_string, symbols_match.end())
+    if abstracts_match:
+        abstracts, _ = JSON_DECODER.raw_decode(json_string, abstracts_match.end())
+    if not isinstance(symbols, str) or not isinstance(abstracts, list):
+        return None
+    return {"symbols": symbols, "entities": {"abstracts": abstracts}}
+
+def load_abstract(file):
+    """
+    Returns the abstract of a json-file created with papermage.
+
+    Args:
+        file: Path to the json-file to load.
+
+    Returns:
+        String with the abstract, or None if the json-file does not exist or cannot be parsed.
+    """
+    if not os.path.exists(file):
+        return None
+    try:
+        with open(file, encoding="utf8") as f:
+            json_string = f.read()
+        doc_dict = scan_abstract_json(json_string)
+        abstract = extract_abstract(doc_dict) if doc_dict else None
+        if abstract is None:
+            # Fall back to the complete papermage document, e.g. for abstract entities without spans
+            from papermage import Document
+            doc = Document.from_json(json.loads(json_string))
+            abstract = "".join([e.text for e in doc.get_layer("abstracts").entities])
+    except:
+        return None
+    return abstract
+
 def get_all_txt_files(ir_anthology_data_path):
     """
     Returns the contents of all txt-files.
@@ -109,36 +227,240 @@ def get_all_json_files(ir_anthology_data_path):
     files = {file: load_json_file(file) for file in tqdm(files, desc="Loading json-files...")}
     return files
 
-def get_all_files(data_path):
+def split_file_path(file):
+    """
+    Splits a file path into its directory and its filename without extension.
+
+    Args:
+        file: Path to the file (with "/" as separator).
+
+    Returns:
+        Tuple with (directory, filename without extension).
+    """
+    directory, _, filename = file.rpartition("/")
+    return directory, os.path.splitext(filename)[0]
+
+def group_files_by_directory(files):
+    """
+    Groups files by their venue directory.
+
+    Args:
+        files: Dict with filename -> file-content.
+
+    Returns:
+        Dict with directory -> Dict with filename without extension -> file-content.
+    """
+    grouped = defaultdict(dict)
+    for file, content in files.items():
+        directory, name = split_file_path(file)
+        grouped[directory][name] = content
+    return grouped
+
+def join_bib_entries(directory, bib, txt_files):
+    """
+    Joins the entries of one bib-file with the txt- and json-files of its venue directory.
+
+    Args:
+        directory: Venue directory of the bib-file.
+        bib: The contents of the bib-file as a BibliographyData object.
+        txt_files: Dict with filename without extension -> file-content for the txt-files in the directory.
+
+    Returns:
+        Dict with bib_id -> Dict with data from bib-file (bib-data) and data from txt-file (full-text).
+    """
+    files = {}
+    for bib_data in bib.entries.values():
+        bib_id = bib_data.key
+        full_text = txt_files.get(bib_id)
+        if full_text is not None:
+            abstract = load_abstract(f"{directory}/{bib_id}.json")
+        else:
+            abstract = None
+        files[bib_id] = {
+            "bib-data": bib_data,
+            "full-text": full_text if full_text is not None else "",
+            "json-data": {
+                "abstract": abstract
+            } if abstract is not None else ""
+        }
+    return files
+
+def join_files(bibs, txts):
+    """
+    Joins the bib-entries with the txt- and json-files in the same venue directory.
+
+    The txt-files are grouped by directory once, so every bib-entry is matched with a single dict lookup.
+
+    Args:
+        bibs: Dict with filename -> bib-content.
+        txts: Dict with filename -> file-content.
+
+    Returns:
+        Dict with bib_id -> Dict with data from bib-file (bib-data) and data from txt-file (full-text).
+    """
+    txts_by_directory = group_files_by_directory(txts)
+
+    files = {}
+
+    for file, bib in tqdm(bibs.items(), desc="Process bibs..."):
+        directory, _ = split_file_path(file)
+        files.update(join_bib_entries(directory, bib, txts_by_directory.get(directory, {})))
+
+    return files
+
+def get_venue_directories(ir_anthology_data_path):
+    """
+    Returns all venue directories, i.e. all directories containing at least one bib-file.
+
+    Args:
+        ir_anthology_data_path: Path to the files.
+
+    Returns:
+        Sorted list with the venue directories.
+    """
+    path = ir_anthology_data_path
+    conf_files = glob.glob(f'{path}/conf/**/*.bib', recursive = True)
+    jrnl_files = glob.glob(f'{path}/jrnl/**/*.bib', recursive = True)
+    return sorted({split_file_path(file.replace("\\", "/"))[0] for file in conf_files + jrnl_files})
+
+def list_directory_files(directory, extension):
+    """
+    Returns the files with the given extension directly inside a directory.
+
+    Args:
+        directory: Directory to list.
+        extension: File extension including the dot, e.g. ".txt".
+
+    Returns:
+        Sorted list with the paths of the files.
+    """
+    with os.scandir(directory) as it:
+        files = [f"{directory}/{entry.name}" for entry in it
+                 if entry.is_file() and entry.name.endswith(extension) and entry.name not in NON_IMPORTANT_FILES]
+    return sorted(files)
+
+def load_venue_directory(directory):
+    """
+    Loads and joins all bib-, txt- and json-files of one venue directory.
+
+    This is the unit of work of the parallel loading. The bib-entries are converted to BibEntry objects,
+    so the result is cheap to pickle and send back from a worker process.
+
+    Args:
+        directory: The venue directory to load.
+
+    Returns:
+        Dict with bib_id -> Dict with data from bib-file (bib-data) and data from txt-file (full-text).
+    """
+    txt_files = {split_file_path(file)[1]: load_txt_file(file) for file in list_directory_files(directory, ".txt")}
+    files = {}
+    for file in list_directory_files(directory, ".bib"):
+        for bib_id, info_dict in join_bib_entries(directory, load_bib_file(file), txt_files).items():
+            info_dict["bib-data"] = BibEntry.from_pybtex(info_dict["bib-data"])
+            files[bib_id] = info_dict
+    return files
+
+def load_venue_directories(directories):
+    """
+    Loads and joins the files of multiple venue directories.
+
+    Args:
+        directories: List with the venue directories to load.
+
+    Returns:
+        List with one dict bib_id -> Dict with the file data per directory (see load_venue_directory).
+    """
+    return [load_venue_directory(directory) for directory in directories]
+
+def iter_loaded_directories(directories, num_workers=1, chunksize=1, max_in_flight=4):
+    """
+    Loads the given venue directories in the background and yields them one directory at a time.
+
+    At most max_in_flight chunks of directories are loaded or waiting to be consumed at once, so the memory
+    stays bounded and the consumer (e.g. the bulk indexing) overlaps with the loading.
+
+    Args:
+        directories: List with the venue directories to load.
+        num_workers: Number of worker processes. With 1 the directories are loaded in a background thread,
+            with None one worker process per CPU core is used. Defaults to 1.
+        chunksize: Number of venue directories loaded by a worker at once. Defaults to 1.
+        max_in_flight: Maximum number of chunks that are loaded ahead of the consumer. Defaults to 4.
+
+    Yields:
+        Tuple with (directory, Dict with bib_id -> Dict with the file data) per venue directory.
+    """
+    chunks = [directories[i:i+chunksize] for i in range(0, len(directories), chunksize)]
+    executor = ThreadPoolExecutor(max_workers=1) if num_workers == 1 else ProcessPoolExecutor(max_workers=num_workers)
+    with executor:
+        chunk_iter = iter(chunks)
+        pending = deque((chunk, executor.submit(load_venue_directories, chunk)) for chunk in itertools.islice(chunk_iter, max(1, max_in_flight)))
+        with tqdm(total=len(directories), desc="Loading venue directories...") as progress_bar:
+            while pending:
+                chunk, future = pending.popleft()
+                results = future.result()
+                next_chunk = next(chunk_iter, None)
+                if next_chunk is not None:
+                    pending.append((next_chunk, executor.submit(load_venue_directories, next_chunk)))
+                for directory, venue_files in zip(chunk, results):
+                    progress_bar.update(1)
+                    yield directory, venue_files
+
+def iter_venue_files(data_path, num_workers=1, chunksize=1, max_in_flight=4):
+    """
+    Loads all venue directories in the background and yields their files one directory at a time.
+
+    Args:
+        data_path: Path to the files.
+        num_workers: Number of worker processes. With 1 the directories are loaded in a background thread,
+            with None one worker process per CPU core is used. Defaults to 1.
+        chunksize: Number of venue directories loaded by a worker at once. Defaults to 1.
+        max_in_flight: Maximum number of chunks that are loaded ahead of the consumer. Defaults to 4.
+
+    Yields:
+        Dict with bib_id -> Dict with data from bib-file (bib-data) and data from txt-file (full-text) per venue directory.
+    """
+    directories = get_venue_directories(data_path)
+    for _, venue_files in iter_loaded_directories(directories, num_workers, chunksize, max_in_flight):
+        yield venue_files
+
+def get_all_files_parallel(data_path, num_workers=None, chunksize=1):
+    """
+    Returns the same dict as get_all_files, but loads the venue directories in a process pool.
+
+    Args:
+        data_path: Path to the files.
+        num_workers: Number of worker processes. Defaults to None (number of CPU cores).
+        chunksize: Number of venue directories sent to a worker at once. Defaults to 1.
+
+    Returns:
+        Dict with bib_id -> Dict with data from bib-file (bib-data) and data from txt-file (full-text).
+    """
+    directories = get_venue_directories(data_path)
+    files = {}
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        results = executor.map(load_venue_directory, directories, chunksize=chunksize)
+        for venue_files in tqdm(results, total=len(directories), desc="Loading venue directories..."):
+            files.update(venue_files)
+    return files
+
+def get_all_files(data_path, num_workers=1, chunksize=1):
     """
     Returns a dict with the merged bib- and txt-files content.
 
+    Args:
+        data_path: Path to the files.
+        num_workers: Number of worker processes. With 1 everything is loaded in this process,
+            with None one worker per CPU core is used. Defaults to 1.
+        chunksize: Number of venue directories sent to a worker at once. Defaults to 1.
+
     Returns:
         Dict with bib_id -> Dict with data from bib-file (bib-data) and data from txt-file (full-text).
     """
+    if num_workers != 1:
+        return get_all_files_parallel(data_path, num_workers=num_workers, chunksize=chunksize)
+
     bibs = get_all_bib_files(data_path)
     txts = get_all_txt_files(data_path)
     #jsons = get_all_json_files(data_path)
 
-    files = {}
-
-    for file in tqdm(bibs, desc="Process bibs..."):
-        txt_files = {k.split("/")[-1][:-4]: v for k, v in txts.items() if file.split("/")[:-1] == k.split("/")[:-1]}
-        #json_files = {k.split("/")[-1][:-4]: v for k, v in jsons.items() if file.split("/")[:-1] == k.split("/")[:-1]}
-        for i in tqdm(range(len(bibs[file].entries)), desc="Process entries in this bib..."):
-            entry = list(bibs[file].entries)[i]
-            bib_data = bibs[file].entries[entry]
-            bib_id = bib_data.key
-            if bib_id in txt_files:
-                json_file = load_json_file("/".join(file.split("/")[:-1]) + "/" + bib_id + ".json")
-            else:
-                json_file = None
-            files[bib_id] = {
-                "bib-data": bib_data,
-                "full-text": txt_files[bib_id] if bib_id in txt_files else "",
-                "json-data": {
-                    "abstract": "".join([e.text for e in json_file.get_layer("abstracts").entities])
-                } if json_file else ""
-            }
-    
-    return files
+    return join_files(bibs, txts)
@@ -0,0 +1,165 @@
+import os
+import json
+import hashlib
+
+from src.utils.file_loading_utils import list_directory_files
+
+TRACKED_EXTENSIONS = ['.bib', '.txt', '.json']
+
+
+def hash_file(file):
+    """
+    Returns the content hash of a file.
+
+    Args:
+        file: Path to the file.
+
+    Returns:
+        Hex digest of the SHA-1 hash of the file content.
+    """
+    sha1 = hashlib.sha1()
+    with open(file, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+def hash_document(document):
+    """
+    Returns the content hash of an index document.
+
+    Args:
+        document: Dict containing the document as formatted for the Elasticsearch index.
+
+    Returns:
+        Hex digest of the SHA-1 hash of the document.
+    """
+    return hashlib.sha1(json.dumps(document, sort_keys=True, ensure_ascii=False).encode('utf8')).hexdigest()
+
+def stat_directory(directory):
+    """
+    Returns the modification time and size of all tracked files in a venue directory.
+
+    Args:
+        directory: The venue directory.
+
+    Returns:
+        Dict with filename -> Dict with mtime (in ns) and size.
+    """
+    stats = {}
+    for extension in TRACKED_EXTENSIONS:
+        for file in list_directory_files(directory, extension):
+            stat = os.stat(file)
+            stats[os.path.basename(file)] = {'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+    return stats
+
+
+class IndexManifest:
+    """
+    This class tracks the state of the indexed files to detect which venue directories changed since the last sync.
+
+    For every venue directory it stores the mtime, size and content hash of its files
+    and the content hash of every document created from it. The ids of documents whose delete failed
+    are kept as pending deletes, so the next sync deletes them again.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.directories = {}
+        self.pending_deletes = []
+        if os.path.exists(path):
+            with open(path, encoding='utf8') as f:
+                data = json.load(f)
+            self.directories = data['directories']
+            self.pending_deletes = data.get('pending_deletes', [])
+
+    def save(self):
+        """
+        Writes the manifest atomically to its path.
+        """
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf8') as f:
+            json.dump({'directories': self.directories, 'pending_deletes': self.pending_deletes}, f)
+        os.replace(tmp_path, self.path)
+
+    def get_file_states(self, directory):
+        """
+        Returns the current state of the files in a venue directory, reusing the stored hashes of unmodified files.
+
+        Args:
+            directory: The venue directory.
+
+        Returns:
+            Dict with filename -> Dict with mtime, size and hash.
+        """
+        old_files = self.directories.get(directory, {}).get('files', {})
+        states = {}
+        for name, stat in stat_directory(directory).items():
+            old = old_files.get(name)
+            if old and old['mtime'] == stat['mtime'] and old['size'] == stat['size']:
+                states[name] = old
+            else:
+                states[name] = {**stat, 'hash': hash_file(f"{directory}/{name}")}
+        return states
+
+    def has_changed(self, directory, file_states):
+        """
+        Checks whether the content of the files in a venue directory changed.
+
+        Args:
+            directory: The venue directory.
+            file_states: The current file states (see get_file_states).
+
+        Returns:
+            True if files were added, removed or their content changed, False otherwise.
+        """
+        old_files = self.directories.get(directory, {}).get('files')
+        if old_files is None or old_files.keys() != file_states.keys():
+            return True
+        return any(old_files[name]['hash'] != state['hash'] for name, state in file_states.items())
+
+    def get_document_hashes(self, directory):
+        """
+        Returns the stored document hashes of a venue directory.
+
+        Args:
+            directory: The venue directory.
+
+        Returns:
+            Dict with bib_id -> document hash.
+        """
+        return self.directories.get(directory, {}).get('documents', {})
+
+    def update_directory(self, directory, file_states, document_hashes=None):
+        """
+        Stores the new state of a venue directory.
+
+        Args:
+            directory: The venue directory.
+            file_states: The current file states (see get_file_states).
+            document_hashes: Dict with bib_id -> document hash. Defaults to None (keep the stored hashes).
+        """
+        if document_hashes is None:
+            document_hashes = self.get_document_hashes(directory)
+        self.directories[directory] = {'files': file_states, 'documents': document_hashes}
+
+    def forget_document(self, directory, bib_id):
+        """
+        Removes the hash of a document and marks its venue directory as changed, so it is upserted again with the next sync.
+
+        Args:
+            directory: The venue directory of the document.
+            bib_id: The bib-id of the document.
+        """
+        self.get_document_hashes(directory).pop(bib_id, None)
+        self.directories[directory]['files'] = {}
+
+    def remove_directory(self, directory):
+        """
+        Removes a venue directory from the manifest.
+
+        Args:
+            directory: The venue directory.
+
+        Returns:
+            Dict with bib_id -> document hash of the removed directory.
+        """
+        return self.directories.pop(directory, {}).get('documents', {})
@@ -1,4 +1,5 @@
 from src.utils.constants import IndexFields
+from src.utils.boolean_query import compile_query, canonical_query
 
 class QueryParser:
     """
@@ -37,7 +38,7 @@ class QueryParser:
     
     def build_query(self, input_string, only_search_title_abstract=False):
         if self.use_self_implemented:
-            return self.build_query_self_implemented(input_string)
+            return self.build_query_self_implemented(input_string, only_search_title_abstract)
         else:
             return self.build_query_elasticsearch(input_string, only_search_title_abstract)
 
@@ -55,6 +56,30 @@ class QueryParser:
             query['query']['query_string']['default_field'] = IndexFields.FULL_TEXT.value
         return query
 
-    def build_query_self_implemented(self, input_string):
-        print("Self-implemented option removed here!")
-        pass
+    def get_fields(self, only_search_title_abstract=False):
+        if only_search_title_abstract:
+            return [IndexFields.TITLE.value, IndexFields.ABSTRACT.value]
+        return [IndexFields.FULL_TEXT.value]
+
+    def build_query_self_implemented(self, input_string, only_search_title_abstract=False):
+        """
+        Compiles a Boolean query (AND, OR, NOT, parentheses, "phrases", * wildcards, +/- prefixes, field: scopes
+        and year ranges) to a bool query with match, match_phrase and range queries (see boolean_query).
+        Syntax errors and unsupported query_string syntax are raised here as QuerySyntaxError instead of
+        failing in Elasticsearch or silently changing the meaning of the query.
+
+        Args:
+            input_string: The Boolean query.
+            only_search_title_abstract: Whether to search the title and abstract instead of the full-text. Defaults to False.
+
+        Returns:
+            Dict with the Elasticsearch query.
+        """
+        return {'query': compile_query(input_string, fields=tuple(self.get_fields(only_search_title_abstract)))}
+
+    def get_cache_key(self, input_string):
+        """
+        Returns the canonical form of a Boolean query: equivalent queries (operand order, duplicates, nesting,
+        case, quote style) have the same key.
+        """
+        return canonical_query(input_string)
@@ -0,0 +1,22 @@
+import sys
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+def get_peak_memory_mb():
+    """
+    Returns the peak resident memory (RSS) of the current process.
+
+    Returns:
+        Peak memory in MB.
+    """
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in KB on Linux
+        return max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+    import psutil
+    return psutil.Process().memory_info().peak_wset / (1024 * 1024)
@@ -0,0 +1,119 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+
+
+def to_json_value(value):
+    """
+    Converts values that json cannot serialize for a cache key. Numpy arrays (e.g. query embeddings) are converted
+    to lists, because their repr abbreviates long arrays and different embeddings would get the same key.
+    """
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+
+class ResultCache:
+    """
+    Bounded LRU cache with time-to-live for search responses.
+
+    The cache belongs to an index generation: when the generation changes (e.g. after a reindex),
+    all cached responses are dropped.
+    """
+    def __init__(self, max_size=256, ttl=300, generation_check_interval=5):
+        """
+        Args:
+            max_size: Maximum number of cached responses. Defaults to 256.
+            ttl: Seconds a response stays valid. Defaults to 300.
+            generation_check_interval: Minimum seconds between two checks of the index generation. Defaults to 5.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.generation_check_interval = generation_check_interval
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.generation = None
+        self.generation_checked_at = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def make_key(**parts):
+        """
+        Returns a canonical key for the given parts (dict keys are sorted, so equal query DSLs give equal keys).
+        """
+        return json.dumps(parts, sort_keys=True, separators=(',', ':'), default=to_json_value)
+
+    def get(self, key):
+        """
+        Returns the cached value of a key.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            The value, or None if the key is not cached or expired.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        """
+        Stores a value and evicts the least recently used entries if the cache is full.
+
+        Args:
+            key: The cache key.
+            value: The value to cache.
+        """
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Drops all cached values.
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def needs_generation_check(self):
+        """
+        Returns whether the index generation should be checked again.
+        """
+        return self.generation_checked_at is None or time.monotonic() - self.generation_checked_at >= self.generation_check_interval
+
+    def update_generation(self, generation):
+        """
+        Sets the current index generation and drops all cached values if it changed.
+
+        Args:
+            generation: Hashable description of the index generation.
+        """
+        self.generation_checked_at = time.monotonic()
+        if generation != self.generation:
+            self.clear()
+            self.generation = generation
+
+    def stats(self):
+        """
+        Returns the hit and miss counters.
+
+        Returns:
+            Dict with hits, misses, hit_rate and size.
+        """
+        requests = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / requests if requests else 0.0, 'size': len(self)}